@@ -1,49 +1,310 @@
 from __future__ import annotations
 
 import argparse
+import io
 import json
-from multiprocessing import Process, Queue
+import re
+import sys
+from datetime import datetime, timezone
 from pathlib import Path
-from time import monotonic, sleep
+from time import monotonic, time
+from typing import Iterator, TYPE_CHECKING
 
+from aws.immutable.firewall_change import FirewallChange
 from aws.immutable.firewall_rule import FirewallRule
+from aws.immutable.plan_entry import PlanEntry
 from aws.immutable.print_column import PrintColumn
 from aws.immutable.request_parameter import RequestParameter
-from aws.lightsail import LightSail
+from aws.immutable.ssh_command_response import SshCommandResponse
 from aws.mutable.alarm_definition import AlarmDefinition
-from aws.mutable.port import Port
-from aws.mutable.server import Server
+from aws.table_renderer import TableRenderer
+from aws.tag_selector import TagSelector
+
+if TYPE_CHECKING:
+    # the modules of the commands are imported on demand, to keep the start up fast (see benchmarks/bench_startup.py)
+    from aws.instrumentation import Instrumentation
+    from aws.light_sail_regions import LightSailRegions
+    from aws.immutable.reconciliation_plan import ReconciliationPlan
+    from aws.immutable.server import Server
+    from aws.output_grouper import OutputGrouper
+    from aws.policy import Policy
+    from aws.reconciler import Reconciler
+    from aws.snapshot_store import SnapshotStore
+    from aws.ssh_executor import SshExecutor
 
 
 class Menu:
-    ALL_SERVER = "ALL_SERVER"
+    SLOWEST_HOSTS = 5
+    POLICY_COMMANDS = ("setFirewall", "setAlerts", "metrics", "plan", "apply")
+    DAEMON_COMMANDS = ("servers", "firewall", "alerts")  # answered by the daemon, when running
+    LIVE_COMMANDS = ("setFirewall", "plan", "apply")  # compared with the live state, never with the cached inventory
+    CHANGE_COMMANDS = ("setFirewall", "setAlerts", "apply")  # the snapshot of the daemon is outdated by them
+    MAX_WINDOW = 14 * 24  # hours of metrics kept by Lightsail
+    BATCH_SIZE = re.compile(r"^(\d+)(%?)$")
 
-    def __init__(self, light_sail: LightSail):
+    def __init__(self, light_sail: LightSailRegions, policy: Policy, instrumentation: Instrumentation | None = None):
         self.light_sail = light_sail
+        self.policy = policy
+        self.instrumentation = instrumentation
 
     @classmethod
-    def run(cls, instance: Menu):
+    def run(cls):
         commands = {
-            "servers": instance.show_servers,
-            "firewall": instance.show_firewall_rules,
-            "setFirewall": instance.set_firewall_rules,
-            "alerts": instance.show_alerts,
-            "setAlerts": instance.set_alerts,
-            "command": instance.run_command,
+            "servers": cls.show_servers,
+            "firewall": cls.show_firewall_rules,
+            "setFirewall": cls.set_firewall_rules,
+            "alerts": cls.show_alerts,
+            "setAlerts": cls.set_alerts,
+            "plan": cls.plan_changes,
+            "apply": cls.apply_changes,
+            "metrics": cls.show_metrics,
+            "command": cls.run_command,
+            "script": cls.run_script,
+            "push": cls.push_file,
+            "connect": cls.connect_servers,
+            "disconnect": cls.disconnect_servers,
+            "daemon": cls.run_daemon,
+            "history": cls.show_history,
+            "diff": cls.show_diff,
         }
         parser = argparse.ArgumentParser(description="LightSail management helper")
         parser.add_argument("what", help="the command to run", choices=list(commands.keys()))
         parser.add_argument("--command", help="the command to run on each server", default="hostname")
-        parser.add_argument("--tag", help="the tag to identify the servers (provided as key:value)", default="")
+        parser.add_argument(
+            "--tag",
+            help="the tags to identify the servers (key:value or key, combined with AND, OR, NOT)",
+            default="",
+        )
+        parser.add_argument(
+            "--region", help="the regions of the servers (comma separated, or all)", default="us-west-2"
+        )
+        parser.add_argument(
+            "--cache-ttl",
+            help="reuse the inventory loaded less than that long ago (sec., 0=no cache)",
+            type=int,
+            default=300,
+        )
+        parser.add_argument("--refresh", help="ignore the cached inventory", action="store_true")
+        parser.add_argument(
+            "--snapshots",
+            help="record the servers and the alarms loaded from AWS in secrets/snapshots.sqlite3",
+            action="store_true",
+        )
+        parser.add_argument(
+            "--since", help="the period of the history and diff views (hours before now)", type=int, default=24
+        )
+        parser.add_argument("--no-daemon", help="do not use the daemon, even if running", action="store_true")
+        parser.add_argument(
+            "--interval",
+            help="the time between the refreshes of the daemon, or the polls of alerts --watch when all OK (sec.)",
+            type=int,
+            default=60,
+        )
+        parser.add_argument("--watch", help="keep polling the alarms, print their transitions", action="store_true")
+        parser.add_argument(
+            "--fast-interval",
+            help="the time between the polls of alerts --watch while an alarm is in ALARM (sec.)",
+            type=int,
+            default=15,
+        )
+        parser.add_argument("--hook", help="the shell command run on each transition (ALARM_* variables)", default="")
+        parser.add_argument(
+            "--parallel", help="the maximum number of concurrent SSH sessions or updates", type=int, default=20
+        )
+        parser.add_argument(
+            "--output",
+            help="the format of the servers, firewall and alerts views",
+            choices=TableRenderer.OUTPUTS,
+            default=TableRenderer.TABLE,
+        )
+        parser.add_argument("--dry-run", help="only show the changes to apply", action="store_true")
+        parser.add_argument("--plan-file", help="the file to save the plan to, or to apply the plan from")
+        parser.add_argument(
+            "--resources", help="the resources to plan (comma separated: firewall, alarms)", default="firewall,alarms"
+        )
+        parser.add_argument(
+            "--policy-dir",
+            help="the directory of aws_firewall_rules.json and aws_alarms.json (default: secrets)",
+            default="",
+        )
+        parser.add_argument(
+            "--allow-empty-policy",
+            help="apply an empty firewall or alarm policy (removes all the rules or the alarms of the servers)",
+            action="store_true",
+        )
+        parser.add_argument("--connect-timeout", help="the SSH connection timeout (sec.)", type=int, default=10)
+        parser.add_argument(
+            "--command-timeout", help="the command timeout per server (sec., 0=none)", type=int, default=0
+        )
+        parser.add_argument(
+            "--persist",
+            help="reuse the SSH connections kept alive for that long (sec., 0=no reuse)",
+            type=int,
+            default=0,
+        )
+        parser.add_argument(
+            "--stream", help="print the output lines as they come, prefixed with [server]", action="store_true"
+        )
+        parser.add_argument(
+            "--group", help="print each distinct output once, with the servers returning it", action="store_true"
+        )
+        parser.add_argument(
+            "--normalize", help="ignore the server names and the IP addresses when grouping", action="store_true"
+        )
+        parser.add_argument("--log-dir", help="write the full output of each server to <server>.log in it")
+        parser.add_argument(
+            "--max-lines",
+            help="the last lines of output kept per server for the summary (0=all)",
+            type=int,
+            default=1000,
+        )
+        parser.add_argument(
+            "--batch-size", help="run the command on that many servers at once (n or n%%), rolling", default=""
+        )
+        parser.add_argument("--canary", help="first run the command on that many servers only", type=int, default=0)
+        parser.add_argument(
+            "--pause",
+            help="the pause after the canary and after each batch of servers started (sec.)",
+            type=float,
+            default=0.0,
+        )
+        parser.add_argument(
+            "--max-failure-rate",
+            help="stop starting servers once the failure rate exceeds it (%%)",
+            type=float,
+            default=100.0,
+        )
+        parser.add_argument("--source", help="the local file to push, or the local script to run")
+        parser.add_argument("--destination", help="the remote path of the pushed file (a directory if ending with /)")
+        parser.add_argument(
+            "--bandwidth",
+            help="the total bandwidth of the concurrent transfers (KB/s, 0=unlimited)",
+            type=int,
+            default=0,
+        )
+        parser.add_argument("--arguments", help="the arguments of the script", default="")
+        parser.add_argument(
+            "--metrics",
+            help="the metrics to show (comma separated, default: the metrics of the alarms, or CPUUtilization)",
+            default="",
+        )
+        parser.add_argument("--window", help="the time window of the metrics (hours)", type=int, default=24)
+        parser.add_argument("--period", help="the time between the datapoints (sec.)", type=int, default=300)
+        parser.add_argument("--threshold", help="also show the time spent above that value", type=float)
+
+        parser.add_argument("--profile", help="print the time spent per API call and SSH command", action="store_true")
+        parser.add_argument("--profile-json", help="write the time spent per API call and SSH command to that file")
 
         args = parser.parse_args()
-        tag_key, tag_value, *_ = (args.tag + ":").split(":")
-        request = RequestParameter(tag_key=tag_key.strip(), tag_value=tag_value.strip(), command=args.command)
+        if not 1 <= args.window <= cls.MAX_WINDOW:
+            parser.error(f"the window must be between 1 and {cls.MAX_WINDOW} hours")
+        if args.batch_size and not cls.batch_size(args.batch_size, 1):
+            parser.error("the batch size must be a number of servers (n) or a percentage (n%)")
+        if not 60 <= args.period <= 86400 or args.period % 60:
+            parser.error("the period must be a multiple of 60 sec., up to 86400")
+        if args.since < 1:
+            parser.error("--since must be at least 1 hour")
+        if args.interval < 1 or args.fast_interval < 1:
+            parser.error("the intervals must be at least 1 sec.")
+        if args.what in ("push", "script") and (not args.source or Path(args.source).is_file() is False):
+            parser.error(f"{args.what} requires --source, an existing local file")
+        if args.what == "push" and not args.destination:
+            parser.error("push requires --destination")
+        try:
+            TagSelector(args.tag)
+            from aws.policy import Policy
+
+            # the policy files are loaded (and validated) once, for the commands using them
+            policy_dir = Path(args.policy_dir) if args.policy_dir else Policy.default_directory()
+            policy = Policy(policy_dir if args.what in cls.POLICY_COMMANDS else None, bool(args.policy_dir))
+        except ValueError as exc:
+            parser.error(str(exc))
+        request = RequestParameter(
+            tag=args.tag,
+            command=args.command,
+            parallel=args.parallel,
+            connect_timeout=args.connect_timeout,
+            command_timeout=args.command_timeout,
+            persist=args.persist,
+            dry_run=args.dry_run,
+            output=args.output,
+            metrics=args.metrics,
+            window=args.window,
+            period=args.period,
+            threshold=args.threshold,
+            stream=args.stream,
+            log_dir=args.log_dir or "",
+            max_lines=args.max_lines,
+            batch_size=args.batch_size,
+            canary=args.canary,
+            pause=args.pause,
+            max_failure_rate=args.max_failure_rate,
+            interval=args.interval,
+            plan_file=args.plan_file or "",
+            resources=args.resources,
+            refresh=args.refresh,
+            source=args.source or "",
+            destination=args.destination or "",
+            bandwidth=args.bandwidth,
+            arguments=args.arguments,
+            watch=args.watch,
+            fast_interval=args.fast_interval,
+            hook=args.hook,
+            group=args.group or args.normalize,
+            normalize=args.normalize,
+            since=args.since,
+            allow_empty_policy=args.allow_empty_policy,
+        )
         if args.what in commands:
-            commands[args.what](request)
+            from aws.instrumentation import Instrumentation
+            from aws.light_sail_regions import LightSailRegions
+
+            instrumentation = Instrumentation() if args.profile or args.profile_json else None
+            regions = LightSailRegions.regions(args.region)
+            # the rules changed in the console within the TTL of the cache must be seen
+            refresh = args.refresh or args.what in cls.LIVE_COMMANDS
+            light_sail: LightSailRegions
+            snapshots = None
+            if args.snapshots:
+                from aws.snapshot_store import SnapshotStore
+
+                snapshots = SnapshotStore()
+            # the daemon is only as fresh as its last refresh, the watch polls the API
+            daemon = args.refresh is False and args.no_daemon is False and args.watch is False
+            if args.what in cls.DAEMON_COMMANDS and daemon:
+                from aws.daemon_regions import DaemonRegions
+
+                light_sail = DaemonRegions(
+                    regions, args.cache_ttl, args.refresh, instrumentation=instrumentation, snapshots=snapshots
+                )
+            else:
+                light_sail = LightSailRegions(
+                    regions, args.cache_ttl, refresh, instrumentation=instrumentation, snapshots=snapshots
+                )
+            instance = cls(light_sail, policy, instrumentation)
+            try:
+                commands[args.what](instance, request)
+            except ValueError as exc:  # e.g. the drift of the state since the plan
+                parser.exit(1, f"{parser.prog}: error: {exc}\n")
+            finally:
+                if args.what in cls.CHANGE_COMMANDS and args.dry_run is False:
+                    from aws.daemon_regions import DaemonRegions
+
+                    DaemonRegions(regions).invalidate()
+            if instrumentation is not None and args.profile:
+                instance.print_profile(instrumentation)
+            if instrumentation is not None and args.profile_json:
+                content = {
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "command": args.what,
+                    "arguments": sys.argv[1:],
+                    "operations": instrumentation.to_json(),
+                }
+                Path(args.profile_json).write_text(json.dumps(content, indent=2))
 
     def show_servers(self, request: RequestParameter):
         columns = [
+            PrintColumn(label="region", alignment=PrintColumn.left(), size=9, formatter=lambda x: x.region),
             PrintColumn(label="server", alignment=PrintColumn.left(), size=32, formatter=lambda x: x.name),
             PrintColumn(label="cpu", alignment=PrintColumn.right(), size=3, formatter=lambda x: x.cpu),
             PrintColumn(label="RAM (Gb)", alignment=PrintColumn.center(), size=6, formatter=lambda x: x.memory_gb),
@@ -52,12 +313,13 @@ class Menu:
             PrintColumn(label="flags", alignment=PrintColumn.left(), size=5, formatter=lambda x: x.single_tags()),
             PrintColumn(label="tags", alignment=PrintColumn.left(), size=5, formatter=lambda x: x.pair_tags()),
         ]
-        servers = self.light_sail.list_servers(request.tag_key, request.tag_value)
+        servers = self.light_sail.list_servers(request.tag)
         servers.sort(key=lambda x: x.name)
-        self.print_table(columns, servers)
+        self.print_table(columns, servers, request.output)
 
     def show_firewall_rules(self, request: RequestParameter):
         columns = [
+            PrintColumn(label="region", alignment=PrintColumn.left(), size=9, formatter=lambda x: x.region),
             PrintColumn(label="server", alignment=PrintColumn.left(), size=32, formatter=lambda x: x.server),
             PrintColumn(label="port", alignment=PrintColumn.right(), size=5, formatter=lambda x: x.port),
             PrintColumn(label="protocol", alignment=PrintColumn.center(), size=5, formatter=lambda x: x.protocol),
@@ -66,9 +328,9 @@ class Menu:
             ),
         ]
         fw_rules: list[FirewallRule] = []
-        for server in self.light_sail.list_servers(request.tag_key, request.tag_value):
+        for server in self.light_sail.list_servers(request.tag):
             for rule in server.firewall:
-                rules = rule.Cidrs
+                rules = list(rule.Cidrs)
                 if "0.0.0.0/0" in rule.Cidrs:
                     rules = ["all"]
                 fw_rules.append(
@@ -77,50 +339,67 @@ class Menu:
                         port=rule.ToPort,
                         protocol=rule.Protocol,
                         rules=rules,
+                        region=server.region,
                     )
                 )
         fw_rules.sort(key=lambda x: (x.server, x.port))
-        self.print_table(columns, fw_rules)
+        self.print_table(columns, fw_rules, request.output)
+
+    def check_policy(self, request: RequestParameter, resources: list[str]):
+        # an empty policy closes all the ports of the servers (SSH included) or deletes all their alarms
+        empty = self.policy.empty_files(resources)
+        if empty and request.allow_empty_policy is False:
+            raise ValueError(
+                f"no rule in {', '.join(empty)} of {self.policy.directory},"
+                " use --allow-empty-policy to remove them from all the servers"
+            )
 
     def set_firewall_rules(self, request: RequestParameter):
-        rules = self.read_firewall_rules()
-        for server in self.light_sail.list_servers(request.tag_key, request.tag_value):
-            fw_rules: list[Port] = []
-            fw_rules.extend(rules.get(self.ALL_SERVER, []))
-            for tag in server.tags:
-                key = tag["key"]
-                if "value" in tag:
-                    key = f"{tag['key']}:{tag['value']}"
-                fw_rules.extend(rules.get(key, []))
-            self.light_sail.set_rules(server.name, fw_rules)
-        #
-        self.show_firewall_rules(request)
+        if request.dry_run is False:
+            self.check_policy(request, [PlanEntry.firewall()])
+        changes: list[FirewallChange] = []
+        for server in self.light_sail.list_servers(request.tag):
+            desired, eliminated = self.policy.compaction(server)
+            changes.append(
+                FirewallChange(
+                    server=server.name,
+                    region=server.region,
+                    current=server.firewall,
+                    desired=desired,
+                    eliminated=eliminated,
+                )
+            )
+        changed = [change for change in changes if change.changed()]
+        self.print_firewall_plan(changed, len(changes) - len(changed))
+        if request.dry_run is False:
+            self.light_sail.apply_rules(changed, request.parallel)
+            #
+            self.show_firewall_rules(request)
 
     @classmethod
-    def read_firewall_rules(cls) -> dict[str, list[Port]]:
-        result: dict[str, list[Port]] = {}
-        fw_file = Path(f"{Path(__file__).parent}/secrets/aws_firewall_rules.json")
-        if fw_file.exists() is True:
-            rules = json.loads(fw_file.read_text())
-            for rule in rules:
-                key = rule["tagKey"] or cls.ALL_SERVER
-                if rule["tagValue"]:
-                    key = f"{rule['tagKey']}:{rule['tagValue']}"
-                if key not in result:
-                    result[key] = []
-
-                result[key].append(
-                    Port(
-                        FromPort=rule["fromPort"],
-                        ToPort=rule["toPort"],
-                        Protocol=rule["protocol"],
-                        Cidrs=rule["cidrs"],
-                    )
-                )
-        return result
+    def print_firewall_plan(cls, changed: list[FirewallChange], unchanged: int):
+        columns = [
+            PrintColumn(label="region", alignment=PrintColumn.left(), size=9, formatter=lambda x: x.region),
+            PrintColumn(label="server", alignment=PrintColumn.left(), size=32, formatter=lambda x: x.server),
+            PrintColumn(
+                label="current rules", alignment=PrintColumn.right(), size=3, formatter=lambda x: len(x.current)
+            ),
+            PrintColumn(label="new rules", alignment=PrintColumn.right(), size=3, formatter=lambda x: len(x.desired)),
+            PrintColumn(label="compacted", alignment=PrintColumn.right(), size=3, formatter=lambda x: x.eliminated),
+        ]
+        if changed:
+            cls.print_table(columns, sorted(changed, key=lambda x: (x.region, x.server)))
+        eliminated = sum(change.eliminated for change in changed)
+        print(
+            f"Firewall: {len(changed)} server(s) to update, {unchanged} unchanged,"
+            f" {eliminated} rule(s) eliminated by the compaction"
+        )
 
     def show_alerts(self, request: RequestParameter):
-        servers = [server.name for server in self.light_sail.list_servers(request.tag_key, request.tag_value)]
+        servers = self.light_sail.list_servers(request.tag)
+        if request.watch:
+            self.watch_alerts(request, servers)
+            return
         metric_label = {
             "CPUUtilization": "CPU",
             "BurstCapacityPercentage": "Burst",
@@ -129,6 +408,7 @@ class Menu:
             "Percent": "%",
         }
         columns = [
+            PrintColumn(label="region", alignment=PrintColumn.left(), size=9, formatter=lambda x: x.region),
             PrintColumn(label="server", alignment=PrintColumn.left(), size=32, formatter=lambda x: x.server),
             PrintColumn(
                 label="metric",
@@ -162,112 +442,429 @@ class Menu:
                 formatter=lambda x: x.period * x.evaluation_periods,
             ),
         ]
-        alerts = self.light_sail.list_alarms(servers=servers)
+        alerts = self.light_sail.list_alarms(servers)
         # alerts.sort(key=lambda x: [x.name, x.metric])
         alerts.sort()
 
-        self.print_table(columns, alerts)
-        print("Servers:", ", ".join(servers))
+        self.print_table(columns, alerts, request.output)
+        if TableRenderer.machine_readable(request.output) is False:
+            print("Servers:", ", ".join(server.name for server in servers))
+            for region, scan in self.light_sail.alarm_scans().items():
+                if scan.strategy:
+                    print(f"Alarms of {region}: {scan.strategy}, {scan.pages} page(s)")
+
+    def watch_alerts(self, request: RequestParameter, servers: list[Server]):
+        from aws.alarm_watcher import AlarmWatcher
+
+        watcher = AlarmWatcher(self.light_sail, servers, request.fast_interval, request.interval, request.hook)
+        # the transitions are printed as they come
+        output = TableRenderer.JSONL if TableRenderer.machine_readable(request.output) else TableRenderer.STREAM
+        if isinstance(sys.stdout, io.TextIOWrapper):
+            sys.stdout.reconfigure(line_buffering=True)
+        print(
+            f"Watching the alarms of {len(servers)} server(s), "
+            f"every {request.fast_interval}s while in ALARM, {request.interval}s otherwise",
+            file=sys.stderr,
+        )
+        try:
+            TableRenderer(self.alarm_transition_columns(), output, sample=0).render(watcher.watch())
+        except KeyboardInterrupt:
+            pass
 
     @classmethod
-    def print_table(cls, columns: list[PrintColumn], lines: list):
-        col_sizes: dict[str, int] = {c.label: max(c.size, len(c.label)) for c in columns}
-        for line in lines:
-            for c in columns:
-                col_sizes[c.label] = max(len(str(c.formatter(line))), col_sizes[c.label])
-
-        length = sum(col_sizes.values()) + len(columns) * 3 - 1
-        dashed_line = f"+{'-' * length}+"
-        title = " | ".join([f"{c.label.center(col_sizes[c.label])}" for c in columns])
-
-        print(dashed_line)
-        print(f"| {title} |")
-        print(dashed_line)
-        for line in lines:
-            rows: list[str] = []
-            for c in columns:
-                if c.alignment == PrintColumn.right():
-                    text = str(c.formatter(line)).rjust(col_sizes[c.label])
-                elif c.alignment == PrintColumn.left():
-                    text = str(c.formatter(line)).ljust(col_sizes[c.label])
-                else:  # center
-                    text = str(c.formatter(line)).center(col_sizes[c.label])
-                rows.append(text)
-            data = " | ".join(rows)
-            print(f"| {data} |")
-        print(dashed_line)
+    def alarm_transition_columns(cls) -> list[PrintColumn]:
+        return [
+            PrintColumn(label="time", alignment=PrintColumn.left(), size=25, formatter=lambda x: x.time),
+            PrintColumn(label="region", alignment=PrintColumn.left(), size=9, formatter=lambda x: x.region),
+            PrintColumn(label="server", alignment=PrintColumn.left(), size=32, formatter=lambda x: x.server),
+            PrintColumn(label="alarm", alignment=PrintColumn.left(), size=32, formatter=lambda x: x.name),
+            PrintColumn(label="change", alignment=PrintColumn.center(), size=7, formatter=lambda x: x.change),
+            PrintColumn(label="previous", alignment=PrintColumn.center(), size=17, formatter=lambda x: x.previous),
+            PrintColumn(label="state", alignment=PrintColumn.center(), size=17, formatter=lambda x: x.state),
+        ]
+
+    @classmethod
+    def print_table(cls, columns: list[PrintColumn], lines: list, output: str = TableRenderer.TABLE):
+        TableRenderer(columns, output).render(lines)
 
     def set_alerts(self, request: RequestParameter):
+        self.check_policy(request, [PlanEntry.alarms()])
         alerts: list[AlarmDefinition] = []
-        servers: list[str] = []
-        for server in self.light_sail.list_servers(request.tag_key, request.tag_value):
-            servers.append(server.name)
-            alerts += self.read_alarms(server)
+        servers = self.light_sail.list_servers(request.tag)
+        for server in servers:
+            alerts += self.policy.alarms_for(server)
 
-        self.light_sail.set_alarms(servers, alerts)
+        summary = self.light_sail.set_alarms(servers, alerts, request.parallel)
+        print(
+            f"Alarms: {summary.puts} set, {summary.deletes} deleted, "
+            f"{summary.retries} retries, in {summary.elapsed:1.2f}s"
+        )
         #
         self.show_alerts(request)
 
+    def reconciler(self, request: RequestParameter) -> Reconciler:
+        from aws.reconciler import Reconciler
+        from aws.state_journal import StateJournal
+
+        return Reconciler(self.light_sail, self.policy, StateJournal(), request.refresh)
+
+    def make_plan(self, request: RequestParameter) -> ReconciliationPlan:
+        from aws.reconciler import Reconciler
+
+        resources = [resource.strip() for resource in request.resources.split(",") if resource.strip()]
+        unknown = [resource for resource in resources if resource not in Reconciler.RESOURCES]
+        if unknown:
+            raise ValueError(f"unknown resource(s): {', '.join(unknown)}")
+        servers = self.light_sail.list_servers(request.tag)
+        return self.reconciler(request).plan(servers, resources)
+
+    def plan_changes(self, request: RequestParameter):
+        plan = self.make_plan(request)
+        self.print_plan(plan, request.output)
+        if request.plan_file:
+            Path(request.plan_file).write_text(json.dumps(plan.to_json(), indent=2))
+
+    def apply_changes(self, request: RequestParameter):
+        from aws.immutable.reconciliation_plan import ReconciliationPlan
+
+        # a saved plan is applied as is, provided nothing changed in between
+        if request.plan_file:
+            plan = ReconciliationPlan.from_json(json.loads(Path(request.plan_file).read_text()))
+        else:
+            plan = self.make_plan(request)
+        self.print_plan(plan, request.output)
+        if not plan.entries or request.dry_run:
+            return
+        self.check_policy(request, sorted({entry.resource for entry in plan.entries}))
+        firewalls, summary = self.reconciler(request).apply(plan, request.parallel)
+        print(
+            f"Applied: {firewalls} firewall(s), alarms: {summary.puts} set, {summary.deletes} deleted, "
+            f"{summary.retries} retries"
+        )
+
     @classmethod
-    def read_alarms(cls, server: Server) -> list[AlarmDefinition]:
-        result: list[AlarmDefinition] = []
-        alarms_file = Path(f"{Path(__file__).parent}/secrets/aws_alarms.json")
-        if alarms_file.exists() is True:
-            alarms = json.loads(alarms_file.read_text())
-
-            tags = [cls.ALL_SERVER]
-            tags += [f"{tag['key']}:{tag['value']}" for tag in server.tags if "value" in tag]
-            tags += [tag["key"] for tag in server.tags if "value" not in tag]
-
-            for alarm in alarms:
-                key = alarm["tagKey"] or cls.ALL_SERVER
-                if alarm["tagValue"]:
-                    key = f"{alarm['tagKey']}:{alarm['tagValue']}"
-                if key not in tags:
-                    continue
-
-                result.append(
-                    AlarmDefinition(
-                        name=f"{server.name}_{alarm['alarmName']}",
-                        server=server.name,
-                        metric=alarm["metricName"],
-                        threshold=alarm["threshold"],
-                        evaluation_periods=alarm["evaluationPeriods"],
-                        datapoints_to_alarm=alarm["datapointsToAlarm"],
-                        operator=alarm["comparisonOperator"],
-                    )
+    def print_plan(cls, plan: ReconciliationPlan, output: str):
+        if output == TableRenderer.JSON:
+            print(json.dumps(plan.to_json()))
+            return
+        columns = [
+            PrintColumn(label="region", alignment=PrintColumn.left(), size=9, formatter=lambda x: x.region),
+            PrintColumn(label="server", alignment=PrintColumn.left(), size=32, formatter=lambda x: x.server),
+            PrintColumn(label="resource", alignment=PrintColumn.left(), size=8, formatter=lambda x: x.resource),
+            PrintColumn(label="change", alignment=PrintColumn.left(), size=5, formatter=lambda x: x.details),
+        ]
+        if plan.entries or TableRenderer.machine_readable(output):
+            cls.print_table(columns, plan.entries, output)
+        if TableRenderer.machine_readable(output) is False:
+            print(
+                f"Plan: {len(plan.entries)} change(s), {plan.unchanged} unchanged, "
+                f"{plan.skipped} skipped (in line according to the journal)"
+            )
+
+    def show_metrics(self, request: RequestParameter):
+        from aws.metric_statistics import MetricStatistics
+
+        servers = self.light_sail.list_servers(request.tag)
+        rules = {server.name: self.policy.alarm_rules_for(server) for server in servers}
+        metrics = [metric.strip() for metric in request.metrics.split(",") if metric.strip()]
+        if not metrics:
+            metrics = sorted({rule.metric for server_rules in rules.values() for rule in server_rules})
+        series = self.light_sail.list_metrics(
+            servers, metrics or ["CPUUtilization"], request.window * 3600, request.period, request.parallel
+        )
+        statistics = MetricStatistics(series)
+        columns = [
+            PrintColumn(label="region", alignment=PrintColumn.left(), size=9, formatter=lambda x: x.region),
+            PrintColumn(label="server", alignment=PrintColumn.left(), size=32, formatter=lambda x: x.server),
+            PrintColumn(label="metric", alignment=PrintColumn.left(), size=16, formatter=lambda x: x.metric),
+            PrintColumn(label="datapoints", alignment=PrintColumn.right(), size=4, formatter=lambda x: x.datapoints),
+            PrintColumn(label="p50", alignment=PrintColumn.right(), size=6, formatter=lambda x: f"{x.p50:.2f}"),
+            PrintColumn(label="p95", alignment=PrintColumn.right(), size=6, formatter=lambda x: f"{x.p95:.2f}"),
+            PrintColumn(label="max", alignment=PrintColumn.right(), size=6, formatter=lambda x: f"{x.max:.2f}"),
+        ]
+        if request.threshold is not None:
+            columns.append(
+                PrintColumn(
+                    label=f"above {request.threshold:g} (min.)",
+                    alignment=PrintColumn.right(),
+                    size=4,
+                    formatter=lambda x: f"{x.above / 60:.0f}",
                 )
-        return result
+            )
+        columns.append(
+            PrintColumn(
+                label="triggers", alignment=PrintColumn.left(), size=5, formatter=lambda x: ",".join(x.triggered)
+            )
+        )
+        summaries = statistics.summaries(rules, request.threshold)
+        summaries.sort(key=lambda x: (x.server == MetricStatistics.FLEET, x.region, x.server, x.metric))
+        self.print_table(columns, summaries, request.output)
+        evaluations = statistics.evaluate(rules)
+        if evaluations and TableRenderer.machine_readable(request.output) is False:
+            columns = [
+                PrintColumn(label="alarm", alignment=PrintColumn.left(), size=16, formatter=lambda x: x.alarm),
+                PrintColumn(label="metric", alignment=PrintColumn.left(), size=16, formatter=lambda x: x.metric),
+                PrintColumn(
+                    label="condition",
+                    alignment=PrintColumn.left(),
+                    size=12,
+                    formatter=lambda x: f"{'>' if x.operator.startswith('Greater') else '<'} {x.threshold:g}, "
+                    f"{x.datapoints_to_alarm} of {x.evaluation_periods}",
+                ),
+                PrintColumn(
+                    label="triggered",
+                    alignment=PrintColumn.right(),
+                    size=5,
+                    formatter=lambda x: f"{len(x.triggered)}/{x.servers}",
+                ),
+                PrintColumn(
+                    label="in breach (min.)",
+                    alignment=PrintColumn.right(),
+                    size=4,
+                    formatter=lambda x: f"{x.breaching / 60:.0f}",
+                ),
+                PrintColumn(
+                    label="servers", alignment=PrintColumn.left(), size=5, formatter=lambda x: ",".join(x.triggered)
+                ),
+            ]
+            print(f"Alarms over the last {request.window}h (datapoints of {request.period}s):")
+            self.print_table(columns, sorted(evaluations, key=lambda x: (x.metric, x.alarm)))
+
+    def stored_servers(self, store: SnapshotStore, tag: str, since: float, until: float) -> set[str] | None:
+        # the servers selected by the tags they had in the period, None = all
+        if not tag:
+            return None
+        index = store.tag_index(list(self.light_sail.light_sails.keys()), since, until)
+        return TagSelector(tag).select(index)
+
+    @classmethod
+    def server_change_columns(cls) -> list[PrintColumn]:
+        return [
+            PrintColumn(label="time", alignment=PrintColumn.left(), size=25, formatter=lambda x: x.time),
+            PrintColumn(label="region", alignment=PrintColumn.left(), size=9, formatter=lambda x: x.region),
+            PrintColumn(label="server", alignment=PrintColumn.left(), size=32, formatter=lambda x: x.server),
+            PrintColumn(label="change", alignment=PrintColumn.center(), size=8, formatter=lambda x: x.change),
+            PrintColumn(label="before", alignment=PrintColumn.left(), size=16, formatter=lambda x: x.before),
+            PrintColumn(label="after", alignment=PrintColumn.left(), size=16, formatter=lambda x: x.after),
+        ]
+
+    def show_history(self, request: RequestParameter):
+        # from the recorded snapshots only, no API call
+        from aws.snapshot_store import SnapshotStore
+
+        store = SnapshotStore()
+        until = time()
+        since = until - request.since * 3600
+        regions = list(self.light_sail.light_sails.keys())
+        names = self.stored_servers(store, request.tag, since, until)
+        changes = [x for x in store.history(regions, since, until) if names is None or x.server in names]
+        self.print_table(self.server_change_columns(), changes, request.output)
+        transitions = [x for x in store.alarm_history(regions, since, until) if names is None or x.server in names]
+        self.print_table(self.alarm_transition_columns(), transitions, request.output)
+
+    def show_diff(self, request: RequestParameter):
+        from aws.snapshot_store import SnapshotStore
+
+        store = SnapshotStore()
+        until = time()
+        since = until - request.since * 3600
+        names = self.stored_servers(store, request.tag, since, until)
+        changes = store.diff(list(self.light_sail.light_sails.keys()), since, until)
+        changes = [x for x in changes if names is None or x.server in names]
+        self.print_table(self.server_change_columns(), changes, request.output)
+        if TableRenderer.machine_readable(request.output) is False:
+            for region, (before, after) in store.compared.items():
+                print(f"Servers of {region}: the snapshot of {before} compared with the one of {after}")
 
     def run_command(self, request: RequestParameter):
         command = request.command
         if not request.command:
             command = input("Type the command:")
         if command:
-            queue: Queue = Queue()
-            processes = [
-                Process(target=self.light_sail.run_command, args=[queue, server.name, server.external_ip, command])
-                for server in self.light_sail.list_servers(request.tag_key, request.tag_value)
-            ]
-            for process in processes:
-                process.start()
+            servers = self.light_sail.list_servers(request.tag)
+            executor = self.ssh_executor(request, servers)
+            grouper = self.output_grouper(request, servers)
+            if not request.batch_size and request.canary <= 0:
+                self.print_responses(executor.run(servers, command), request.stream, grouper)
+                return
+            batch_size = self.batch_size(request.batch_size, len(servers)) or request.parallel
+            responses = executor.rolling(
+                servers,
+                command,
+                min(batch_size, request.parallel),
+                request.canary,
+                request.pause,
+                request.max_failure_rate / 100,
+            )
+            self.print_responses(responses, request.stream, grouper)
+            if executor.skipped:
+                print(
+                    f"Aborted, {len(executor.skipped)} server(s) not run: "
+                    + ", ".join(server.name for server in executor.skipped)
+                )
+
+    def run_script(self, request: RequestParameter):
+        servers = self.light_sail.list_servers(request.tag)
+        responses = self.ssh_executor(request, servers).script(servers, Path(request.source), request.arguments)
+        self.print_responses(responses, request.stream, self.output_grouper(request, servers))
 
-            while any([process.is_alive() for process in processes]):
-                self.print_queue(queue)
-                sleep(0.1)
-            # last chance
-            self.print_queue(queue)
+    def push_file(self, request: RequestParameter):
+        servers = self.light_sail.list_servers(request.tag)
+        executor = self.ssh_executor(request, servers)
+        executor.on_line = None  # the transfers have no output to stream
+        responses = executor.push(
+            servers, Path(request.source), request.destination, request.bandwidth, request.dry_run
+        )
+        self.print_responses(responses)
+        if executor.unchanged:
+            print(f"Unchanged: {len(executor.unchanged)} server(s) already had an identical file")
 
     @classmethod
-    def print_queue(cls, queue: Queue):
-        while not queue.empty():
-            response = queue.get()
-            print(f"--- {response.server} ---")
-            print("\n".join(response.response))
+    def batch_size(cls, value: str, servers: int) -> int:
+        # a number of servers, or a percentage of them (at least one), 0 if invalid
+        match = cls.BATCH_SIZE.match(value.strip())
+        if match is None or int(match.group(1)) == 0:
+            return 0
+        if match.group(2):
+            return max(1, int(match.group(1)) * servers // 100)
+        return int(match.group(1))
+
+    def connect_servers(self, request: RequestParameter):
+        servers = self.light_sail.list_servers(request.tag)
+        self.print_responses(self.ssh_executor(request, servers).connect(servers))
+
+    def disconnect_servers(self, request: RequestParameter):
+        servers = self.light_sail.list_servers(request.tag)
+        self.print_responses(self.ssh_executor(request, servers).disconnect(servers))
+
+    def run_daemon(self, request: RequestParameter):
+        from aws.inventory_daemon import InventoryDaemon
+
+        daemon = InventoryDaemon(self.light_sail, request.interval)
+        regions = ", ".join(self.light_sail.light_sails.keys())
+        print(f"Serving {regions} on {daemon.socket_path}, refreshed every {request.interval}s", file=sys.stderr)
+        try:
+            daemon.serve()
+        except KeyboardInterrupt:
+            pass
+
+    def ssh_executor(self, request: RequestParameter, servers: list[Server]) -> SshExecutor:
+        from aws.ssh_executor import SshExecutor
+
+        return SshExecutor(
+            ssh_keys=self.light_sail.get_ssh_keys(servers),
+            parallel=request.parallel,
+            connect_timeout=request.connect_timeout,
+            command_timeout=request.command_timeout,
+            control_persist=request.persist,
+            instrumentation=self.instrumentation,
+            max_lines=request.max_lines,
+            log_directory=Path(request.log_dir) if request.log_dir else None,
+            on_line=self.print_line if request.stream else None,
+        )
+
+    @classmethod
+    def print_profile(cls, instrumentation: Instrumentation):
+        columns = [
+            PrintColumn(label="operation", alignment=PrintColumn.left(), size=16, formatter=lambda x: x.operation),
+            PrintColumn(label="calls", alignment=PrintColumn.right(), size=5, formatter=lambda x: x.calls),
+            PrintColumn(label="errors", alignment=PrintColumn.right(), size=3, formatter=lambda x: x.errors),
+            PrintColumn(label="retries", alignment=PrintColumn.right(), size=3, formatter=lambda x: x.retries),
+            PrintColumn(
+                label="total (sec.)", alignment=PrintColumn.right(), size=6, formatter=lambda x: f"{x.total:.3f}"
+            ),
+            PrintColumn(label="p50", alignment=PrintColumn.right(), size=6, formatter=lambda x: f"{x.p50:.3f}"),
+            PrintColumn(label="p95", alignment=PrintColumn.right(), size=6, formatter=lambda x: f"{x.p95:.3f}"),
+            PrintColumn(label="p99", alignment=PrintColumn.right(), size=6, formatter=lambda x: f"{x.p99:.3f}"),
+            PrintColumn(label="max", alignment=PrintColumn.right(), size=6, formatter=lambda x: f"{x.max:.3f}"),
+            PrintColumn(label="bytes", alignment=PrintColumn.right(), size=6, formatter=lambda x: x.size),
+        ]
+        # on stderr, not to interfere with the machine-readable outputs
+        TableRenderer(columns, TableRenderer.TABLE, out=sys.stderr).render(instrumentation.profiles())
+
+    @classmethod
+    def print_line(cls, server: str, line: str):
+        print(f"[{server}] {line}", flush=True)
+
+    @classmethod
+    def print_responses(
+        cls, responses: Iterator[SshCommandResponse], streamed: bool = False, grouper: OutputGrouper | None = None
+    ):
+        # the streamed outputs were already printed line by line, the grouped ones are printed once per group
+        received: list[SshCommandResponse] = []
+        for response in responses:
+            if grouper is not None:
+                received.append(grouper.add(response))
+                continue
+            if streamed is False:
+                cls.print_response(response)
+            received.append(response)
+        if grouper is not None:
+            cls.print_groups(grouper)
+        cls.print_summary(received)
+
+    @classmethod
+    def output_grouper(cls, request: RequestParameter, servers: list[Server]) -> OutputGrouper | None:
+        if request.group is False:
+            return None
+        from aws.output_grouper import OutputGrouper
+
+        return OutputGrouper(servers, request.normalize)
+
+    @classmethod
+    def print_groups(cls, grouper: OutputGrouper):
+        for group in grouper.sorted_groups():
+            exit_code = f", exit code {group.exit_code}" if group.exit_code else ""
+            print(f"--- {len(group.servers)} server(s){exit_code} ---")
+            print(f"servers: {', '.join(sorted(group.servers))}")
+            print("\n".join(group.response))
+        print(f"Distinct outputs: {len(grouper.groups)}")
+
+    @classmethod
+    def print_response(cls, response: SshCommandResponse):
+        exit_code = f", exit code {response.exit_code}" if response.exit_code else ""
+        print(f"--- {response.server} ({response.elapsed:1.2f}s{exit_code}) ---")
+        if response.dropped:
+            print(f"*** {response.dropped} line(s) not kept")
+        print("\n".join(response.response))
+
+    @classmethod
+    def print_summary(cls, responses: list[SshCommandResponse]):
+        if not responses:
+            return
+        columns = [
+            PrintColumn(label="slowest servers", alignment=PrintColumn.left(), size=32, formatter=lambda x: x.server),
+            PrintColumn(
+                label="elapsed (sec.)", alignment=PrintColumn.right(), size=6, formatter=lambda x: f"{x.elapsed:1.2f}"
+            ),
+        ]
+        slowest = sorted(responses, key=lambda x: x.elapsed, reverse=True)[: cls.SLOWEST_HOSTS]
+        cls.print_table(columns, slowest)
+        failed = sorted((x for x in responses if x.exit_code), key=lambda x: x.server)
+        if failed:
+            columns = [
+                PrintColumn(
+                    label="failed servers", alignment=PrintColumn.left(), size=32, formatter=lambda x: x.server
+                ),
+                PrintColumn(label="exit code", alignment=PrintColumn.right(), size=3, formatter=lambda x: x.exit_code),
+                PrintColumn(
+                    label="last line",
+                    alignment=PrintColumn.left(),
+                    size=5,
+                    formatter=lambda x: x.response[-1] if x.response else "",
+                ),
+            ]
+            cls.print_table(columns, failed)
+        elapsed = [response.elapsed for response in responses]
+        print(
+            f"Servers: {len(responses)}, "
+            f"failed: {len(failed)}, "
+            f"average: {sum(elapsed) / len(elapsed):1.2f}s, "
+            f"max: {max(elapsed):1.2f}s"
+        )
 
 
 if __name__ == "__main__":
     start = monotonic()
-    Menu.run(Menu(LightSail("us-west-2")))
-    # Menu.run(Menu(LightSail("eu-west-3")))
-    print(f"Time: {monotonic() - start:1.2f}s")
+    Menu.run()
+    print(f"Time: {monotonic() - start:1.2f}s", file=sys.stderr)
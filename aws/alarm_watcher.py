@@ -0,0 +1,87 @@
+import os
+import sys
+from datetime import datetime
+from subprocess import TimeoutExpired, run
+from threading import Event
+from typing import Iterator
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from aws.immutable.alarm_response import AlarmResponse
+from aws.immutable.alarm_transition import AlarmTransition
+from aws.immutable.server import Server
+from aws.light_sail_regions import LightSailRegions
+
+
+class AlarmWatcher:
+    HOOK_TIMEOUT = 30  # sec.
+
+    def __init__(
+        self,
+        light_sail: LightSailRegions,
+        servers: list[Server],
+        fast_interval: int,
+        slow_interval: int,
+        hook: str = "",
+    ) -> None:
+        self.light_sail = light_sail
+        self.servers = servers
+        self.fast_interval = fast_interval  # between the polls while an alarm is in ALARM (sec.)
+        self.slow_interval = slow_interval  # between the polls while no alarm is in ALARM (sec.)
+        self.hook = hook  # the shell command run on each transition, described by the ALARM_* variables
+        self.states: dict[tuple[str, str], AlarmResponse] | None = None  # per region and name, None before the poll
+        self.stop = Event()
+
+    def transitions(self, alarms: list[AlarmResponse], now: str) -> list[AlarmTransition]:
+        # the first poll only reports the alarms not OK, then the changes since the previous poll
+        current = {(alarm.region, alarm.name): alarm for alarm in alarms}
+        previous, self.states = self.states, current
+        result: list[AlarmTransition] = []
+        if previous is None:
+            for alarm in current.values():
+                if alarm.state != "OK":
+                    result.append(AlarmTransition.of(now, alarm, AlarmTransition.initial(), "", alarm.state))
+        else:
+            for key, alarm in current.items():
+                if key not in previous:
+                    result.append(AlarmTransition.of(now, alarm, AlarmTransition.added(), "", alarm.state))
+                elif previous[key].state != alarm.state:
+                    change = AlarmTransition.changed()
+                    result.append(AlarmTransition.of(now, alarm, change, previous[key].state, alarm.state))
+            for key, alarm in previous.items():
+                if key not in current:
+                    result.append(AlarmTransition.of(now, alarm, AlarmTransition.removed(), alarm.state, ""))
+        return sorted(result, key=lambda x: (x.server, x.name))
+
+    def interval(self) -> int:
+        # faster while something is wrong
+        if any(alarm.state == "ALARM" for alarm in (self.states or {}).values()):
+            return self.fast_interval
+        return self.slow_interval
+
+    def watch(self) -> Iterator[AlarmTransition]:
+        # until stopped, the failed polls are retried at the fast interval
+        while self.stop.is_set() is False:
+            try:
+                alarms = self.light_sail.list_alarms(self.servers)
+            except (BotoCoreError, ClientError) as exc:
+                print(f"the alarms could not be read: {exc}", file=sys.stderr)
+                self.stop.wait(self.fast_interval)
+                continue
+            now = datetime.now().astimezone().isoformat(timespec="seconds")
+            for transition in self.transitions(alarms, now):
+                yield transition
+                self.run_hook(transition)
+            self.stop.wait(self.interval())
+
+    def run_hook(self, transition: AlarmTransition):
+        if not self.hook:
+            return
+        environment = os.environ | {f"ALARM_{key.upper()}": value for key, value in transition._asdict().items()}
+        try:
+            exit_code = run(self.hook, shell=True, env=environment, timeout=self.HOOK_TIMEOUT, check=False).returncode
+            failure = f"exit code {exit_code}" if exit_code else ""
+        except TimeoutExpired:
+            failure = f"timed out after {self.HOOK_TIMEOUT}s"
+        if failure:
+            print(f"the hook failed for {transition.name}: {failure}", file=sys.stderr)
@@ -0,0 +1,173 @@
+import asyncio
+from collections import deque
+from time import monotonic
+from typing import Any, Callable, TypeVar
+
+from aws.immutable.alarm_apply_summary import AlarmApplySummary
+from aws.immutable.alarm_response import AlarmResponse
+from aws.immutable.port import Port
+from aws.immutable.server import Server
+from aws.immutable.ssh_command_response import SshCommandResponse
+from aws.light_sail_regions import LightSailRegions
+from aws.lightsail import LightSail
+from aws.mutable.alarm_definition import AlarmDefinition
+from aws.ssh_executor import SshExecutor
+
+T = TypeVar("T")
+
+
+class AsyncLightSail:
+    def __init__(
+        self, light_sail: LightSailRegions, parallel: int = 20, ssh_executor: SshExecutor | None = None
+    ) -> None:
+        # boto3 is synchronous, its calls run in threads; the SSH sessions are asyncio subprocesses;
+        # both are limited by the same semaphore
+        self.light_sail = light_sail
+        self.semaphore = asyncio.Semaphore(max(1, parallel))
+        self.ssh_executor = ssh_executor
+
+    async def _call(self, function: Callable[..., T], *args, **kwargs) -> T:
+        async with self.semaphore:
+            return await asyncio.to_thread(function, *args, **kwargs)
+
+    @classmethod
+    def _per_region(cls, servers: list[Server]) -> dict[str, list[Server]]:
+        result: dict[str, list[Server]] = {}
+        for server in servers:
+            result.setdefault(server.region, []).append(server)
+        return result
+
+    async def list_servers(self, tag: str) -> list[Server]:
+        responses = await asyncio.gather(
+            *[self._call(light_sail.list_servers, tag) for light_sail in self.light_sail.light_sails.values()]
+        )
+        return [server for servers in responses for server in servers]
+
+    async def list_alarms(self, servers: list[Server]) -> list[AlarmResponse]:
+        per_region = self._per_region(servers)
+        responses = await asyncio.gather(
+            *[
+                self._call(self.light_sail.light_sails[region].list_alarms, [server.name for server in region_servers])
+                for region, region_servers in per_region.items()
+            ]
+        )
+        return [alarm for alarms in responses for alarm in alarms]
+
+    async def set_alarms(self, servers: list[Server], alarms: list[AlarmDefinition]) -> AlarmApplySummary:
+        # the changes are computed per region, then all the writes are made concurrently
+        start = monotonic()
+        per_region = self._per_region(servers)
+        light_sails = [self.light_sail.light_sails[region] for region in per_region]
+        retries = sum(light_sail.rate_limiter.retries for light_sail in light_sails)
+        per_server: dict[str, list[AlarmDefinition]] = {}
+        for alarm in alarms:
+            per_server.setdefault(alarm.server, []).append(alarm)
+        changes = await asyncio.gather(
+            *[
+                self._call(
+                    light_sail.alarm_changes,
+                    [server.name for server in per_region[light_sail.region]],
+                    [alarm for server in per_region[light_sail.region] for alarm in per_server.get(server.name, [])],
+                )
+                for light_sail in light_sails
+            ]
+        )
+        writes: list[Any] = []
+        puts = 0
+        deletes = 0
+        for light_sail, (json_alarms, names) in zip(light_sails, changes):
+            writes += [
+                self._write(light_sail, light_sail.client.put_alarm, **json_alarm) for json_alarm in json_alarms
+            ]
+            writes += [self._write(light_sail, light_sail.client.delete_alarm, alarmName=name) for name in names]
+            puts += len(json_alarms)
+            deletes += len(names)
+        await asyncio.gather(*writes)
+        return AlarmApplySummary(
+            puts=puts,
+            deletes=deletes,
+            retries=sum(light_sail.rate_limiter.retries for light_sail in light_sails) - retries,
+            elapsed=monotonic() - start,
+        )
+
+    async def _write(self, light_sail: LightSail, function: Callable, **kwargs) -> Any:
+        return await self._call(light_sail.rate_limiter.call, function, **kwargs)
+
+    async def set_rules(self, server: Server, rules: list[Port]):
+        await self._call(self.light_sail.set_rules, server, rules)
+
+    async def run_command(self, servers: list[Server], command: str) -> list[SshCommandResponse]:
+        if self.ssh_executor is None:
+            self.ssh_executor = SshExecutor(ssh_keys={}, parallel=1, connect_timeout=10, command_timeout=0)
+        executor = self.ssh_executor
+        missing = [server for server in servers if server.region not in executor.ssh_keys]
+        if missing:
+            executor.ssh_keys |= await self._call(self.light_sail.get_ssh_keys, missing)
+        return await asyncio.gather(
+            *[
+                self._execute(
+                    server, executor.ssh_arguments(executor.ssh_keys[server.region], server.external_ip, command)
+                )
+                for server in servers
+            ]
+        )
+
+    async def _execute(self, server: Server, arguments: list[str]) -> SshCommandResponse:
+        # as SshExecutor._execute, only the last max_lines are kept in memory
+        assert self.ssh_executor is not None
+        executor = self.ssh_executor
+        lines: deque[str] = deque(maxlen=executor.max_lines or None)
+        received = 0
+        log_file = executor.log_file(server)
+
+        def add(raw: bytes):
+            nonlocal received
+            line = raw.decode("utf-8", errors="replace").rstrip("\r")
+            lines.append(line)
+            received += 1
+            if executor.on_line is not None:
+                executor.on_line(server.name, line)
+
+        async def read(stream: asyncio.StreamReader):
+            pending = b""
+            while chunk := await stream.read(SshExecutor.MAX_LINE):
+                if log_file is not None:
+                    log_file.write(chunk)
+                *complete, pending = (pending + chunk).split(b"\n")
+                for raw in complete:
+                    add(raw)
+                while len(pending) >= SshExecutor.MAX_LINE:
+                    add(pending[: SshExecutor.MAX_LINE])
+                    pending = pending[SshExecutor.MAX_LINE :]
+            if pending:
+                add(pending)
+
+        async with self.semaphore:
+            start = monotonic()
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *arguments, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+                )
+                assert process.stdout is not None
+                try:
+                    await asyncio.wait_for(read(process.stdout), executor.command_timeout or None)
+                    exit_code = await process.wait()
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await process.wait()
+                    exit_code = SshExecutor.EXIT_TIMEOUT
+                    lines.append(f"*** timed out after {executor.command_timeout}s")
+                    received += 1
+            finally:
+                if log_file is not None:
+                    log_file.close()
+            elapsed = monotonic() - start
+        if executor.instrumentation is not None:
+            executor.instrumentation.record("ssh", elapsed, error=exit_code != 0)
+        return SshCommandResponse(
+            server=f"{server.name} ({server.external_ip})",
+            response=list(lines),
+            elapsed=elapsed,
+            exit_code=exit_code,
+            dropped=received - len(lines),
+        )
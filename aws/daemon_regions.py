@@ -0,0 +1,70 @@
+import json
+import socket
+from pathlib import Path
+from typing import Any
+
+from aws.immutable.alarm_response import AlarmResponse
+from aws.immutable.alarm_scan import AlarmScan
+from aws.immutable.server import Server
+from aws.instrumentation import Instrumentation
+from aws.inventory_daemon import InventoryDaemon
+from aws.light_sail_regions import LightSailRegions
+from aws.snapshot_store import SnapshotStore
+
+
+class DaemonRegions(LightSailRegions):
+    TIMEOUT = 5.0  # sec.
+
+    def __init__(
+        self,
+        regions: list[str],
+        cache_ttl: int = 0,
+        refresh: bool = False,
+        clients: dict[str, Any] | None = None,
+        instrumentation: Instrumentation | None = None,
+        socket_path: Path | None = None,
+        snapshots: SnapshotStore | None = None,
+    ) -> None:
+        # the queries are answered by the inventory daemon when running, by the API otherwise
+        super().__init__(regions, cache_ttl, refresh, clients, instrumentation, snapshots)
+        self.socket_path = socket_path or InventoryDaemon.default_socket()
+        self.alarms_served: set[str] = set()  # the regions of the alarms provided by the daemon
+
+    def query(self, request: dict) -> dict | None:
+        if self.socket_path.exists() is False:
+            return None
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                connection.settimeout(self.TIMEOUT)
+                connection.connect(str(self.socket_path))
+                connection.sendall(json.dumps(request).encode() + b"\n")
+                with connection.makefile("rb") as reader:
+                    response = json.loads(reader.readline())
+        except (OSError, ValueError):
+            return None
+        if "error" in response:
+            return None
+        return response
+
+    def invalidate(self) -> bool:
+        # after a change, the daemon must not answer from the snapshot taken before it
+        return self.query({"query": "invalidate", "regions": list(self.light_sails.keys())}) is not None
+
+    def list_servers(self, tag: str) -> list[Server]:
+        response = self.query({"query": "servers", "regions": list(self.light_sails.keys()), "tag": tag})
+        if response is None:
+            return super().list_servers(tag)
+        return [Server.from_json(server) for server in response["servers"]]
+
+    def list_alarms(self, servers: list[Server]) -> list[AlarmResponse]:
+        response = self.query({"query": "alarms", "servers": [[server.region, server.name] for server in servers]})
+        if response is None:
+            return super().list_alarms(servers)
+        self.alarms_served = {server.region for server in servers}
+        return [AlarmResponse(**alarm) for alarm in response["alarms"]]
+
+    def alarm_scans(self) -> dict[str, AlarmScan]:
+        result = super().alarm_scans()
+        for region in self.alarms_served:
+            result[region] = AlarmScan(strategy=AlarmScan.daemon(), pages=0)
+        return result
@@ -0,0 +1,8 @@
+from typing import NamedTuple
+
+
+class AlarmApplySummary(NamedTuple):
+    puts: int
+    deletes: int
+    retries: int
+    elapsed: float
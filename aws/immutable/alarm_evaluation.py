@@ -0,0 +1,13 @@
+from typing import NamedTuple
+
+
+class AlarmEvaluation(NamedTuple):
+    alarm: str
+    metric: str
+    operator: str
+    threshold: float
+    evaluation_periods: int
+    datapoints_to_alarm: int
+    servers: int  # the number of servers evaluated
+    triggered: list[str]
+    breaching: float  # sec. in breach, for all the servers
@@ -1,5 +1,7 @@
 from typing import NamedTuple
 
+from aws.mutable.alarm_definition import AlarmDefinition
+
 
 class AlarmResponse(NamedTuple):
     name: str
@@ -13,6 +15,18 @@ class AlarmResponse(NamedTuple):
     datapoints_to_alarm: int
     evaluation_periods: int
     operator: str
+    region: str = ""
+
+    def definition(self) -> AlarmDefinition:
+        return AlarmDefinition(
+            name=self.name,
+            server=self.server,
+            metric=self.metric,
+            threshold=self.threshold,
+            evaluation_periods=self.evaluation_periods,
+            datapoints_to_alarm=self.datapoints_to_alarm,
+            operator=self.operator,
+        )
 
     def __eq__(self, other):
         assert isinstance(other, AlarmResponse)
@@ -0,0 +1,23 @@
+from typing import NamedTuple
+
+from aws.mutable.alarm_definition import AlarmDefinition
+
+
+class AlarmRule(NamedTuple):
+    name: str
+    metric: str
+    operator: str
+    threshold: float
+    evaluation_periods: int
+    datapoints_to_alarm: int
+
+    def definition(self, server: str) -> AlarmDefinition:
+        return AlarmDefinition(
+            name=f"{server}_{self.name}",
+            server=server,
+            metric=self.metric,
+            threshold=self.threshold,
+            evaluation_periods=self.evaluation_periods,
+            datapoints_to_alarm=self.datapoints_to_alarm,
+            operator=self.operator,
+        )
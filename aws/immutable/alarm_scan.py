@@ -0,0 +1,18 @@
+from typing import NamedTuple
+
+
+class AlarmScan(NamedTuple):
+    strategy: str
+    pages: int
+
+    @classmethod
+    def per_server(cls) -> str:
+        return "per server"
+
+    @classmethod
+    def full_scan(cls) -> str:
+        return "full scan"
+
+    @classmethod
+    def daemon(cls) -> str:
+        return "from the daemon"
@@ -0,0 +1,43 @@
+from typing import NamedTuple
+
+from aws.immutable.alarm_response import AlarmResponse
+
+
+class AlarmTransition(NamedTuple):
+    time: str
+    region: str
+    server: str
+    name: str
+    metric: str
+    change: str
+    previous: str  # the previous state, "" when initial or added
+    state: str  # "" when removed
+
+    @classmethod
+    def initial(cls) -> str:
+        return "initial"
+
+    @classmethod
+    def added(cls) -> str:
+        return "added"
+
+    @classmethod
+    def removed(cls) -> str:
+        return "removed"
+
+    @classmethod
+    def changed(cls) -> str:
+        return "changed"
+
+    @classmethod
+    def of(cls, now: str, alarm: AlarmResponse, change: str, previous: str, state: str) -> "AlarmTransition":
+        return AlarmTransition(
+            time=now,
+            region=alarm.region,
+            server=alarm.server,
+            name=alarm.name,
+            metric=alarm.metric,
+            change=change,
+            previous=previous,
+            state=state,
+        )
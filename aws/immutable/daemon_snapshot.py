@@ -0,0 +1,12 @@
+from typing import NamedTuple
+
+from aws.immutable.alarm_response import AlarmResponse
+from aws.immutable.server import Server
+from aws.tag_index import TagIndex
+
+
+class DaemonSnapshot(NamedTuple):
+    servers: list[Server]
+    tag_index: TagIndex
+    alarms: list[AlarmResponse]
+    refreshed: float  # timestamp
@@ -0,0 +1,15 @@
+from collections.abc import Sequence
+from typing import NamedTuple
+
+from aws.immutable.port import Port
+
+
+class FirewallChange(NamedTuple):
+    server: str
+    region: str
+    current: Sequence[Port]
+    desired: list[Port]
+    eliminated: int = 0  # the desired rules eliminated by the compaction
+
+    def changed(self) -> bool:
+        return Port.hashed_rules(self.current) != Port.hashed_rules(self.desired)
@@ -6,3 +6,4 @@ class FirewallRule(NamedTuple):
     port: int
     protocol: str
     rules: list[str]
+    region: str = ""
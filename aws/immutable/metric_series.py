@@ -0,0 +1,10 @@
+from typing import NamedTuple
+
+
+class MetricSeries(NamedTuple):
+    server: str
+    region: str
+    metric: str
+    period: int  # sec. between the datapoints
+    timestamps: list[float]
+    values: list[float]
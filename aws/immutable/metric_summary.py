@@ -0,0 +1,13 @@
+from typing import NamedTuple
+
+
+class MetricSummary(NamedTuple):
+    server: str
+    region: str
+    metric: str
+    datapoints: int
+    p50: float
+    p95: float
+    max: float
+    above: float  # sec. above the threshold
+    triggered: list[str]  # the alarms that would have been triggered
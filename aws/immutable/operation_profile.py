@@ -0,0 +1,14 @@
+from typing import NamedTuple
+
+
+class OperationProfile(NamedTuple):
+    operation: str
+    calls: int
+    errors: int
+    retries: int
+    total: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+    size: int  # bytes received
@@ -0,0 +1,18 @@
+from typing import NamedTuple
+
+
+class PlanEntry(NamedTuple):
+    server: str
+    region: str
+    resource: str
+    live: str  # the hash of the live state, when planned
+    desired: str  # the hash of the policy
+    details: str
+
+    @classmethod
+    def firewall(cls) -> str:
+        return "firewall"
+
+    @classmethod
+    def alarms(cls) -> str:
+        return "alarms"
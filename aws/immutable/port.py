@@ -0,0 +1,53 @@
+import hashlib
+import json
+import sys
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+
+@dataclass(frozen=True, slots=True)
+class Port:
+    # {'fromPort': 80, 'toPort': 80, 'protocol': 'tcp', 'accessFrom': 'Anywhere (0.0.0.0/0 and ::/0)', 'accessType': 'public', 'commonName': '', 'accessDirection': 'inbound', 'cidrs': ['0.0.0.0/0'], 'ipv6Cidrs': ['::/0'], 'cidrListAliases': []
+    FromPort: int
+    ToPort: int
+    Protocol: str
+    Cidrs: Sequence[str]  # kept as a tuple
+    _hashed: str = field(default="", init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # the protocols and the CIDRs repeat across the fleet, a single copy of each is kept
+        object.__setattr__(self, "Protocol", sys.intern(self.Protocol))
+        object.__setattr__(self, "Cidrs", tuple(sys.intern(cidr) for cidr in self.Cidrs))
+
+    def to_json(self) -> dict:
+        return {
+            'fromPort': self.FromPort,
+            'toPort': self.ToPort,
+            'protocol': self.Protocol,
+            "cidrs": list(self.Cidrs),
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Port":
+        return cls.shared(data["fromPort"], data["toPort"], data["protocol"], tuple(data["cidrs"]))
+
+    @classmethod
+    @lru_cache(maxsize=4096)
+    def shared(cls, from_port: int, to_port: int, protocol: str, cidrs: tuple[str, ...]) -> "Port":
+        # the same rules repeat across the fleet, being immutable a single instance of each is kept
+        return cls(FromPort=from_port, ToPort=to_port, Protocol=protocol, Cidrs=cidrs)
+
+    def hashed(self) -> str:
+        # computed once, the rule is immutable
+        if not self._hashed:
+            json_rule = self.to_json() | {"cidrs": sorted(set(self.Cidrs))}
+            hashed = hashlib.md5(json.dumps(json_rule, sort_keys=True).encode()).hexdigest()
+            object.__setattr__(self, "_hashed", hashed)
+        return self._hashed
+
+    @classmethod
+    def hashed_rules(cls, rules: Sequence["Port"]) -> str:
+        # the order and the duplicates of the rules do not matter
+        hashes = sorted({rule.hashed() for rule in rules})
+        return hashlib.md5(",".join(hashes).encode()).hexdigest()
@@ -0,0 +1,24 @@
+from typing import NamedTuple
+
+from aws.immutable.plan_entry import PlanEntry
+
+
+class ReconciliationPlan(NamedTuple):
+    entries: list[PlanEntry]  # the changes only
+    unchanged: int
+    skipped: int  # in line with the policy according to the journal, not read
+
+    def to_json(self) -> dict:
+        return {
+            "entries": [entry._asdict() for entry in self.entries],
+            "unchanged": self.unchanged,
+            "skipped": self.skipped,
+        }
+
+    @classmethod
+    def from_json(cls, content: dict) -> "ReconciliationPlan":
+        return ReconciliationPlan(
+            entries=[PlanEntry(**entry) for entry in content["entries"]],
+            unchanged=content["unchanged"],
+            skipped=content["skipped"],
+        )
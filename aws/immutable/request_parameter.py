@@ -2,6 +2,37 @@ from typing import NamedTuple
 
 
 class RequestParameter(NamedTuple):
-    tag_key: str
-    tag_value: str
+    tag: str
     command: str
+    parallel: int = 20
+    connect_timeout: int = 10
+    command_timeout: int = 0
+    persist: int = 0
+    dry_run: bool = False
+    output: str = "table"
+    metrics: str = ""  # comma separated, default: the metrics of the configured alarms
+    window: int = 24  # hours
+    period: int = 300  # sec.
+    threshold: float | None = None
+    stream: bool = False
+    log_dir: str = ""
+    max_lines: int = 1000  # per server, kept for the summary
+    batch_size: str = ""  # servers at once (n or n%), "" = all, up to parallel
+    canary: int = 0
+    pause: float = 0.0  # sec.
+    max_failure_rate: float = 100.0  # %
+    interval: int = 60  # sec. between the refreshes of the daemon
+    plan_file: str = ""
+    resources: str = "firewall,alarms"
+    refresh: bool = False
+    source: str = ""  # the local file to push, or the local script to run
+    destination: str = ""
+    bandwidth: int = 0  # KB/s, shared by the transfers, 0 = unlimited
+    arguments: str = ""  # of the script
+    watch: bool = False
+    fast_interval: int = 15  # sec. between the polls of the watch while an alarm is in ALARM
+    hook: str = ""  # run on each alarm transition
+    group: bool = False  # the identical outputs are printed once
+    normalize: bool = False  # the server names and the IP addresses are ignored when grouping
+    since: int = 24  # hours of the history and diff views
+    allow_empty_policy: bool = False  # an empty policy removes all the firewall rules or the alarms
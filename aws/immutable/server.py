@@ -0,0 +1,80 @@
+import sys
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+from aws.immutable.port import Port
+
+
+@dataclass(frozen=True, slots=True)
+class Server:
+    name: str
+    tags: dict[str, str] = field(hash=False)  # the key:value tags
+    internal_ip: str
+    external_ip: str
+    firewall: Sequence[Port]  # kept as a tuple
+    state: str
+    cpu: int
+    memory_gb: float
+    region: str = ""
+    flags: tuple[str, ...] = ()  # the tags without value
+    _pair_tags: str = field(default="", init=False, repr=False, compare=False)
+    _single_tags: str = field(default="", init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "firewall", tuple(self.firewall))
+        object.__setattr__(self, "state", sys.intern(self.state))
+        object.__setattr__(self, "region", sys.intern(self.region))
+
+    @classmethod
+    def parse_tags(cls, tags: list[dict[str, str]]) -> tuple[dict[str, str], tuple[str, ...]]:
+        # the key:value tags and the flags, sorted by key, the keys and the values repeat across the fleet
+        pairs: dict[str, str] = {}
+        flags: list[str] = []
+        for tag in sorted(tags, key=lambda x: x["key"]):
+            if "value" in tag:
+                pairs[sys.intern(tag["key"])] = sys.intern(tag["value"])
+            else:
+                flags.append(sys.intern(tag["key"]))
+        return pairs, tuple(flags)
+
+    def pair_tags(self) -> str:
+        # computed once, the server is immutable
+        if not self._pair_tags:
+            tags = ", ".join(f"{key}: {value}" for key, value in self.tags.items())
+            object.__setattr__(self, "_pair_tags", f" {tags}")
+        return self._pair_tags
+
+    def single_tags(self) -> str:
+        if not self._single_tags:
+            object.__setattr__(self, "_single_tags", f" {', '.join(self.flags)}")
+        return self._single_tags
+
+    def to_json(self) -> dict:
+        return {
+            "name": self.name,
+            "tags": [{"key": key, "value": value} for key, value in self.tags.items()]
+            + [{"key": flag} for flag in self.flags],
+            "internalIp": self.internal_ip,
+            "externalIp": self.external_ip,
+            "firewall": [port.to_json() for port in self.firewall],
+            "state": self.state,
+            "cpu": self.cpu,
+            "memoryGb": self.memory_gb,
+            "region": self.region,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Server":
+        tags, flags = cls.parse_tags(data["tags"])
+        return cls(
+            name=data["name"],
+            tags=tags,
+            internal_ip=data["internalIp"],
+            external_ip=data["externalIp"],
+            firewall=tuple(Port.from_json(port) for port in data["firewall"]),
+            state=data["state"],
+            cpu=data["cpu"],
+            memory_gb=data["memoryGb"],
+            region=data["region"],
+            flags=flags,
+        )
@@ -0,0 +1,34 @@
+from typing import NamedTuple
+
+
+class ServerChange(NamedTuple):
+    time: str  # of the later snapshot
+    region: str
+    server: str
+    change: str
+    before: str  # what is no longer there
+    after: str  # what is new
+
+    @classmethod
+    def added(cls) -> str:
+        return "added"
+
+    @classmethod
+    def removed(cls) -> str:
+        return "removed"
+
+    @classmethod
+    def state(cls) -> str:
+        return "state"
+
+    @classmethod
+    def firewall(cls) -> str:
+        return "firewall"
+
+    @classmethod
+    def tags(cls) -> str:
+        return "tags"
+
+    @classmethod
+    def ip(cls) -> str:
+        return "ip"
@@ -4,3 +4,6 @@ from typing import NamedTuple
 class SshCommandResponse(NamedTuple):
     server: str
     response: list[str]
+    elapsed: float = 0.0
+    exit_code: int = 0
+    dropped: int = 0  # the first lines, not kept in memory
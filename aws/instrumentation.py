@@ -0,0 +1,92 @@
+import math
+from threading import Lock
+from time import monotonic
+from typing import Any
+
+from aws.immutable.operation_profile import OperationProfile
+from aws.rate_limiter import RateLimiter
+
+
+class Instrumentation:
+    def __init__(self) -> None:
+        self.elapsed: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.retries: dict[str, int] = {}
+        self.sizes: dict[str, int] = {}
+        self.lock = Lock()
+
+    def record(self, operation: str, elapsed: float, retries: int = 0, size: int = 0, error: bool = False):
+        with self.lock:
+            self.elapsed.setdefault(operation, []).append(elapsed)
+            self.errors[operation] = self.errors.get(operation, 0) + int(error)
+            self.retries[operation] = self.retries.get(operation, 0) + retries
+            self.sizes[operation] = self.sizes.get(operation, 0) + size
+
+    @classmethod
+    def percentile(cls, values: list[float], percent: float) -> float:
+        # nearest rank, on sorted values
+        if not values:
+            return 0.0
+        rank = max(1, math.ceil(percent / 100 * len(values)))
+        return values[rank - 1]
+
+    def profiles(self) -> list[OperationProfile]:
+        result: list[OperationProfile] = []
+        with self.lock:
+            for operation, elapsed in self.elapsed.items():
+                values = sorted(elapsed)
+                result.append(
+                    OperationProfile(
+                        operation=operation,
+                        calls=len(values),
+                        errors=self.errors[operation],
+                        retries=self.retries[operation],
+                        total=sum(values),
+                        p50=self.percentile(values, 50),
+                        p95=self.percentile(values, 95),
+                        p99=self.percentile(values, 99),
+                        max=values[-1],
+                        size=self.sizes[operation],
+                    )
+                )
+        result.sort(key=lambda x: x.total, reverse=True)
+        return result
+
+    def to_json(self) -> list[dict]:
+        return [profile._asdict() for profile in self.profiles()]
+
+
+class InstrumentedClient:
+    # wraps the methods of a client to record their latency, retries and response size
+    def __init__(self, client: Any, instrumentation: Instrumentation) -> None:
+        self.client = client
+        self.instrumentation = instrumentation
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self.client, name)
+        if not callable(attribute):
+            return attribute
+
+        def instrumented(*args, **kwargs):
+            start = monotonic()
+            try:
+                response = attribute(*args, **kwargs)
+            except Exception as exc:
+                code = getattr(exc, "response", {}).get("Error", {}).get("Code")
+                self.instrumentation.record(
+                    name,
+                    monotonic() - start,
+                    retries=int(code in RateLimiter.THROTTLING_ERRORS),
+                    error=True,
+                )
+                raise
+            metadata = response.get("ResponseMetadata", {}) if isinstance(response, dict) else {}
+            self.instrumentation.record(
+                name,
+                monotonic() - start,
+                retries=metadata.get("RetryAttempts", 0),
+                size=int(metadata.get("HTTPHeaders", {}).get("content-length", 0)),
+            )
+            return response
+
+        return instrumented
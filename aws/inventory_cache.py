@@ -0,0 +1,40 @@
+import json
+from pathlib import Path
+from time import time
+
+from aws.immutable.server import Server
+
+
+class InventoryCache:
+    def __init__(self, region: str, ttl: int) -> None:
+        self.region = region
+        self.ttl = ttl  # time to live (sec.) of the persisted inventory, 0 = not persisted
+
+    def cache_file(self) -> Path:
+        return Path(f"{Path(__file__).parent.parent}/secrets/inventory_{self.region}.json")
+
+    def load(self) -> list[Server] | None:
+        cache_file = self.cache_file()
+        if self.ttl <= 0 or cache_file.exists() is False:
+            return None
+        try:
+            content = json.loads(cache_file.read_text())
+        except ValueError:
+            return None
+        if time() - content["timestamp"] > self.ttl:
+            return None
+        return [Server.from_json(server) for server in content["servers"]]
+
+    def save(self, servers: list[Server]):
+        if self.ttl <= 0:
+            return
+        cache_file = self.cache_file()
+        content = {
+            "timestamp": time(),
+            "servers": [server.to_json() for server in servers],
+        }
+        cache_file.write_text(json.dumps(content))
+        cache_file.chmod(0o600)
+
+    def invalidate(self):
+        self.cache_file().unlink(missing_ok=True)
@@ -0,0 +1,134 @@
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from socketserver import StreamRequestHandler, ThreadingUnixStreamServer
+from threading import Event, Lock, Thread
+from time import time
+
+from aws.immutable.daemon_snapshot import DaemonSnapshot
+from aws.light_sail_regions import LightSailRegions
+from aws.lightsail import LightSail
+from aws.tag_index import TagIndex
+from aws.tag_selector import TagSelector
+
+
+class InventoryDaemon:
+    INTERVAL = 60
+
+    def __init__(self, light_sail: LightSailRegions, interval: int, socket_path: Path | None = None) -> None:
+        # the inventory and the alarms are refreshed in the background, the queries are answered from memory
+        self.light_sail = light_sail
+        self.interval = max(1, interval)
+        self.socket_path = socket_path or self.default_socket()
+        self.snapshots: dict[str, DaemonSnapshot] = {}
+        self.invalidated: dict[str, float] = {}  # per region, the time of the last change made by the CLI
+        self.lock = Lock()
+        self.stopped = Event()
+        self.server: ThreadingUnixStreamServer | None = None
+
+    @classmethod
+    def default_socket(cls) -> Path:
+        return Path(f"{Path(__file__).parent.parent}/secrets/lightsail_daemon.sock")
+
+    def refresh(self, only: list[str] | None = None):
+        started = time()
+        regions = [x for x in self.light_sail.light_sails.items() if only is None or x[0] in only]
+        with ThreadPoolExecutor(max_workers=max(1, len(regions))) as pool:
+            futures = {region: pool.submit(self.refresh_region, light_sail) for region, light_sail in regions}
+            for region, future in futures.items():
+                try:
+                    snapshot = future.result()
+                except Exception as exc:  # the previous snapshot is kept until the next refresh
+                    print(f"Refresh of {region} failed: {exc}", file=sys.stderr)
+                    continue
+                with self.lock:
+                    # loaded before the last change, it may not include it
+                    if self.invalidated.get(region, 0.0) > started:
+                        continue
+                    self.snapshots[region] = snapshot
+
+    @classmethod
+    def refresh_region(cls, light_sail: LightSail) -> DaemonSnapshot:
+        servers = light_sail.fetch_servers()
+        light_sail.cache.save(servers)  # the commands not using the daemon benefit from it too
+        alarms = light_sail.list_alarms([server.name for server in servers])
+        return DaemonSnapshot(servers=servers, tag_index=TagIndex(servers), alarms=alarms, refreshed=time())
+
+    def refresh_loop(self):
+        while self.stopped.wait(self.interval) is False:
+            self.refresh()
+
+    def answer(self, request: dict) -> dict:
+        with self.lock:
+            snapshots = dict(self.snapshots)
+        query = request.get("query")
+        if query == "status":
+            return {"regions": {region: snapshot.refreshed for region, snapshot in snapshots.items()}}
+        if query == "servers":
+            missing = [region for region in request.get("regions", []) if region not in snapshots]
+            if missing:
+                return {"error": f"region(s) not served: {', '.join(missing)}"}
+            try:
+                selector = TagSelector(request.get("tag", ""))
+            except ValueError as exc:
+                return {"error": str(exc)}
+            servers: list[dict] = []
+            for region in request["regions"]:
+                snapshot = snapshots[region]
+                names = selector.select(snapshot.tag_index) if selector.tree is not None else snapshot.tag_index.names
+                servers.extend(server.to_json() for server in snapshot.servers if server.name in names)
+            return {"servers": servers}
+        if query == "alarms":
+            per_region: dict[str, set[str]] = {}
+            for region, name in request.get("servers", []):
+                per_region.setdefault(region, set()).add(name)
+            missing = [region for region in per_region if region not in snapshots]
+            if missing:
+                return {"error": f"region(s) not served: {', '.join(missing)}"}
+            alarms: list[dict] = []
+            for region, names in per_region.items():
+                alarms.extend(alarm._asdict() for alarm in snapshots[region].alarms if alarm.server in names)
+            return {"alarms": alarms}
+        if query == "invalidate":
+            # changed by the CLI: the regions are answered by the API until reloaded
+            regions = [region for region in request.get("regions", []) if region in self.light_sail.light_sails]
+            now = time()
+            with self.lock:
+                for region in regions:
+                    self.invalidated[region] = now
+                    self.snapshots.pop(region, None)
+            Thread(target=self.refresh, args=(regions,), daemon=True).start()
+            return {"invalidated": regions}
+        return {"error": f"unknown query {query!r}"}
+
+    def serve(self):
+        # the first snapshot is loaded before accepting the queries
+        self.refresh()
+        refresher = Thread(target=self.refresh_loop, daemon=True)
+        refresher.start()
+        daemon = self
+
+        class Handler(StreamRequestHandler):
+            def handle(self):
+                try:
+                    response = daemon.answer(json.loads(self.rfile.readline()))
+                except ValueError as exc:
+                    response = {"error": f"invalid request ({exc})"}
+                self.wfile.write(json.dumps(response).encode() + b"\n")
+
+        self.socket_path.unlink(missing_ok=True)
+        try:
+            with ThreadingUnixStreamServer(str(self.socket_path), Handler) as server:
+                self.socket_path.chmod(0o600)
+                server.daemon_threads = True
+                self.server = server
+                server.serve_forever()
+        finally:
+            self.stopped.set()
+            self.socket_path.unlink(missing_ok=True)
+
+    def stop(self):
+        self.stopped.set()
+        if self.server is not None:
+            self.server.shutdown()
@@ -0,0 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from aws.immutable.alarm_apply_summary import AlarmApplySummary
+from aws.immutable.alarm_response import AlarmResponse
+from aws.immutable.alarm_scan import AlarmScan
+from aws.immutable.firewall_change import FirewallChange
+from aws.immutable.metric_series import MetricSeries
+from aws.immutable.port import Port
+from aws.immutable.server import Server
+from aws.instrumentation import Instrumentation
+from aws.lightsail import LightSail
+from aws.mutable.alarm_definition import AlarmDefinition
+from aws.snapshot_store import SnapshotStore
+
+T = TypeVar("T")
+
+
+class LightSailRegions:
+    ALL_REGIONS = "all"
+
+    def __init__(
+        self,
+        regions: list[str],
+        cache_ttl: int = 0,
+        refresh: bool = False,
+        clients: dict[str, Any] | None = None,
+        instrumentation: Instrumentation | None = None,
+        snapshots: SnapshotStore | None = None,
+    ) -> None:
+        clients = clients or {}
+        self.light_sails = {
+            region: LightSail(region, cache_ttl, refresh, clients.get(region), instrumentation, snapshots)
+            for region in regions
+        }
+
+    @classmethod
+    def regions(cls, requested: str) -> list[str]:
+        # the regions are provided as a comma separated list, or "all"
+        regions = [region.strip() for region in requested.split(",") if region.strip()]
+        if cls.ALL_REGIONS in regions:
+            from boto3 import Session
+
+            return Session().get_available_regions("lightsail")
+        return list(dict.fromkeys(regions))
+
+    def _in_parallel(self, function: Callable[[LightSail], T], regions: list[str]) -> dict[str, T]:
+        # the total time is the time of the slowest region
+        if not regions:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(regions)) as pool:
+            futures = {region: pool.submit(function, self.light_sails[region]) for region in regions}
+            return {region: future.result() for region, future in futures.items()}
+
+    @classmethod
+    def _per_region(cls, servers: list[Server]) -> dict[str, list[str]]:
+        result: dict[str, list[str]] = {}
+        for server in servers:
+            result.setdefault(server.region, []).append(server.name)
+        return result
+
+    def list_servers(self, tag: str) -> list[Server]:
+        result: list[Server] = []
+        responses = self._in_parallel(lambda x: x.list_servers(tag), list(self.light_sails.keys()))
+        for servers in responses.values():
+            result.extend(servers)
+        return result
+
+    def list_alarms(self, servers: list[Server]) -> list[AlarmResponse]:
+        result: list[AlarmResponse] = []
+        per_region = self._per_region(servers)
+        responses = self._in_parallel(lambda x: x.list_alarms(per_region[x.region]), list(per_region.keys()))
+        for alarms in responses.values():
+            result.extend(alarms)
+        return result
+
+    def alarm_scans(self) -> dict[str, AlarmScan]:
+        return {region: light_sail.alarm_scan for region, light_sail in self.light_sails.items()}
+
+    def set_alarms(self, servers: list[Server], alarms: list[AlarmDefinition], parallel: int) -> AlarmApplySummary:
+        per_region = self._per_region(servers)
+        per_server: dict[str, list[AlarmDefinition]] = {}
+        for alarm in alarms:
+            per_server.setdefault(alarm.server, []).append(alarm)
+        responses = self._in_parallel(
+            lambda x: x.set_alarms(
+                per_region[x.region],
+                [alarm for server in per_region[x.region] for alarm in per_server.get(server, [])],
+                parallel,
+            ),
+            list(per_region.keys()),
+        )
+        return AlarmApplySummary(
+            puts=sum(summary.puts for summary in responses.values()),
+            deletes=sum(summary.deletes for summary in responses.values()),
+            retries=sum(summary.retries for summary in responses.values()),
+            elapsed=max([summary.elapsed for summary in responses.values()], default=0.0),
+        )
+
+    def list_metrics(
+        self, servers: list[Server], metrics: list[str], window: int, period: int, parallel: int
+    ) -> list[MetricSeries]:
+        result: list[MetricSeries] = []
+        per_region = self._per_region(servers)
+        responses = self._in_parallel(
+            lambda x: x.list_metrics(per_region[x.region], metrics, window, period, parallel),
+            list(per_region.keys()),
+        )
+        for series in responses.values():
+            result.extend(series)
+        return result
+
+    def apply_alarms(self, changes: dict[str, tuple[list[dict], list[str]]], parallel: int) -> AlarmApplySummary:
+        # the alarms to put and to delete, per region
+        responses = self._in_parallel(lambda x: x.apply_alarms(*changes[x.region], parallel), list(changes.keys()))
+        return AlarmApplySummary(
+            puts=sum(summary.puts for summary in responses.values()),
+            deletes=sum(summary.deletes for summary in responses.values()),
+            retries=sum(summary.retries for summary in responses.values()),
+            elapsed=max([summary.elapsed for summary in responses.values()], default=0.0),
+        )
+
+    def set_rules(self, server: Server, rules: list[Port]):
+        self.light_sails[server.region].set_rules(server.name, rules)
+
+    def apply_rules(self, changes: list[FirewallChange], parallel: int):
+        with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+            futures = [
+                pool.submit(self.light_sails[change.region].set_rules, change.server, change.desired)
+                for change in changes
+            ]
+            for future in futures:
+                future.result()
+
+    def get_ssh_keys(self, servers: list[Server]) -> dict[str, str]:
+        # only the regions of the servers, the key pair is created in a region when missing
+        regions = sorted({server.region for server in servers})
+        return {region: self.light_sails[region].get_ssh_key() for region in regions}
@@ -1,56 +1,143 @@
-from multiprocessing import Queue
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import datetime, timezone
+from itertools import product
 from os import getenv
 from pathlib import Path
-from subprocess import check_output, CalledProcessError, STDOUT
-
-from boto3 import Session
+from threading import Lock
+from time import monotonic, time
+from typing import Any
 
+from aws.immutable.alarm_apply_summary import AlarmApplySummary
 from aws.immutable.alarm_response import AlarmResponse
-from aws.immutable.ssh_command_response import SshCommandResponse
+from aws.immutable.alarm_scan import AlarmScan
+from aws.immutable.metric_series import MetricSeries
+from aws.immutable.port import Port
+from aws.immutable.server import Server
+from aws.instrumentation import Instrumentation, InstrumentedClient
+from aws.inventory_cache import InventoryCache
+from aws.metric_cache import MetricCache
 from aws.mutable.alarm_definition import AlarmDefinition
-from aws.mutable.port import Port
-from aws.mutable.server import Server
+from aws.rate_limiter import RateLimiter
+from aws.snapshot_store import SnapshotStore
+from aws.tag_index import TagIndex
+from aws.tag_selector import TagSelector
 
 
 class LightSail:
     SSH_PORT = 22
-    def __init__(self, region: str) -> None:
-        session = Session(
-            aws_access_key_id=getenv("LIGHTSAIL_ACCOUNT"),
-            aws_secret_access_key=getenv("LIGHTSAIL_SECRET"),
-            region_name=region,
-        )
-        self.client = session.client("lightsail")
+    LEGACY_KEY_REGION = "us-west-2"  # the region of the key file named without region
+    ALARM_LOOKUP_LIMIT = 20  # up to that many servers, the alarms are requested per server
+    ALARM_LOOKUP_PARALLEL = 10
+    MAX_DATAPOINTS = 1440  # per get_instance_metric_data call
+    METRIC_UNITS = {
+        "CPUUtilization": "Percent",
+        "BurstCapacityPercentage": "Percent",
+        "BurstCapacityTime": "Seconds",
+        "NetworkIn": "Bytes",
+        "NetworkOut": "Bytes",
+        "StatusCheckFailed": "Count",
+        "StatusCheckFailed_Instance": "Count",
+        "StatusCheckFailed_System": "Count",
+        "MetadataNoToken": "Count",
+    }
+    METRIC_STATISTICS = {  # the statistic evaluated by the Lightsail alarms, Average otherwise
+        "StatusCheckFailed": "Sum",
+        "StatusCheckFailed_Instance": "Sum",
+        "StatusCheckFailed_System": "Sum",
+        "MetadataNoToken": "Sum",
+    }
+
+    def __init__(
+        self,
+        region: str,
+        cache_ttl: int = 0,
+        refresh: bool = False,
+        client: Any = None,
+        instrumentation: Instrumentation | None = None,
+        snapshots: SnapshotStore | None = None,
+    ) -> None:
+        self.region = region
+        self.cache = InventoryCache(region, cache_ttl)
+        self.metric_cache = MetricCache(region, cache_ttl > 0)
+        self.refresh = refresh
+        self.servers: list[Server] | None = None
+        self.tag_index = TagIndex([])
+        self.positions: dict[str, int] = {}  # the position of each server in the loaded inventory
+        self.rate_limiter = RateLimiter()  # shared by all the updates
+        self.read_limiter = RateLimiter(rate=50.0, max_rate=200.0)  # for the reads made per server
+        self.alarm_scan = AlarmScan(strategy="", pages=0)  # how the last alarms were retrieved
+        self.snapshots = snapshots  # records the servers and the alarms loaded from the API
+        self.instrumentation = instrumentation
+        self.client_lock = Lock()
+        self._client: Any = None
+        if client is not None:  # a client can be provided, e.g. to run against a fake backend
+            self._client = self._instrumented(client)
+
+    @property
+    def client(self) -> Any:
+        # the session and the client are created on first use, as boto3 is slow to import
+        with self.client_lock:
+            if self._client is None:
+                start = monotonic()
+                from boto3 import Session
+
+                session = Session(
+                    aws_access_key_id=getenv("LIGHTSAIL_ACCOUNT"),
+                    aws_secret_access_key=getenv("LIGHTSAIL_SECRET"),
+                    region_name=self.region,
+                )
+                client = session.client("lightsail")
+                if self.instrumentation is not None:
+                    self.instrumentation.record("client startup", monotonic() - start)
+                self._client = self._instrumented(client)
+            return self._client
+
+    def _instrumented(self, client: Any) -> Any:
+        if self.instrumentation is None:
+            return client
+        return InstrumentedClient(client, self.instrumentation)
+
+    def list_servers(self, tag: str) -> list[Server]:
+        servers = self.inventory()
+        selector = TagSelector(tag)
+        if selector.tree is None:
+            return list(servers)
+        names = selector.select(self.tag_index)
+        return [server for server in servers if server.name in names]
+
+    def inventory(self) -> list[Server]:
+        # the inventory is loaded once per run, from the cache if still valid
+        if self.servers is None:
+            servers = None if self.refresh else self.cache.load()
+            if servers is None:
+                servers = self.fetch_servers()
+                self.cache.save(servers)
+            self.servers = servers
+            self.tag_index = TagIndex(servers)
+            self.positions = {server.name: position for position, server in enumerate(servers)}
+        return self.servers
 
-    def list_servers(self, tag_key: str, tag_value: str) -> list[Server]:
+    def fetch_servers(self) -> list[Server]:
         result: list[Server] = []
 
         response = self.client.get_instances()
         while True:
             for instance in response["instances"]:
-                if tag_key and {"key": tag_key, "value": tag_value} not in instance["tags"]:
-                    continue
-
-                ports: list[Port] = []
-                for port in instance["networking"]["ports"]:
-                    ports.append(
-                        Port(
-                            FromPort=port["fromPort"],
-                            ToPort=port["toPort"],
-                            Protocol=port["protocol"],
-                            Cidrs=port["cidrs"],
-                        )
-                    )
+                ports = tuple(Port.from_json(port) for port in instance["networking"]["ports"])
+                tags, flags = Server.parse_tags(instance["tags"])
                 result.append(
                     Server(
                         name=instance["name"],
-                        tags=sorted(instance["tags"], key=lambda x: x["key"]),
+                        tags=tags,
                         internal_ip=instance["privateIpAddress"],
                         external_ip=instance.get("publicIpAddress") or "",
                         firewall=ports,
                         state=instance["state"]["name"],
                         cpu=instance["hardware"]["cpuCount"],
                         memory_gb=instance["hardware"]["ramSizeInGb"],
+                        region=self.region,
+                        flags=flags,
                     )
                 )
 
@@ -58,11 +145,39 @@ class LightSail:
                 break
             response = self.client.get_instances(pageToken=response["nextPageToken"])
 
+        if self.snapshots is not None:
+            self.snapshots.record_servers(self.region, result)
         return result
 
     def list_alarms(self, servers: list[str]) -> list[AlarmResponse]:
+        # for a few servers, the alarms are requested per server, otherwise all the alarms are scanned
+        if len(servers) <= self.ALARM_LOOKUP_LIMIT:
+            result: list[AlarmResponse] = []
+            pages = 0
+            with ThreadPoolExecutor(max_workers=max(1, min(len(servers), self.ALARM_LOOKUP_PARALLEL))) as pool:
+                for alarms, fetched in pool.map(lambda x: self.fetch_alarms({x}, monitoredResourceName=x), servers):
+                    result.extend(alarms)
+                    pages += fetched
+            self.alarm_scan = AlarmScan(strategy=AlarmScan.per_server(), pages=pages)
+        else:
+            result, pages = self.fetch_alarms(set(servers))
+            self.alarm_scan = AlarmScan(strategy=AlarmScan.full_scan(), pages=pages)
+        # a partial view of the region would show the alarms of the other servers as removed
+        if self.snapshots is not None and self.servers is not None and set(self.positions) <= set(servers):
+            self.snapshots.record_alarms(self.region, result)
+        return result
+
+    def fetch_alarms(self, servers: set[str], **kwargs) -> tuple[list[AlarmResponse], int]:
+        from botocore.exceptions import ClientError
+
         result: list[AlarmResponse] = []
-        response = self.client.get_alarms()
+        try:
+            response = self.client.get_alarms(**kwargs)
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") == "NotFoundException":
+                return result, 1  # the server no longer exists
+            raise
+        pages = 1
         while True:
             for alarm in response["alarms"]:
                 server = alarm["monitoredResourceInfo"]["name"]
@@ -81,40 +196,123 @@ class LightSail:
                         datapoints_to_alarm=alarm["datapointsToAlarm"],
                         evaluation_periods=alarm["evaluationPeriods"],
                         operator=alarm["comparisonOperator"],
+                        region=self.region,
                     )
                 )
             if "nextPageToken" not in response:
                 break
-            response = self.client.get_alarms(pageToken=response["nextPageToken"])
-        return result
+            pages += 1
+            response = self.client.get_alarms(pageToken=response["nextPageToken"], **kwargs)
+        return result, pages
 
-    def set_alarms(self, servers: list[str], alarms: list[AlarmDefinition]):
-        # retrieve the current alarms
-        current: dict[str, str] = {}
-        for alarm_response in self.list_alarms(servers):
-            definition = AlarmDefinition(
-                name=alarm_response.name,
-                server=alarm_response.server,
-                metric=alarm_response.metric,
-                threshold=alarm_response.threshold,
-                evaluation_periods=alarm_response.evaluation_periods,
-                datapoints_to_alarm=alarm_response.datapoints_to_alarm,
-                operator=alarm_response.operator,
-            )
-            current[definition.name] = definition.hashed()
-        # set the alarms (that have changed)
+    def set_alarms(self, servers: list[str], alarms: list[AlarmDefinition], parallel: int = 1) -> AlarmApplySummary:
+        start = monotonic()
+        json_alarms, deletes = self.alarm_changes(servers, alarms)
+        return self.apply_alarms(json_alarms, deletes, parallel)._replace(elapsed=monotonic() - start)
+
+    def alarm_changes(self, servers: list[str], alarms: list[AlarmDefinition]) -> tuple[list[dict], list[str]]:
+        return self.diff_alarms(self.list_alarms(servers), alarms)
+
+    @classmethod
+    def diff_alarms(cls, current: list[AlarmResponse], alarms: list[AlarmDefinition]) -> tuple[list[dict], list[str]]:
+        # the alarms to put (that have changed), and the names of the alarms to delete
+        hashes = {alarm.name: alarm.definition().hashed() for alarm in current}
+        json_alarms: list[dict] = []
         for alarm_definition in alarms:
-            if not (alarm_definition.name in current and alarm_definition.hashed() == current[alarm_definition.name]):
-                json_alarm = alarm_definition.to_json()
-                self.client.put_alarm(**json_alarm)
-            if alarm_definition.name in current:
-                del current[alarm_definition.name]
-        # delete the alarms no longer in use
-        for alarm_name in current.keys():
-            self.client.delete_alarm(alarmName=alarm_name)
+            if not (alarm_definition.name in hashes and alarm_definition.hashed() == hashes[alarm_definition.name]):
+                json_alarms.append(alarm_definition.to_json())
+            if alarm_definition.name in hashes:
+                del hashes[alarm_definition.name]
+        return json_alarms, list(hashes.keys())
+
+    def apply_alarms(self, json_alarms: list[dict], deletes: list[str], parallel: int = 1) -> AlarmApplySummary:
+        start = monotonic()
+        retries = self.rate_limiter.retries
+        # apply them, and delete the alarms no longer in use
+        with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+            futures = [
+                pool.submit(self.rate_limiter.call, self.client.put_alarm, **json_alarm) for json_alarm in json_alarms
+            ]
+            futures += [
+                pool.submit(self.rate_limiter.call, self.client.delete_alarm, alarmName=alarm_name)
+                for alarm_name in deletes
+            ]
+            for future in futures:
+                future.result()
+        return AlarmApplySummary(
+            puts=len(json_alarms),
+            deletes=len(deletes),
+            retries=self.rate_limiter.retries - retries,
+            elapsed=monotonic() - start,
+        )
+
+    def list_metrics(
+        self, servers: list[str], metrics: list[str], window: int, period: int, parallel: int = 10
+    ) -> list[MetricSeries]:
+        # the datapoints already cached are not requested again
+        until = time()
+        with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+            result = list(
+                pool.map(
+                    lambda x: self.fetch_metric(x[0], x[1], until - window, until, period), product(servers, metrics)
+                )
+            )
+        self.metric_cache.save()
+        return result
+
+    def fetch_metric(self, server: str, metric: str, start: float, until: float, period: int) -> MetricSeries:
+        statistic = self.METRIC_STATISTICS.get(metric, "Average")
+        field = statistic[0].lower() + statistic[1:]
+        key = MetricCache.key(server, metric, statistic, period)
+        cached_since, cached_until, _ = (0.0, 0.0, []) if self.refresh else self.metric_cache.get(key)
+        if cached_until <= start or cached_since >= cached_until:
+            ranges = [(start, until)]
+        else:
+            # the part of the window older than the cached range (a wider window), then the newer one,
+            # from the last period fetched which was likely incomplete
+            ranges = [(start, cached_since)] if start < cached_since else []
+            ranges.append((max(start, cached_until - period), until))
+        datapoints: list[list[float]] = []
+        for since, end_range in ranges:
+            while since < end_range:
+                end = min(end_range, since + period * self.MAX_DATAPOINTS)
+                response = self.read_limiter.call(
+                    self.client.get_instance_metric_data,
+                    instanceName=server,
+                    metricName=metric,
+                    period=period,
+                    startTime=datetime.fromtimestamp(since, timezone.utc),
+                    endTime=datetime.fromtimestamp(end, timezone.utc),
+                    unit=self.METRIC_UNITS.get(metric, "None"),
+                    statistics=[statistic],
+                )
+                datapoints += [
+                    [point["timestamp"].timestamp(), point[field]]
+                    for point in response["metricData"]
+                    if field in point
+                ]
+                since = end
+        merged = [point for point in self.metric_cache.merge(key, datapoints, start, until) if point[0] >= start]
+        return MetricSeries(
+            server=server,
+            region=self.region,
+            metric=metric,
+            period=period,
+            timestamps=[point[0] for point in merged],
+            values=[point[1] for point in merged],
+        )
+
+    @classmethod
+    def key_file(cls, region: str) -> Path:
+        suffix = f"_{region}" if region else ""
+        return Path(f"{Path(__file__).parent.parent}/secrets/aws_private_key{suffix}.txt")
 
     def get_ssh_key(self) -> str:
-        key_file = Path(f"{Path(__file__).parent.parent}/secrets/aws_private_key.txt")
+        # the default key pair is specific to each region, the key file of the single region era is kept
+        key_file = self.key_file(self.region)
+        legacy_file = self.key_file("")
+        if key_file.exists() is False and self.region == self.LEGACY_KEY_REGION and legacy_file.exists():
+            key_file = legacy_file
         if key_file.exists() is False:
             response = self.client.download_default_key_pair()
             # with open(key_file, "w") as f:
@@ -123,18 +321,6 @@ class LightSail:
             key_file.chmod(0o600)
         return key_file.as_posix()
 
-    def run_command(self, queue: Queue, server: str, public_ip: str, command: str) -> SshCommandResponse:
-        ssh_key = self.get_ssh_key()
-        ssh_command = f'ssh -i {ssh_key} -o StrictHostKeyChecking=no ubuntu@{public_ip}  "{command}" '
-        try:
-            output = check_output(ssh_command, shell=True, stderr=STDOUT)
-        except CalledProcessError as exc:
-            result = SshCommandResponse(server=f"{server} ({public_ip})", response=exc.stdout.decode("utf-8").split("\n"))
-        else:
-            result = SshCommandResponse(server=f"{server} ({public_ip})", response=output.decode("utf-8").split("\n"))
-        queue.put(result)
-        return result
-
     def set_rules(self, server: str, rules: list[Port]):
         json_rules: list[dict] = []
         for rule in rules:
@@ -142,4 +328,9 @@ class LightSail:
             if rule.ToPort == self.SSH_PORT:
                 json_rule |= {"cidrListAliases": ["lightsail-connect"]}  # always allow the AWS console to access
             json_rules.append(json_rule)
-        self.client.put_instance_public_ports(instanceName=server, portInfos=json_rules)
+        self.rate_limiter.call(self.client.put_instance_public_ports, instanceName=server, portInfos=json_rules)
+        # keep the loaded inventory in line with the new rules, the persisted one is outdated
+        if self.servers is not None and server in self.positions:
+            position = self.positions[server]
+            self.servers[position] = replace(self.servers[position], firewall=tuple(rules))
+        self.cache.invalidate()
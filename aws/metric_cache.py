@@ -0,0 +1,64 @@
+import json
+from pathlib import Path
+from threading import Lock
+
+
+class MetricCache:
+    RETENTION = 14 * 24 * 3600  # Lightsail keeps the metrics for two weeks
+
+    def __init__(self, region: str, persist: bool) -> None:
+        # the datapoints are final once their period is over, so they are kept until out of retention
+        self.region = region
+        self.persist = persist
+        self.series: dict[str, dict] | None = None
+        self.lock = Lock()
+
+    def cache_file(self) -> Path:
+        return Path(f"{Path(__file__).parent.parent}/secrets/metrics_{self.region}.json")
+
+    @classmethod
+    def key(cls, server: str, metric: str, statistic: str, period: int) -> str:
+        return f"{server}|{metric}|{statistic}|{period}"
+
+    def _loaded(self) -> dict[str, dict]:
+        if self.series is None:
+            self.series = {}
+            cache_file = self.cache_file()
+            if self.persist and cache_file.exists():
+                try:
+                    self.series = json.loads(cache_file.read_text())
+                except ValueError:
+                    pass
+        return self.series
+
+    def get(self, key: str) -> tuple[float, float, list[list[float]]]:
+        # the time range the series was fetched over, and its datapoints [timestamp, value]
+        with self.lock:
+            series = self._loaded().get(key, {})
+            until = series.get("until", 0.0)
+            # the series cached without their start are fetched again
+            return series.get("since", until), until, series.get("datapoints", [])
+
+    def merge(self, key: str, datapoints: list[list[float]], since: float, until: float) -> list[list[float]]:
+        # the datapoints fetched again replace the cached ones (the last period may have been incomplete),
+        # the range fetched extends the cached one when they overlap, replaces it otherwise
+        with self.lock:
+            series = self._loaded().get(key, {})
+            cached_until = series.get("until", 0.0)
+            cached_since = series.get("since", cached_until)
+            if cached_since < cached_until and since <= cached_until and cached_since <= until:
+                since = min(since, cached_since)
+            merged = {point[0]: point[1] for point in series.get("datapoints", [])}
+            merged |= {point[0]: point[1] for point in datapoints}
+            since = max(since, until - self.RETENTION)
+            result = [[timestamp, merged[timestamp]] for timestamp in sorted(merged) if timestamp >= since]
+            self._loaded()[key] = {"since": since, "until": until, "datapoints": result}
+            return result
+
+    def save(self):
+        if self.persist is False:
+            return
+        with self.lock:
+            cache_file = self.cache_file()
+            cache_file.write_text(json.dumps(self._loaded()))
+            cache_file.chmod(0o600)
@@ -0,0 +1,104 @@
+import numpy as np
+
+from aws.immutable.alarm_evaluation import AlarmEvaluation
+from aws.immutable.alarm_rule import AlarmRule
+from aws.immutable.metric_series import MetricSeries
+from aws.immutable.metric_summary import MetricSummary
+
+
+class MetricStatistics:
+    FLEET = "(fleet)"
+    OPERATORS = {
+        "GreaterThanOrEqualToThreshold": np.greater_equal,
+        "GreaterThanThreshold": np.greater,
+        "LessThanThreshold": np.less,
+        "LessThanOrEqualToThreshold": np.less_equal,
+    }
+
+    def __init__(self, series: list[MetricSeries]) -> None:
+        self.series = series
+        self.values = {(x.server, x.metric): np.asarray(x.values, dtype=np.float64) for x in series}
+
+    @classmethod
+    def breaching(cls, values: np.ndarray, rule: AlarmRule) -> np.ndarray:
+        return cls.OPERATORS[rule.operator](values, rule.threshold)
+
+    @classmethod
+    def triggered(cls, values: np.ndarray, rule: AlarmRule) -> bool:
+        # "M out of N": at least datapoints_to_alarm datapoints in breach in evaluation_periods consecutive ones
+        breaching = cls.breaching(values, rule).astype(np.int32)
+        if breaching.size == 0:
+            return False
+        window = min(rule.evaluation_periods, breaching.size)
+        counts = np.convolve(breaching, np.ones(window, dtype=np.int32), mode="valid")
+        return bool((counts >= rule.datapoints_to_alarm).any())
+
+    @classmethod
+    def summary(
+        cls, server: str, region: str, metric: str, values: np.ndarray, period: int, threshold: float | None
+    ) -> MetricSummary:
+        if values.size == 0:
+            return MetricSummary(server, region, metric, 0, 0.0, 0.0, 0.0, 0.0, [])
+        p50, p95 = np.percentile(values, [50, 95])
+        above = 0.0
+        if threshold is not None:
+            above = float(np.count_nonzero(values > threshold) * period)
+        return MetricSummary(
+            server=server,
+            region=region,
+            metric=metric,
+            datapoints=int(values.size),
+            p50=float(p50),
+            p95=float(p95),
+            max=float(values.max()),
+            above=above,
+            triggered=[],
+        )
+
+    def summaries(self, rules: dict[str, list[AlarmRule]], threshold: float | None = None) -> list[MetricSummary]:
+        # per server and metric, then for the whole fleet per metric
+        result: list[MetricSummary] = []
+        per_metric: dict[str, list[np.ndarray]] = {}
+        periods: dict[str, int] = {}
+        for series in self.series:
+            values = self.values[(series.server, series.metric)]
+            summary = self.summary(series.server, series.region, series.metric, values, series.period, threshold)
+            triggered = [
+                rule.name
+                for rule in rules.get(series.server, [])
+                if rule.metric == series.metric and self.triggered(values, rule)
+            ]
+            result.append(summary._replace(triggered=triggered))
+            per_metric.setdefault(series.metric, []).append(values)
+            periods[series.metric] = series.period
+        for metric, values_list in per_metric.items():
+            values = np.concatenate(values_list)
+            result.append(self.summary(self.FLEET, "", metric, values, periods[metric], threshold))
+        return result
+
+    def evaluate(self, rules: dict[str, list[AlarmRule]]) -> list[AlarmEvaluation]:
+        # for each configured alarm, the servers that would have triggered it over the window
+        evaluated: dict[AlarmRule, list[tuple[str, np.ndarray, int]]] = {}
+        for series in self.series:
+            for rule in rules.get(series.server, []):
+                if rule.metric == series.metric:
+                    values = self.values[(series.server, series.metric)]
+                    evaluated.setdefault(rule, []).append((series.server, values, series.period))
+        result: list[AlarmEvaluation] = []
+        for rule, servers in evaluated.items():
+            result.append(
+                AlarmEvaluation(
+                    alarm=rule.name,
+                    metric=rule.metric,
+                    operator=rule.operator,
+                    threshold=rule.threshold,
+                    evaluation_periods=rule.evaluation_periods,
+                    datapoints_to_alarm=rule.datapoints_to_alarm,
+                    servers=len(servers),
+                    triggered=sorted(server for server, values, _ in servers if self.triggered(values, rule)),
+                    breaching=float(
+                        sum(np.count_nonzero(self.breaching(values, rule)) * period for _, values, period in servers)
+                    ),
+                )
+            )
+        return result
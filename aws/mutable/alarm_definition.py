@@ -30,3 +30,8 @@ class AlarmDefinition(NamedTuple):
     def hashed(self) -> str:
         return hashlib.md5(json.dumps(self.to_json(), sort_keys=True).encode()).hexdigest()
 
+    @classmethod
+    def hashed_alarms(cls, alarms: list["AlarmDefinition"]) -> str:
+        # the order and the duplicates of the alarms do not matter
+        hashes = sorted({alarm.hashed() for alarm in alarms})
+        return hashlib.md5(",".join(hashes).encode()).hexdigest()
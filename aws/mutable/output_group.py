@@ -0,0 +1,9 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class OutputGroup:
+    digest: str
+    exit_code: int
+    response: list[str]  # the (normalized) output of the first server
+    servers: list[str] = field(default_factory=list)
@@ -0,0 +1,47 @@
+import hashlib
+import re
+
+from aws.immutable.server import Server
+from aws.immutable.ssh_command_response import SshCommandResponse
+from aws.mutable.output_group import OutputGroup
+
+
+class OutputGrouper:
+    HOST = "<host>"
+    IP = "<ip>"
+    IP_ADDRESS = re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}\b")
+    IP_HOSTNAME = re.compile(r"\bip-\d{1,3}(?:-\d{1,3}){3}\b")  # the default hostnames of the instances
+
+    def __init__(self, servers: list[Server], normalize: bool = False) -> None:
+        self.servers = {f"{server.name} ({server.external_ip})": server for server in servers}
+        self.normalize = normalize  # the host specific tokens are replaced before grouping
+        self.groups: dict[tuple[str, int], OutputGroup] = {}
+
+    def normalized(self, response: SshCommandResponse) -> list[str]:
+        if self.normalize is False:
+            return response.response
+        server = self.servers.get(response.server)
+        name = re.compile(rf"\b{re.escape(server.name)}\b") if server is not None else None
+        result: list[str] = []
+        for line in response.response:
+            if name is not None:
+                line = name.sub(self.HOST, line)
+            line = self.IP_HOSTNAME.sub(self.HOST, line)
+            result.append(self.IP_ADDRESS.sub(self.IP, line))
+        return result
+
+    def add(self, response: SshCommandResponse) -> SshCommandResponse:
+        # only the first output of each group is kept, the returned response only keeps the last line
+        lines = self.normalized(response)
+        digest = hashlib.md5("\n".join(lines).encode()).hexdigest()
+        group = self.groups.get((digest, response.exit_code))
+        if group is None:
+            group = OutputGroup(digest=digest, exit_code=response.exit_code, response=lines)
+            self.groups[(digest, response.exit_code)] = group
+        server = self.servers.get(response.server)
+        group.servers.append(server.name if server is not None else response.server)
+        return response._replace(response=response.response[-1:])
+
+    def sorted_groups(self) -> list[OutputGroup]:
+        # the largest groups first
+        return sorted(self.groups.values(), key=lambda x: (-len(x.servers), x.exit_code, x.digest))
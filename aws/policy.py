@@ -0,0 +1,160 @@
+import ipaddress
+import json
+from pathlib import Path
+
+from aws.immutable.alarm_rule import AlarmRule
+from aws.immutable.plan_entry import PlanEntry
+from aws.immutable.port import Port
+from aws.immutable.server import Server
+from aws.mutable.alarm_definition import AlarmDefinition
+from aws.rule_compactor import RuleCompactor
+
+
+class Policy:
+    ALL_SERVER = "ALL_SERVER"
+    FIREWALL_FILE = "aws_firewall_rules.json"
+    ALARMS_FILE = "aws_alarms.json"
+    PROTOCOLS = ("tcp", "udp", "all", "icmp", "icmpv6")
+    FIREWALL_FIELDS = {
+        "tagKey": str,
+        "tagValue": str,
+        "fromPort": int,
+        "toPort": int,
+        "protocol": str,
+        "cidrs": list,
+    }
+    ALARM_FIELDS = {
+        "tagKey": str,
+        "tagValue": str,
+        "alarmName": str,
+        "metricName": str,
+        "threshold": (int, float),
+        "evaluationPeriods": int,
+        "datapointsToAlarm": int,
+        "comparisonOperator": str,
+    }
+
+    def __init__(self, directory: Path | None, required: bool = False) -> None:
+        # the rules are indexed by tag: ALL_SERVER, key (for flags) or key:value
+        # required: the directory was given explicitly, a typo must not be read as an empty policy
+        self.directory = directory
+        self.required = required
+        if required and directory is not None and directory.is_dir() is False:
+            raise ValueError(f"{directory}: the policy directory does not exist")
+        self.ports: dict[str, list[Port]] = {}
+        self.alarms: dict[str, list[AlarmRule]] = {}
+        self.compacted: dict[tuple[str, ...], tuple[list[Port], int]] = {}  # per combination of the matching tags
+        for key, rule in self._read(self.FIREWALL_FILE, self.FIREWALL_FIELDS):
+            self.ports.setdefault(key, []).append(
+                Port(
+                    FromPort=rule["fromPort"],
+                    ToPort=rule["toPort"],
+                    Protocol=rule["protocol"],
+                    Cidrs=rule["cidrs"],
+                )
+            )
+        for key, alarm in self._read(self.ALARMS_FILE, self.ALARM_FIELDS):
+            self.alarms.setdefault(key, []).append(
+                AlarmRule(
+                    name=alarm["alarmName"],
+                    metric=alarm["metricName"],
+                    operator=alarm["comparisonOperator"],
+                    threshold=alarm["threshold"],
+                    evaluation_periods=alarm["evaluationPeriods"],
+                    datapoints_to_alarm=alarm["datapointsToAlarm"],
+                )
+            )
+
+    @classmethod
+    def default_directory(cls) -> Path:
+        return Path(f"{Path(__file__).parent.parent}/secrets")
+
+    def _read(self, file_name: str, fields: dict) -> list[tuple[str, dict]]:
+        result: list[tuple[str, dict]] = []
+        if self.directory is None:
+            return result
+        policy_file = self.directory / file_name
+        if policy_file.exists() is False:
+            if self.required:
+                raise ValueError(f"{policy_file}: the policy file does not exist")
+            return result
+        try:
+            entries = json.loads(policy_file.read_text())
+        except ValueError as exc:
+            raise ValueError(f"{policy_file}: invalid JSON ({exc})") from exc
+        if not isinstance(entries, list):
+            raise ValueError(f"{policy_file}: a list of rules is expected")
+
+        for index, entry in enumerate(entries):
+            where = f"{policy_file}, rule #{index + 1}"
+            if not isinstance(entry, dict):
+                raise ValueError(f"{where}: an object is expected")
+            for field, expected in fields.items():
+                if field not in entry:
+                    raise ValueError(f"{where}: '{field}' is missing")
+                if isinstance(entry[field], bool) or not isinstance(entry[field], expected):
+                    raise ValueError(f"{where}: '{field}' has an invalid value {entry[field]!r}")
+            if file_name == self.FIREWALL_FILE:
+                self._validate_port(where, entry)
+            result.append((self.tag_key(entry["tagKey"], entry["tagValue"]), entry))
+        return result
+
+    @classmethod
+    def _validate_port(cls, where: str, entry: dict):
+        if entry["protocol"] not in cls.PROTOCOLS:
+            raise ValueError(f"{where}: 'protocol' must be one of {', '.join(cls.PROTOCOLS)}")
+        if not 0 <= entry["fromPort"] <= entry["toPort"] <= 65535:
+            raise ValueError(f"{where}: invalid port range {entry['fromPort']}-{entry['toPort']}")
+        for cidr in entry["cidrs"]:
+            try:
+                ipaddress.ip_network(cidr, strict=False)
+            except (TypeError, ValueError) as exc:
+                raise ValueError(f"{where}: invalid CIDR {cidr!r} ({exc})") from exc
+
+    @classmethod
+    def tag_key(cls, key: str, value: str) -> str:
+        if not key:
+            return cls.ALL_SERVER
+        if value:
+            return f"{key}:{value}"
+        return key
+
+    @classmethod
+    def server_keys(cls, server: Server) -> list[str]:
+        result = [cls.ALL_SERVER]
+        result.extend(f"{key}:{value}" for key, value in server.tags.items())
+        result.extend(server.flags)
+        return result
+
+    def empty_files(self, resources: list[str]) -> list[str]:
+        # the policy files of the resources (firewall, alarms) without any rule
+        result: list[str] = []
+        if PlanEntry.firewall() in resources and not self.ports:
+            result.append(self.FIREWALL_FILE)
+        if PlanEntry.alarms() in resources and not self.alarms:
+            result.append(self.ALARMS_FILE)
+        return result
+
+    def ports_for(self, server: Server) -> list[Port]:
+        return self.compaction(server)[0]
+
+    def compaction(self, server: Server) -> tuple[list[Port], int]:
+        # the compacted rules of the server and the number of rules eliminated by the compaction,
+        # the same tags matching across the fleet, each combination is compacted once
+        keys = tuple(key for key in self.server_keys(server) if key in self.ports)
+        if keys not in self.compacted:
+            rules: list[Port] = []
+            for key in keys:
+                rules.extend(self.ports[key])
+            compacted = RuleCompactor.compact(rules)
+            self.compacted[keys] = (compacted, len(rules) - len(compacted))
+        return self.compacted[keys]
+
+    def alarm_rules_for(self, server: Server) -> list[AlarmRule]:
+        result: list[AlarmRule] = []
+        for key in self.server_keys(server):
+            result.extend(self.alarms.get(key, []))
+        return result
+
+    def alarms_for(self, server: Server) -> list[AlarmDefinition]:
+        return [alarm.definition(server.name) for alarm in self.alarm_rules_for(server)]
@@ -0,0 +1,69 @@
+from threading import Lock
+from time import monotonic, sleep
+from typing import Any, Callable
+
+
+class RateLimiter:
+    THROTTLING_ERRORS = ("ThrottlingException", "TooManyRequestsException", "Throttling", "RequestLimitExceeded")
+
+    # additive increase on success, multiplicative decrease when throttled; without a given rate, the calls are only
+    # paced from the first throttling error on (from half the max rate), bounded by the callers' pool until then
+    def __init__(
+        self,
+        rate: float | None = None,
+        min_rate: float = 0.5,
+        max_rate: float = 50.0,
+        increase: float = 0.5,
+        max_retries: int = 6,
+    ) -> None:
+        self.rate = rate or max_rate  # requests per second
+        self.paced = rate is not None
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.max_retries = max_retries
+        self.retries = 0
+        self.next_slot = monotonic()
+        self.lock = Lock()
+
+    def acquire(self):
+        if self.paced is False:
+            return
+        with self.lock:
+            now = monotonic()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + 1 / self.rate
+        if wait > 0:
+            sleep(wait)
+
+    def succeeded(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def throttled(self) -> float:
+        with self.lock:
+            if self.paced is False:
+                self.paced = True
+                self.next_slot = monotonic()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.retries += 1
+            return 1 / self.rate
+
+    def call(self, function: Callable, **kwargs) -> Any:
+        from botocore.exceptions import ClientError
+
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                response = function(**kwargs)
+            except ClientError as exc:
+                if exc.response.get("Error", {}).get("Code") not in self.THROTTLING_ERRORS:
+                    raise
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                sleep(self.throttled() * attempt)
+            else:
+                self.succeeded()
+                return response
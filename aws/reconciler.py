@@ -0,0 +1,126 @@
+from aws.immutable.alarm_apply_summary import AlarmApplySummary
+from aws.immutable.alarm_response import AlarmResponse
+from aws.immutable.firewall_change import FirewallChange
+from aws.immutable.plan_entry import PlanEntry
+from aws.immutable.port import Port
+from aws.immutable.reconciliation_plan import ReconciliationPlan
+from aws.immutable.server import Server
+from aws.light_sail_regions import LightSailRegions
+from aws.lightsail import LightSail
+from aws.mutable.alarm_definition import AlarmDefinition
+from aws.policy import Policy
+from aws.state_journal import StateJournal
+
+
+class Reconciler:
+    RESOURCES = (PlanEntry.firewall(), PlanEntry.alarms())
+
+    def __init__(self, light_sail: LightSailRegions, policy: Policy, journal: StateJournal, refresh: bool) -> None:
+        self.light_sail = light_sail
+        self.policy = policy
+        self.journal = journal
+        self.refresh = refresh  # read the live state of all the servers, whatever the journal
+
+    def _current_alarms(self, servers: list[Server]) -> dict[str, list[AlarmResponse]]:
+        result: dict[str, list[AlarmResponse]] = {server.name: [] for server in servers}
+        if servers:
+            for alarm in self.light_sail.list_alarms(servers):
+                result.setdefault(alarm.server, []).append(alarm)
+        return result
+
+    @classmethod
+    def _alarms_hashed(cls, alarms: list[AlarmResponse]) -> str:
+        return AlarmDefinition.hashed_alarms([alarm.definition() for alarm in alarms])
+
+    def plan(self, servers: list[Server], resources: list[str]) -> ReconciliationPlan:
+        entries: list[PlanEntry] = []
+        unchanged = 0
+        skipped = 0
+        if PlanEntry.firewall() in resources:
+            # the live rules come with the inventory
+            for server in servers:
+                desired, eliminated = self.policy.compaction(server)
+                live, hashed = Port.hashed_rules(server.firewall), Port.hashed_rules(desired)
+                if live == hashed:
+                    unchanged += 1
+                    self.journal.record(server.region, server.name, PlanEntry.firewall(), hashed)
+                    continue
+                details = f"{len(server.firewall)} -> {len(desired)} rule(s)"
+                if eliminated:
+                    details += f", {eliminated} compacted"
+                entries.append(PlanEntry(server.name, server.region, PlanEntry.firewall(), live, hashed, details))
+        if PlanEntry.alarms() in resources:
+            # the alarms of the servers in line with the policy according to the journal are not read
+            desired_alarms = {server.name: self.policy.alarms_for(server) for server in servers}
+            desired_hashes = {name: AlarmDefinition.hashed_alarms(alarms) for name, alarms in desired_alarms.items()}
+            to_read = [
+                server
+                for server in servers
+                if self.refresh
+                or self.journal.hashed(server.region, server.name, PlanEntry.alarms()) != desired_hashes[server.name]
+            ]
+            skipped += len(servers) - len(to_read)
+            current = self._current_alarms(to_read)
+            for server in to_read:
+                live, hashed = self._alarms_hashed(current[server.name]), desired_hashes[server.name]
+                if live == hashed:
+                    unchanged += 1
+                    self.journal.record(server.region, server.name, PlanEntry.alarms(), hashed)
+                    continue
+                json_alarms, deletes = LightSail.diff_alarms(current[server.name], desired_alarms[server.name])
+                details = f"{len(json_alarms)} to set, {len(deletes)} to delete"
+                entries.append(PlanEntry(server.name, server.region, PlanEntry.alarms(), live, hashed, details))
+        self.journal.save()
+        entries.sort(key=lambda x: (x.region, x.server, x.resource))
+        return ReconciliationPlan(entries=entries, unchanged=unchanged, skipped=skipped)
+
+    def apply(self, plan: ReconciliationPlan, parallel: int) -> tuple[int, AlarmApplySummary]:
+        # nothing is applied if the live state or the policy changed since the plan
+        servers = {(server.region, server.name): server for server in self.light_sail.list_servers("")}
+        alarm_entries = [entry for entry in plan.entries if entry.resource == PlanEntry.alarms()]
+        current = self._current_alarms(
+            [servers[(x.region, x.server)] for x in alarm_entries if (x.region, x.server) in servers]
+        )
+        drifts: list[str] = []
+        for entry in plan.entries:
+            server = servers.get((entry.region, entry.server))
+            if server is None:
+                drifts.append(f"{entry.server} (no longer exists)")
+                continue
+            if entry.resource == PlanEntry.firewall():
+                live = Port.hashed_rules(server.firewall)
+                desired = Port.hashed_rules(self.policy.ports_for(server))
+            else:
+                live = self._alarms_hashed(current[server.name])
+                desired = AlarmDefinition.hashed_alarms(self.policy.alarms_for(server))
+            if live != entry.live:
+                drifts.append(f"{entry.server} ({entry.resource} changed)")
+            elif desired != entry.desired:
+                drifts.append(f"{entry.server} ({entry.resource} policy changed)")
+        if drifts:
+            raise ValueError(f"the state drifted since the plan: {', '.join(drifts)}")
+
+        changes = [
+            FirewallChange(
+                server=entry.server,
+                region=entry.region,
+                current=servers[(entry.region, entry.server)].firewall,
+                desired=self.policy.ports_for(servers[(entry.region, entry.server)]),
+            )
+            for entry in plan.entries
+            if entry.resource == PlanEntry.firewall()
+        ]
+        self.light_sail.apply_rules(changes, parallel)
+        alarm_changes: dict[str, tuple[list[dict], list[str]]] = {}
+        for entry in alarm_entries:
+            json_alarms, deletes = LightSail.diff_alarms(
+                current[entry.server], self.policy.alarms_for(servers[(entry.region, entry.server)])
+            )
+            region_changes = alarm_changes.setdefault(entry.region, ([], []))
+            region_changes[0].extend(json_alarms)
+            region_changes[1].extend(deletes)
+        summary = self.light_sail.apply_alarms(alarm_changes, parallel)
+        for entry in plan.entries:
+            self.journal.record(entry.region, entry.server, entry.resource, entry.desired)
+        self.journal.save()
+        return len(changes), summary
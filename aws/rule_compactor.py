@@ -0,0 +1,94 @@
+import ipaddress
+from collections.abc import Sequence
+
+from aws.immutable.port import Port
+
+Network = ipaddress.IPv4Network | ipaddress.IPv6Network
+Ranges = dict[tuple[int, int], list[Network]]
+
+
+class RuleCompactor:
+    # for the other protocols, the ports are ICMP types and codes (or ignored) and cannot be merged as ranges
+    RANGED = ("tcp", "udp")
+    # the rules ending at the SSH port are given the access from the AWS console (LightSail.set_rules), merging
+    # them would open a wider range to the console
+    SSH_PORT = 22
+
+    @classmethod
+    def compact(cls, rules: Sequence[Port]) -> list[Port]:
+        # the same access with fewer rules: duplicates removed, CIDRs collapsed, port ranges merged,
+        # and the CIDRs already allowed by a rule of a wider port range dropped, the SSH rules only collapsed
+        per_protocol: dict[str, dict[tuple[int, int], set[Network]]] = {}
+        for rule in rules:
+            networks = per_protocol.setdefault(rule.Protocol, {}).setdefault((rule.FromPort, rule.ToPort), set())
+            networks.update(ipaddress.ip_network(cidr, strict=False) for cidr in rule.Cidrs)
+        result: list[Port] = []
+        for protocol, protocol_ranges in per_protocol.items():
+            ranges = {ports: cls.collapse(cidrs) for ports, cidrs in protocol_ranges.items() if not cls.ssh(ports)}
+            if protocol in cls.RANGED:
+                ranges = cls.merge_ranges(ranges)
+            ranges = cls.drop_covered(ranges)
+            ranges |= {ports: cls.collapse(cidrs) for ports, cidrs in protocol_ranges.items() if cls.ssh(ports)}
+            for (from_port, to_port), cidrs in ranges.items():
+                result.append(Port.shared(from_port, to_port, protocol, tuple(str(cidr) for cidr in cidrs)))
+        result.sort(key=lambda x: (x.Protocol, x.FromPort, x.ToPort, x.Cidrs))
+        return result
+
+    @classmethod
+    def ssh(cls, ports: tuple[int, int]) -> bool:
+        return ports[1] == cls.SSH_PORT
+
+    @classmethod
+    def collapse(cls, networks: set[Network]) -> list[Network]:
+        # adjacent or nested networks are merged into their supernet, per IP version
+        result: list[Network] = []
+        result.extend(ipaddress.collapse_addresses([x for x in networks if isinstance(x, ipaddress.IPv4Network)]))
+        result.extend(ipaddress.collapse_addresses([x for x in networks if isinstance(x, ipaddress.IPv6Network)]))
+        return result
+
+    @classmethod
+    def merge_ranges(cls, ranges: Ranges) -> Ranges:
+        # the overlapping or adjacent ranges open to the same CIDRs are merged, then the CIDRs of the identical
+        # ranges are merged, until nothing changes
+        while True:
+            per_cidrs: dict[tuple[Network, ...], list[tuple[int, int]]] = {}
+            for ports, cidrs in ranges.items():
+                per_cidrs.setdefault(tuple(cidrs), []).append(ports)
+            merged: dict[tuple[int, int], set[Network]] = {}
+            for networks, port_ranges in per_cidrs.items():
+                for from_port, to_port in cls.merge(port_ranges):
+                    merged.setdefault((from_port, to_port), set()).update(networks)
+            result = {ports: cls.collapse(cidrs) for ports, cidrs in merged.items()}
+            if result == ranges:
+                return result
+            ranges = result
+
+    @classmethod
+    def merge(cls, ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+        result: list[tuple[int, int]] = []
+        for from_port, to_port in sorted(ranges):
+            if result and from_port <= result[-1][1] + 1:
+                result[-1] = (result[-1][0], max(result[-1][1], to_port))
+            else:
+                result.append((from_port, to_port))
+        return result
+
+    @classmethod
+    def drop_covered(cls, ranges: Ranges) -> Ranges:
+        # a CIDR is dropped when a rule of a wider range is open to it (or to its supernet)
+        result: Ranges = {}
+        for (from_port, to_port), cidrs in ranges.items():
+            wider = [
+                others
+                for (other_from, other_to), others in ranges.items()
+                if other_from <= from_port and to_port <= other_to and (other_from, other_to) != (from_port, to_port)
+            ]
+            kept = [cidr for cidr in cidrs if not any(cls.covered(cidr, others) for others in wider)]
+            if kept or not cidrs:
+                result[(from_port, to_port)] = kept
+        return result
+
+    @classmethod
+    def covered(cls, network: Network, others: list[Network]) -> bool:
+        # subnet_of is only defined between networks of the same version
+        return any(network.version == other.version and network.subnet_of(other) for other in others)  # type: ignore
@@ -0,0 +1,269 @@
+import hashlib
+import json
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Iterator
+
+from aws.immutable.alarm_response import AlarmResponse
+from aws.immutable.alarm_transition import AlarmTransition
+from aws.immutable.port import Port
+from aws.immutable.server import Server
+from aws.immutable.server_change import ServerChange
+from aws.tag_index import TagIndex
+
+
+class SnapshotStore:
+    SERVERS = "servers"
+    ALARMS = "alarms"
+    BATCH = 500  # the maximum number of parameters of a query
+    SCHEMA = (
+        # each distinct server or alarm is stored once, by its content hash
+        "CREATE TABLE IF NOT EXISTS contents (hash TEXT PRIMARY KEY, body TEXT NOT NULL)",
+        # a load identical to the previous one of the region only extends it (seen)
+        "CREATE TABLE IF NOT EXISTS snapshots ("
+        " id INTEGER PRIMARY KEY, kind TEXT NOT NULL, region TEXT NOT NULL,"
+        " taken REAL NOT NULL, seen REAL NOT NULL, digest TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS snapshots_taken ON snapshots (kind, region, taken)",
+        "CREATE TABLE IF NOT EXISTS records ("
+        " snapshot INTEGER NOT NULL, server TEXT NOT NULL, name TEXT NOT NULL, hash TEXT NOT NULL,"
+        " PRIMARY KEY (snapshot, name))",
+        "CREATE INDEX IF NOT EXISTS records_server ON records (server, snapshot)",
+        "CREATE TABLE IF NOT EXISTS tags (hash TEXT NOT NULL, key TEXT NOT NULL, value TEXT, PRIMARY KEY (hash, key))",
+        "CREATE INDEX IF NOT EXISTS tags_key ON tags (key, value)",
+    )
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path or self.default_path()
+        self.lock = Lock()  # the regions are loaded in parallel
+        self.compared: dict[str, tuple[str, str]] = {}  # the times of the snapshots compared by the last diff
+
+    @classmethod
+    def default_path(cls) -> Path:
+        return Path(f"{Path(__file__).parent.parent}/secrets/snapshots.sqlite3")
+
+    @classmethod
+    def timestamp(cls, when: float) -> str:
+        return datetime.fromtimestamp(when).astimezone().isoformat(timespec="seconds")
+
+    def connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        for statement in self.SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    def record_servers(self, region: str, servers: list[Server], now: float | None = None) -> int:
+        return self.record(self.SERVERS, region, [(x.name, x.name, x.to_json()) for x in servers], now or time())
+
+    def record_alarms(self, region: str, alarms: list[AlarmResponse], now: float | None = None) -> int:
+        return self.record(self.ALARMS, region, [(x.server, x.name, x._asdict()) for x in alarms], now or time())
+
+    def record(self, kind: str, region: str, items: list[tuple[str, str, dict]], now: float) -> int:
+        # items: the server, the name and the content of each record; the id of the snapshot is returned
+        bodies = {name: json.dumps(body, sort_keys=True) for _, name, body in items}
+        hashes = {name: hashlib.md5(body.encode()).hexdigest() for name, body in bodies.items()}
+        digest = hashlib.md5("\n".join(f"{name} {hashes[name]}" for name in sorted(hashes)).encode()).hexdigest()
+        with self.lock, closing(self.connect()) as connection, connection:
+            latest = connection.execute(
+                "SELECT id, digest FROM snapshots WHERE kind = ? AND region = ? ORDER BY taken DESC LIMIT 1",
+                (kind, region),
+            ).fetchone()
+            if latest is not None and latest[1] == digest:
+                connection.execute("UPDATE snapshots SET seen = ? WHERE id = ?", (now, latest[0]))
+                return latest[0]
+            cursor = connection.execute(
+                "INSERT INTO snapshots (kind, region, taken, seen, digest) VALUES (?, ?, ?, ?, ?)",
+                (kind, region, now, now, digest),
+            )
+            snapshot = cursor.lastrowid
+            assert snapshot is not None
+            connection.executemany(
+                "INSERT OR IGNORE INTO contents (hash, body) VALUES (?, ?)",
+                ((hashes[name], body) for name, body in bodies.items()),
+            )
+            connection.executemany(
+                "INSERT INTO records (snapshot, server, name, hash) VALUES (?, ?, ?, ?)",
+                ((snapshot, server, name, hashes[name]) for server, name, _ in items),
+            )
+            if kind == self.SERVERS:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO tags (hash, key, value) VALUES (?, ?, ?)",
+                    ((hashes[name], tag["key"], tag.get("value")) for _, name, body in items for tag in body["tags"]),
+                )
+            return snapshot
+
+    @classmethod
+    def snapshots(
+        cls, connection: sqlite3.Connection, kind: str, region: str, since: float, until: float
+    ) -> list[tuple[int, float]]:
+        # the snapshot valid at the start of the period (the oldest one otherwise), then the ones taken meanwhile
+        rows = connection.execute(
+            "SELECT id, taken FROM snapshots WHERE kind = ? AND region = ? AND taken > ? AND taken <= ?"
+            " ORDER BY taken",
+            (kind, region, since, until),
+        ).fetchall()
+        start = connection.execute(
+            "SELECT id, taken FROM snapshots WHERE kind = ? AND region = ? AND taken <= ? ORDER BY taken DESC LIMIT 1",
+            (kind, region, since),
+        ).fetchone()
+        if start is not None:
+            rows.insert(0, start)
+        return [(row[0], row[1]) for row in rows]
+
+    @classmethod
+    def records(cls, connection: sqlite3.Connection, snapshot: int) -> dict[str, tuple[str, str]]:
+        # the server and the content hash per name
+        rows = connection.execute("SELECT name, server, hash FROM records WHERE snapshot = ?", (snapshot,))
+        return {name: (server, hashed) for name, server, hashed in rows}
+
+    @classmethod
+    def bodies(cls, connection: sqlite3.Connection, hashes: set[str]) -> dict[str, dict]:
+        result: dict[str, dict] = {}
+        ordered = sorted(hashes)
+        for start in range(0, len(ordered), cls.BATCH):
+            batch = ordered[start : start + cls.BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for hashed, body in connection.execute(
+                f"SELECT hash, body FROM contents WHERE hash IN ({placeholders})", batch
+            ):
+                result[hashed] = json.loads(body)
+        return result
+
+    def tag_index(self, regions: list[str], since: float, until: float) -> TagIndex:
+        # the servers known in the period, with all the tags they had meanwhile
+        result = TagIndex([])
+        with closing(self.connect()) as connection:
+            for region in regions:
+                for snapshot, _ in self.snapshots(connection, self.SERVERS, region, since, until):
+                    rows = connection.execute(
+                        "SELECT r.server, t.key, t.value FROM records r LEFT JOIN tags t ON t.hash = r.hash"
+                        " WHERE r.snapshot = ?",
+                        (snapshot,),
+                    )
+                    for server, key, value in rows:
+                        result.names.add(server)
+                        if key is not None:
+                            result.add(server, key, value)
+        return result
+
+    def diff(self, regions: list[str], since: float, until: float) -> list[ServerChange]:
+        # the servers changed between the snapshot valid at since and the one valid at until
+        result: list[ServerChange] = []
+        self.compared = {}
+        with closing(self.connect()) as connection:
+            for region in regions:
+                snapshots = self.snapshots(connection, self.SERVERS, region, since, until)
+                if not snapshots:
+                    continue
+                (before, taken_before), (after, taken_after) = snapshots[0], snapshots[-1]
+                self.compared[region] = (self.timestamp(taken_before), self.timestamp(taken_after))
+                result.extend(self.server_changes(connection, region, before, after, taken_after))
+        return sorted(result, key=lambda x: (x.region, x.server, x.change))
+
+    def history(self, regions: list[str], since: float, until: float) -> list[ServerChange]:
+        # the servers changed between each snapshot of the period and the previous one
+        result: list[ServerChange] = []
+        with closing(self.connect()) as connection:
+            for region in regions:
+                snapshots = self.snapshots(connection, self.SERVERS, region, since, until)
+                for (before, _), (after, taken) in zip(snapshots, snapshots[1:]):
+                    result.extend(self.server_changes(connection, region, before, after, taken))
+        return sorted(result, key=lambda x: (x.time, x.region, x.server, x.change))
+
+    def server_changes(
+        self, connection: sqlite3.Connection, region: str, before: int, after: int, taken: float
+    ) -> Iterator[ServerChange]:
+        # only the contents of the records whose hash changed are loaded
+        old, new = self.records(connection, before), self.records(connection, after)
+        changed = {name for name in old.keys() | new.keys() if old.get(name) != new.get(name)}
+        bodies = self.bodies(
+            connection, {old[x][1] for x in changed if x in old} | {new[x][1] for x in changed if x in new}
+        )
+        now = self.timestamp(taken)
+        for name in sorted(changed):
+            if name not in old:
+                yield ServerChange(now, region, name, ServerChange.added(), "", "")
+            elif name not in new:
+                yield ServerChange(now, region, name, ServerChange.removed(), "", "")
+            else:
+                yield from self.compare(
+                    now, region, Server.from_json(bodies[old[name][1]]), Server.from_json(bodies[new[name][1]])
+                )
+
+    @classmethod
+    def compare(cls, now: str, region: str, old: Server, new: Server) -> Iterator[ServerChange]:
+        if old.state != new.state:
+            yield ServerChange(now, region, new.name, ServerChange.state(), old.state, new.state)
+        if old.external_ip != new.external_ip:
+            yield ServerChange(now, region, new.name, ServerChange.ip(), old.external_ip, new.external_ip)
+        if Port.hashed_rules(old.firewall) != Port.hashed_rules(new.firewall):
+            before, after = cls.rules(old.firewall), cls.rules(new.firewall)
+            yield ServerChange(
+                now,
+                region,
+                new.name,
+                ServerChange.firewall(),
+                ", ".join(sorted(before - after)),
+                ", ".join(sorted(after - before)),
+            )
+        before, after = cls.tags(old), cls.tags(new)
+        if before != after:
+            yield ServerChange(
+                now,
+                region,
+                new.name,
+                ServerChange.tags(),
+                ", ".join(sorted(before - after)),
+                ", ".join(sorted(after - before)),
+            )
+
+    @classmethod
+    def rules(cls, ports) -> set[str]:
+        result: set[str] = set()
+        for port in ports:
+            ports_range = f"{port.FromPort}" if port.FromPort == port.ToPort else f"{port.FromPort}-{port.ToPort}"
+            result.update(f"{ports_range}/{port.Protocol} {cidr}" for cidr in port.Cidrs)
+        return result
+
+    @classmethod
+    def tags(cls, server: Server) -> set[str]:
+        return {f"{key}:{value}" for key, value in server.tags.items()} | set(server.flags)
+
+    def alarm_history(self, regions: list[str], since: float, until: float) -> list[AlarmTransition]:
+        # the state of each alarm at the start of the period when not OK, then its changes
+        result: list[AlarmTransition] = []
+        with closing(self.connect()) as connection:
+            for region in regions:
+                states: dict[str, str] = {}  # per alarm
+                hashes: dict[str, str] = {}
+                alarms: dict[str, AlarmResponse] = {}
+                for index, (snapshot, taken) in enumerate(
+                    self.snapshots(connection, self.ALARMS, region, since, until)
+                ):
+                    records = self.records(connection, snapshot)
+                    changed = {name for name, (_, hashed) in records.items() if hashes.get(name) != hashed}
+                    bodies = self.bodies(connection, {records[name][1] for name in changed})
+                    now = self.timestamp(max(taken, since))
+                    for name in sorted(hashes.keys() - records.keys()):
+                        alarm = alarms.pop(name)
+                        del hashes[name]
+                        result.append(AlarmTransition.of(now, alarm, AlarmTransition.removed(), states.pop(name), ""))
+                    for name in sorted(changed):
+                        alarm = AlarmResponse(**bodies[records[name][1]])
+                        hashes[name] = records[name][1]
+                        alarms[name] = alarm
+                        previous = states.get(name)
+                        states[name] = alarm.state
+                        if previous is None and index == 0 and alarm.state != "OK":
+                            result.append(AlarmTransition.of(now, alarm, AlarmTransition.initial(), "", alarm.state))
+                        elif previous is None and index > 0:
+                            result.append(AlarmTransition.of(now, alarm, AlarmTransition.added(), "", alarm.state))
+                        elif previous is not None and previous != alarm.state:
+                            result.append(
+                                AlarmTransition.of(now, alarm, AlarmTransition.changed(), previous, alarm.state)
+                            )
+        return sorted(result, key=lambda x: (x.time, x.region, x.server, x.name))
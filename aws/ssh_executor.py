@@ -0,0 +1,320 @@
+import hashlib
+import shlex
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from functools import partial
+from pathlib import Path
+from subprocess import Popen, PIPE, STDOUT, TimeoutExpired, run
+from threading import Event, Lock, Thread, Timer
+from time import monotonic, sleep
+from typing import IO, BinaryIO, Callable, Iterator
+
+from aws.immutable.server import Server
+from aws.immutable.ssh_command_response import SshCommandResponse
+from aws.instrumentation import Instrumentation
+
+
+class SshExecutor:
+    SSH_BINARY = "ssh"
+    SCP_BINARY = "scp"
+    CONTROL_PERSIST = 600  # default time to live (sec.) of the master connections opened by connect
+    EXIT_TIMEOUT = 124  # the exit code of the timed out commands, as timeout(1)
+    MAX_LINE = 65536  # longer lines are split
+
+    def __init__(
+        self,
+        ssh_keys: dict[str, str],
+        parallel: int,
+        connect_timeout: int,
+        command_timeout: int,
+        control_persist: int = 0,
+        instrumentation: Instrumentation | None = None,
+        max_lines: int = 0,
+        log_directory: Path | None = None,
+        on_line: Callable[[str, str], None] | None = None,
+    ) -> None:
+        self.ssh_keys = ssh_keys  # the key file per region
+        self.parallel = max(1, parallel)
+        self.connect_timeout = connect_timeout
+        self.command_timeout = command_timeout
+        self.control_persist = control_persist
+        self.instrumentation = instrumentation
+        self.max_lines = max_lines  # the last lines kept in memory per server, 0 = all
+        self.log_directory = log_directory  # the full output of each server is written to <server>.log
+        self.on_line = on_line  # called with the server and each line, as they come
+        self.output_lock = Lock()
+        self.skipped: list[Server] = []  # the servers not run by the last rolling execution, once aborted
+        self.unchanged: list[Server] = []  # the servers already holding the file of the last push
+
+    @classmethod
+    def control_directory(cls) -> Path:
+        return Path(f"{Path(__file__).parent.parent}/secrets/ssh_control")
+
+    def control_path(self) -> str:
+        directory = self.control_directory()
+        if directory.exists() is False:
+            directory.mkdir(mode=0o700, parents=True)
+        return f"{directory.as_posix()}/%C"
+
+    def multiplex_options(self) -> list[str]:
+        if self.control_persist <= 0:
+            return []
+        return [
+            "-o",
+            "ControlMaster=auto",
+            "-o",
+            f"ControlPath={self.control_path()}",
+            "-o",
+            f"ControlPersist={self.control_persist}s",
+        ]
+
+    def ssh_arguments(self, ssh_key: str, public_ip: str, command: str) -> list[str]:
+        return [
+            self.SSH_BINARY,
+            "-i",
+            ssh_key,
+            "-o",
+            "StrictHostKeyChecking=no",
+            "-o",
+            f"ConnectTimeout={self.connect_timeout}",
+            *self.multiplex_options(),
+            f"ubuntu@{public_ip}",
+            command,
+        ]
+
+    def scp_arguments(self, ssh_key: str, public_ip: str, source: Path, destination: str, limit: int) -> list[str]:
+        # limit: the bandwidth of the transfer (Kbit/s), 0 = unlimited
+        return [
+            self.SCP_BINARY,
+            "-q",
+            "-i",
+            ssh_key,
+            "-o",
+            "StrictHostKeyChecking=no",
+            "-o",
+            f"ConnectTimeout={self.connect_timeout}",
+            *self.multiplex_options(),
+            *(["-l", str(limit)] if limit > 0 else []),
+            source.as_posix(),
+            f"ubuntu@{public_ip}:{destination}",
+        ]
+
+    def exit_arguments(self, public_ip: str) -> list[str]:
+        return [self.SSH_BINARY, "-o", f"ControlPath={self.control_path()}", "-O", "exit", f"ubuntu@{public_ip}"]
+
+    def execute(self, server: Server, command: str) -> SshCommandResponse:
+        return self._execute(server, self.ssh_arguments(self.ssh_keys[server.region], server.external_ip, command))
+
+    def log_file(self, server: Server) -> BinaryIO | None:
+        if self.log_directory is None:
+            return None
+        self.log_directory.mkdir(parents=True, exist_ok=True)
+        return open(self.log_directory / f"{server.name}.log", "wb")
+
+    def _execute(self, server: Server, arguments: list[str], stdin: bytes | None = None) -> SshCommandResponse:
+        # the output is read line by line, only the last max_lines are kept in memory
+        start = monotonic()
+        lines: deque[str] = deque(maxlen=self.max_lines or None)
+        received = 0
+        size = 0
+        timed_out = Event()
+        log_file = self.log_file(server)
+        with Popen(arguments, stdin=PIPE if stdin is not None else None, stdout=PIPE, stderr=STDOUT) as process:
+            if stdin is not None:
+                Thread(target=self.feed, args=(process.stdin, stdin), daemon=True).start()
+
+            def kill():
+                timed_out.set()
+                process.kill()
+
+            timer = Timer(self.command_timeout, kill) if self.command_timeout > 0 else None
+            if timer is not None:
+                timer.start()
+            try:
+                assert process.stdout is not None
+                for raw in iter(partial(process.stdout.readline, self.MAX_LINE), b""):
+                    size += len(raw)
+                    if log_file is not None:
+                        log_file.write(raw)
+                    line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                    lines.append(line)
+                    received += 1
+                    if self.on_line is not None:
+                        with self.output_lock:
+                            self.on_line(server.name, line)
+                exit_code = process.wait()
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                if log_file is not None:
+                    log_file.close()
+        if timed_out.is_set():
+            exit_code = self.EXIT_TIMEOUT
+            lines.append(f"*** timed out after {self.command_timeout}s")
+            received += 1
+        elapsed = monotonic() - start
+        if self.instrumentation is not None:
+            self.instrumentation.record("ssh", elapsed, size=size, error=exit_code != 0)
+        return SshCommandResponse(
+            server=f"{server.name} ({server.external_ip})",
+            response=list(lines),
+            elapsed=elapsed,
+            exit_code=exit_code,
+            dropped=received - len(lines),
+        )
+
+    @classmethod
+    def feed(cls, pipe: IO[bytes], content: bytes):
+        # written from its own thread, the output is read meanwhile
+        try:
+            pipe.write(content)
+            pipe.close()
+        except BrokenPipeError:
+            pass  # the remote side stopped reading
+
+    def run(self, servers: list[Server], command: str) -> Iterator[SshCommandResponse]:
+        return self._fan_out(servers, lambda server: self.execute(server, command))
+
+    def script(self, servers: list[Server], script: Path, arguments: str = "") -> Iterator[SshCommandResponse]:
+        # the local script is streamed to bash over stdin, nothing is copied on the servers
+        content = script.read_bytes()
+        command = f"bash -s -- {arguments}".rstrip()
+        return self._fan_out(
+            servers,
+            lambda server: self._execute(
+                server, self.ssh_arguments(self.ssh_keys[server.region], server.external_ip, command), content
+            ),
+        )
+
+    def push(
+        self, servers: list[Server], source: Path, destination: str, bandwidth: int = 0, dry_run: bool = False
+    ) -> Iterator[SshCommandResponse]:
+        # the file is only transferred to the servers not holding an identical copy yet;
+        # bandwidth: the total (KB/s) shared by the concurrent transfers, 0 = unlimited
+        digest = hashlib.sha256()
+        with open(source, "rb") as file:
+            for chunk in iter(partial(file.read, 1 << 20), b""):
+                digest.update(chunk)
+        checksum = digest.hexdigest()
+        if destination.endswith("/"):
+            destination += source.name
+        limit = max(1, bandwidth * 8 // min(self.parallel, max(1, len(servers)))) if bandwidth > 0 else 0
+        self.unchanged = []
+        return self._fan_out(
+            servers, lambda server: self.push_file(server, source, destination, checksum, limit, dry_run)
+        )
+
+    def remote_checksum(self, server: Server, destination: str, name: str) -> tuple[int, str]:
+        # the exit code and the SHA-256 of the remote file, empty if missing;
+        # as scp, an existing directory receives the file under its name
+        path = shlex.quote(destination)
+        if destination.startswith("~/"):
+            path = f"~/{shlex.quote(destination[2:])}"  # still expanded by the remote shell
+        command = (
+            f'target={path}; [ -d "$target" ] && target="$target"/{shlex.quote(name)}; '
+            'sha256sum -- "$target" 2>/dev/null || true'
+        )
+        arguments = self.ssh_arguments(self.ssh_keys[server.region], server.external_ip, command)
+        start = monotonic()
+        try:
+            completed = run(arguments, capture_output=True, timeout=self.command_timeout or None, check=False)
+            exit_code = completed.returncode
+            output = completed.stdout if exit_code == 0 else completed.stderr
+            remote = output.decode("utf-8", errors="replace").strip()
+        except TimeoutExpired:
+            exit_code, remote = self.EXIT_TIMEOUT, f"*** timed out after {self.command_timeout}s"
+        if self.instrumentation is not None:
+            self.instrumentation.record("ssh", monotonic() - start, error=exit_code != 0)
+        if exit_code != 0:
+            return exit_code, remote
+        return 0, remote.split(" ")[0] if remote else ""
+
+    def push_file(
+        self, server: Server, source: Path, destination: str, checksum: str, limit: int, dry_run: bool
+    ) -> SshCommandResponse:
+        start = monotonic()
+        exit_code, remote = self.remote_checksum(server, destination, source.name)
+        if exit_code != 0:
+            lines = remote.splitlines()
+        elif remote == checksum:
+            self.unchanged.append(server)
+            lines = [f"{destination} unchanged"]
+        elif dry_run:
+            lines = [f"{destination} to transfer"]
+        else:
+            arguments = self.scp_arguments(
+                self.ssh_keys[server.region], server.external_ip, source, destination, limit
+            )
+            response = self._execute(server, arguments)
+            exit_code = response.exit_code
+            lines = response.response or [f"{destination} transferred"]
+        return SshCommandResponse(
+            server=f"{server.name} ({server.external_ip})",
+            response=lines,
+            elapsed=monotonic() - start,
+            exit_code=exit_code,
+        )
+
+    def rolling(
+        self,
+        servers: list[Server],
+        command: str,
+        batch_size: int,
+        canary: int = 0,
+        pause: float = 0.0,
+        max_failure_rate: float = 1.0,
+    ) -> Iterator[SshCommandResponse]:
+        # at most batch_size servers run at once, the next one starts as soon as a slot is free,
+        # with a pause after each batch_size servers started;
+        # the canary servers run first, on their own, and must all succeed;
+        # no server is started once the failure rate is exceeded
+        batch_size = max(1, batch_size)
+        stages = [servers[:canary], servers[canary:]] if canary > 0 else [servers]
+        self.skipped = []
+        completed = 0
+        failed = 0
+        aborted = False
+        with ThreadPoolExecutor(max_workers=batch_size) as pool:
+            for index, stage in enumerate(stages):
+                pending = deque(stage)
+                running: set[Future] = set()
+                started = 0
+                while pending or running:
+                    while pending and len(running) < batch_size and aborted is False:
+                        if pause > 0 and started and started % batch_size == 0:
+                            sleep(pause)
+                        running.add(pool.submit(self.execute, pending.popleft(), command))
+                        started += 1
+                    if not running:
+                        break
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        response = future.result()
+                        completed += 1
+                        failed += response.exit_code != 0
+                        yield response
+                    aborted = aborted or failed / completed > max_failure_rate
+                aborted = aborted or (canary > 0 and index == 0 and failed > 0)
+                if aborted:
+                    self.skipped = list(pending) + [server for later in stages[index + 1 :] for server in later]
+                    break
+                if pause > 0 and index + 1 < len(stages):
+                    sleep(pause)
+
+    def connect(self, servers: list[Server]) -> Iterator[SshCommandResponse]:
+        # the master connections stay open in the background for control_persist seconds
+        if self.control_persist <= 0:
+            self.control_persist = self.CONTROL_PERSIST
+        return self.run(servers, "true")
+
+    def disconnect(self, servers: list[Server]) -> Iterator[SshCommandResponse]:
+        return self._fan_out(servers, lambda server: self._execute(server, self.exit_arguments(server.external_ip)))
+
+    def _fan_out(
+        self, servers: list[Server], function: Callable[[Server], SshCommandResponse]
+    ) -> Iterator[SshCommandResponse]:
+        # the results are provided in completion order
+        with ThreadPoolExecutor(max_workers=self.parallel) as pool:
+            futures = [pool.submit(function, server) for server in servers]
+            for future in as_completed(futures):
+                yield future.result()
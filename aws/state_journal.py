@@ -0,0 +1,35 @@
+import json
+from pathlib import Path
+from time import time
+
+
+class StateJournal:
+    def __init__(self, journal_file: Path | None = None) -> None:
+        # per server and resource, the hash of the content last applied or found in line with the policy
+        self.journal_file = journal_file or self.default_file()
+        self.states: dict[str, dict] = {}
+        if self.journal_file.exists():
+            try:
+                self.states = json.loads(self.journal_file.read_text())
+            except ValueError:
+                self.states = {}
+
+    @classmethod
+    def default_file(cls) -> Path:
+        return Path(f"{Path(__file__).parent.parent}/secrets/state_journal.json")
+
+    @classmethod
+    def key(cls, region: str, server: str) -> str:
+        return f"{region}/{server}"
+
+    def hashed(self, region: str, server: str, resource: str) -> str:
+        return self.states.get(self.key(region, server), {}).get(resource, "")
+
+    def record(self, region: str, server: str, resource: str, hashed: str):
+        state = self.states.setdefault(self.key(region, server), {})
+        state[resource] = hashed
+        state["timestamp"] = time()
+
+    def save(self):
+        self.journal_file.write_text(json.dumps(self.states, indent=1, sort_keys=True))
+        self.journal_file.chmod(0o600)
@@ -0,0 +1,87 @@
+import csv
+import json
+import sys
+from itertools import islice
+from typing import Iterable, TextIO
+
+from aws.immutable.print_column import PrintColumn
+
+
+class TableRenderer:
+    TABLE = "table"
+    STREAM = "stream"
+    JSON = "json"
+    JSONL = "jsonl"
+    CSV = "csv"
+    OUTPUTS = (TABLE, STREAM, JSON, JSONL, CSV)
+
+    def __init__(self, columns: list[PrintColumn], output: str = TABLE, sample: int = 50, out: TextIO | None = None):
+        self.columns = columns
+        self.output = output
+        self.sample = sample  # the number of rows used to size the streamed columns, 0 = the column sizes
+        self.out = out or sys.stdout
+
+    @classmethod
+    def machine_readable(cls, output: str) -> bool:
+        return output in (cls.JSON, cls.JSONL, cls.CSV)
+
+    def render(self, lines: Iterable):
+        if self.output == self.JSON:
+            print(json.dumps([self.values(line) for line in lines], default=str), file=self.out)
+        elif self.output == self.JSONL:
+            for line in lines:
+                print(json.dumps(self.values(line), default=str), file=self.out)
+        elif self.output == self.CSV:
+            writer = csv.writer(self.out, lineterminator="\n")
+            writer.writerow([c.label for c in self.columns])
+            writer.writerows([str(value) for value in self.values(line).values()] for line in lines)
+        elif self.output == self.STREAM:
+            self.render_stream(lines)
+        else:
+            rows = [self.cells(line) for line in lines]
+            self.render_rows(rows, self.widths(rows))
+
+    def render_stream(self, lines: Iterable):
+        # the columns are sized with the first rows, the other rows are printed as they come
+        iterator = iter(lines)
+        rows = [self.cells(line) for line in islice(iterator, self.sample)]
+        widths = self.widths(rows)
+        self.render_rows(rows, widths, (self.cells(line) for line in iterator))
+
+    def values(self, line) -> dict:
+        return {c.label: c.formatter(line) for c in self.columns}
+
+    def cells(self, line) -> list[str]:
+        return [str(c.formatter(line)) for c in self.columns]
+
+    def widths(self, rows: list[list[str]]) -> list[int]:
+        result = [max(c.size, len(c.label)) for c in self.columns]
+        for row in rows:
+            result = [max(len(cell), width) for cell, width in zip(row, result)]
+        return result
+
+    def render_rows(self, rows: list[list[str]], widths: list[int], more_rows: Iterable[list[str]] = ()):
+        length = sum(widths) + len(self.columns) * 3 - 1
+        dashed_line = f"+{'-' * length}+"
+        title = " | ".join([f"{c.label.center(width)}" for c, width in zip(self.columns, widths)])
+
+        print(dashed_line, file=self.out)
+        print(f"| {title} |", file=self.out)
+        print(dashed_line, file=self.out)
+        for row in rows:
+            print(self.row(row, widths), file=self.out)
+        for row in more_rows:
+            print(self.row(row, widths), file=self.out, flush=True)
+        print(dashed_line, file=self.out)
+
+    def row(self, cells: list[str], widths: list[int]) -> str:
+        texts: list[str] = []
+        for c, cell, width in zip(self.columns, cells, widths):
+            if c.alignment == PrintColumn.right():
+                texts.append(cell.rjust(width))
+            elif c.alignment == PrintColumn.left():
+                texts.append(cell.ljust(width))
+            else:  # center
+                texts.append(cell.center(width))
+        data = " | ".join(texts)
+        return f"| {data} |"
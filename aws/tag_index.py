@@ -0,0 +1,22 @@
+from aws.immutable.server import Server
+
+
+class TagIndex:
+    def __init__(self, servers: list[Server]) -> None:
+        # the server names per tag key (any value) and per key:value pair
+        self.names: set[str] = set()
+        self.index: dict[str, set[str]] = {}
+        for server in servers:
+            self.names.add(server.name)
+            for key, value in server.tags.items():
+                self.add(server.name, key, value)
+            for flag in server.flags:
+                self.add(server.name, flag)
+
+    def add(self, name: str, key: str, value: str | None = None):
+        self.index.setdefault(key, set()).add(name)
+        if value is not None:
+            self.index.setdefault(f"{key}:{value}", set()).add(name)
+
+    def servers(self, tag: str) -> set[str]:
+        return self.index.get(tag, set())
@@ -0,0 +1,85 @@
+import re
+
+from aws.tag_index import TagIndex
+
+
+class TagSelector:
+    AND = "AND"
+    OR = "OR"
+    NOT = "NOT"
+    TAG = "TAG"
+    TOKENS = re.compile(r'\(|\)|"[^"]*"|[^\s()]+')
+
+    # the expression is made of tags (key:value or key only), combined with AND, OR, NOT and parenthesis
+    # NOT takes precedence over AND, which takes precedence over OR
+    # e.g. env:prod AND (role:web OR role:api) AND NOT maintenance
+    def __init__(self, expression: str) -> None:
+        self.expression = expression
+        normalized = re.sub(r"\s*:\s*", ":", expression)
+        self.tokens = [token.strip('"').strip() for token in self.TOKENS.findall(normalized)]
+        self.position = 0
+        self.tree: tuple | None = None
+        if self.tokens:
+            self.tree = self._parse_or()
+            if self.position < len(self.tokens):
+                raise ValueError(f"unexpected '{self.tokens[self.position]}' in the tag selector: {expression}")
+
+    def _next(self) -> str:
+        if self.position >= len(self.tokens):
+            raise ValueError(f"incomplete tag selector: {self.expression}")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def _peek(self) -> str:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return ""
+
+    def _parse_or(self) -> tuple:
+        result = self._parse_and()
+        while self._peek() == self.OR:
+            self._next()
+            result = (self.OR, result, self._parse_and())
+        return result
+
+    def _parse_and(self) -> tuple:
+        result = self._parse_not()
+        while self._peek() == self.AND:
+            self._next()
+            result = (self.AND, result, self._parse_not())
+        return result
+
+    def _parse_not(self) -> tuple:
+        if self._peek() == self.NOT:
+            self._next()
+            return self.NOT, self._parse_not()
+        return self._parse_tag()
+
+    def _parse_tag(self) -> tuple:
+        token = self._next()
+        if token == "(":
+            result = self._parse_or()
+            if self._next() != ")":
+                raise ValueError(f"missing ')' in the tag selector: {self.expression}")
+            return result
+        if token in (")", self.AND, self.OR):
+            raise ValueError(f"unexpected '{token}' in the tag selector: {self.expression}")
+        key, *value = token.split(":", 1)
+        if value:
+            token = f"{key.strip()}:{value[0].strip()}"
+        return self.TAG, token
+
+    def select(self, index: TagIndex) -> set[str]:
+        if self.tree is None:
+            return set(index.names)
+        return self._evaluate(self.tree, index)
+
+    def _evaluate(self, tree: tuple, index: TagIndex) -> set[str]:
+        if tree[0] == self.TAG:
+            return index.servers(tree[1])
+        if tree[0] == self.NOT:
+            return index.names - self._evaluate(tree[1], index)
+        if tree[0] == self.AND:
+            return self._evaluate(tree[1], index) & self._evaluate(tree[2], index)
+        return self._evaluate(tree[1], index) | self._evaluate(tree[2], index)
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+from time import monotonic
+from typing import NamedTuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import Menu  # noqa: E402
+from aws.immutable.print_column import PrintColumn  # noqa: E402
+from aws.immutable.request_parameter import RequestParameter  # noqa: E402
+from aws.light_sail_regions import LightSailRegions  # noqa: E402
+from aws.lightsail import LightSail  # noqa: E402
+from aws.policy import Policy  # noqa: E402
+from aws.ssh_executor import SshExecutor  # noqa: E402
+from aws.table_renderer import TableRenderer  # noqa: E402
+from benchmarks.fake_lightsail import FakeLightSail  # noqa: E402
+
+
+class BenchmarkResult(NamedTuple):
+    size: int
+    subcommand: str
+    elapsed: float
+    api_calls: int
+    calls: dict[str, int]
+    peak_mb: float
+
+
+class FleetBenchmark:
+    REGION = "bench-1"
+    SIZES = (10, 500, 5000)
+    SUBCOMMANDS = ("servers", "firewall", "alerts", "setFirewall", "setAlerts", "metrics", "command")
+    FIREWALL_RULES = [
+        {"tagKey": "", "tagValue": "", "fromPort": 22, "toPort": 22, "protocol": "tcp", "cidrs": ["1.2.3.4/32"]},
+        {"tagKey": "role", "tagValue": "web", "fromPort": 80, "toPort": 80, "protocol": "tcp", "cidrs": ["0.0.0.0/0"]},
+    ]
+    ALARMS = [
+        {
+            "tagKey": "",
+            "tagValue": "",
+            "alarmName": "cpu",
+            "metricName": "CPUUtilization",
+            "threshold": 90,
+            "evaluationPeriods": 3,
+            "datapointsToAlarm": 2,
+            "comparisonOperator": "GreaterThanOrEqualToThreshold",
+        },
+        {
+            "tagKey": "",
+            "tagValue": "",
+            "alarmName": "burst",
+            "metricName": "BurstCapacityPercentage",
+            "threshold": 20,
+            "evaluationPeriods": 3,
+            "datapointsToAlarm": 2,
+            "comparisonOperator": "GreaterThanOrEqualToThreshold",
+        },
+    ]
+
+    def __init__(self, latency: float, throttle_every: int, parallel: int, policy_directory: Path) -> None:
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.parallel = parallel
+        self.policy = Policy(policy_directory)
+
+    @classmethod
+    def write_policy(cls, directory: Path):
+        (directory / Policy.FIREWALL_FILE).write_text(json.dumps(cls.FIREWALL_RULES))
+        (directory / Policy.ALARMS_FILE).write_text(json.dumps(cls.ALARMS))
+
+    def run(self, size: int, subcommand: str, memory: bool) -> BenchmarkResult:
+        # each subcommand runs against a fresh fleet, so the updates of one do not hide the ones of the next
+        fake = FakeLightSail.fleet(size, self.latency, self.throttle_every)
+        menu = Menu(LightSailRegions([self.REGION], clients={self.REGION: fake}), self.policy)
+        request = RequestParameter(tag="", command="hostname", parallel=self.parallel)
+        commands = {
+            "servers": menu.show_servers,
+            "firewall": menu.show_firewall_rules,
+            "alerts": menu.show_alerts,
+            "setFirewall": menu.set_firewall_rules,
+            "setAlerts": menu.set_alerts,
+            "metrics": menu.show_metrics,
+            "command": menu.run_command,
+        }
+        if memory:
+            tracemalloc.start()
+        start = monotonic()
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            commands[subcommand](request)
+        elapsed = monotonic() - start
+        peak = 0
+        if memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        return BenchmarkResult(
+            size=size,
+            subcommand=subcommand,
+            elapsed=elapsed,
+            api_calls=sum(fake.calls.values()),
+            calls=dict(fake.calls),
+            peak_mb=peak / 1024 / 1024,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Menu subcommands against synthetic fleets")
+    parser.add_argument("--sizes", help="the fleet sizes", type=int, nargs="+", default=list(FleetBenchmark.SIZES))
+    parser.add_argument(
+        "--subcommands", nargs="+", choices=FleetBenchmark.SUBCOMMANDS, default=list(FleetBenchmark.SUBCOMMANDS)
+    )
+    parser.add_argument("--latency", help="the latency of each API call (sec.)", type=float, default=0.0)
+    parser.add_argument("--ssh-latency", help="the latency of each SSH command (sec.)", type=float, default=0.0)
+    parser.add_argument("--throttle-every", help="throttle every n-th write call (0=never)", type=int, default=0)
+    parser.add_argument("--parallel", help="the concurrency of the SSH sessions and updates", type=int, default=20)
+    parser.add_argument("--no-memory", help="skip the peak memory measurement", action="store_true")
+    parser.add_argument("--output", choices=TableRenderer.OUTPUTS, default=TableRenderer.TABLE)
+    parser.add_argument("--json", help="also write the results to that file", default="")
+    args = parser.parse_args()
+
+    os.environ["FAKE_SSH_LATENCY"] = str(args.ssh_latency)
+    SshExecutor.SSH_BINARY = str(Path(__file__).parent / "fake_ssh.sh")
+    LightSail.get_ssh_key = lambda self: "fake_key"  # type: ignore[method-assign]
+
+    results: list[BenchmarkResult] = []
+    with tempfile.TemporaryDirectory() as directory:
+        FleetBenchmark.write_policy(Path(directory))
+        benchmark = FleetBenchmark(args.latency, args.throttle_every, args.parallel, Path(directory))
+        for size in args.sizes:
+            for subcommand in args.subcommands:
+                result = benchmark.run(size, subcommand, memory=False)
+                if args.no_memory is False:
+                    # tracemalloc slows the run down, so the memory is measured on a second run
+                    result = result._replace(peak_mb=benchmark.run(size, subcommand, memory=True).peak_mb)
+                results.append(result)
+
+    columns = [
+        PrintColumn(label="servers", alignment=PrintColumn.right(), size=5, formatter=lambda x: x.size),
+        PrintColumn(label="subcommand", alignment=PrintColumn.left(), size=10, formatter=lambda x: x.subcommand),
+        PrintColumn(
+            label="time (sec.)", alignment=PrintColumn.right(), size=6, formatter=lambda x: f"{x.elapsed:.3f}"
+        ),
+        PrintColumn(label="API calls", alignment=PrintColumn.right(), size=5, formatter=lambda x: x.api_calls),
+        PrintColumn(label="peak (MB)", alignment=PrintColumn.right(), size=6, formatter=lambda x: f"{x.peak_mb:.1f}"),
+        PrintColumn(
+            label="calls",
+            alignment=PrintColumn.left(),
+            size=5,
+            formatter=lambda x: ", ".join(f"{key}={value}" for key, value in sorted(x.calls.items())),
+        ),
+    ]
+    TableRenderer(columns, args.output).render(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps([result._asdict() for result in results], indent=2))
+
+
+if __name__ == "__main__":
+    main()
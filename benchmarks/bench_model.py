@@ -0,0 +1,159 @@
+import argparse
+import gc
+import json
+import statistics
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from time import monotonic
+from typing import Callable, NamedTuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aws.immutable.print_column import PrintColumn  # noqa: E402
+from aws.immutable.server import Server  # noqa: E402
+from aws.lightsail import LightSail  # noqa: E402
+from aws.table_renderer import TableRenderer  # noqa: E402
+from benchmarks.fake_lightsail import FakeLightSail  # noqa: E402
+
+
+# the model before the slotted, frozen classes, kept as the reference
+@dataclass
+class LegacyPort:
+    FromPort: int
+    ToPort: int
+    Protocol: str
+    Cidrs: list[str]
+
+    @classmethod
+    def from_json(cls, data: dict) -> "LegacyPort":
+        return cls(FromPort=data["fromPort"], ToPort=data["toPort"], Protocol=data["protocol"], Cidrs=data["cidrs"])
+
+
+@dataclass
+class LegacyServer:
+    name: str
+    tags: list[dict[str, str]]
+    internal_ip: str
+    external_ip: str
+    firewall: list[LegacyPort]
+    state: str
+    cpu: int
+    memory_gb: float
+    region: str = ""
+
+    def pair_tags(self) -> str:
+        tags = [f"{tag['key']}: {tag.get('value', '')}" for tag in self.tags if "value" in tag]
+        return f" {', '.join(tags)}"
+
+    def single_tags(self) -> str:
+        tags = [f"{tag['key']}" for tag in self.tags if "value" not in tag]
+        return f" {', '.join(tags)}"
+
+    @classmethod
+    def from_json(cls, data: dict) -> "LegacyServer":
+        return cls(
+            name=data["name"],
+            tags=sorted(data["tags"], key=lambda x: x["key"]),
+            internal_ip=data["internalIp"],
+            external_ip=data["externalIp"],
+            firewall=[LegacyPort.from_json(port) for port in data["firewall"]],
+            state=data["state"],
+            cpu=data["cpu"],
+            memory_gb=data["memoryGb"],
+            region=data["region"],
+        )
+
+
+class ModelResult(NamedTuple):
+    size: int
+    model: str
+    build: float  # the median time (sec.) to build the inventory from its JSON
+    tags: float  # the median time (sec.) of the tag strings of the whole inventory, 10 times
+    retained_mb: float  # the memory held by the built inventory
+
+
+class ModelBenchmark:
+    REGION = "bench-1"
+    SIZES = (500, 5000, 50000)
+    TAG_PASSES = 10
+    MODELS: dict[str, Callable[[dict], object]] = {"legacy": LegacyServer.from_json, "slotted": Server.from_json}
+
+    def __init__(self, runs: int) -> None:
+        self.runs = runs
+
+    @classmethod
+    def payload(cls, size: int) -> str:
+        # the inventory as persisted in the cache
+        servers = LightSail(cls.REGION, client=FakeLightSail.fleet(size)).fetch_servers()
+        return json.dumps([server.to_json() for server in servers])
+
+    @classmethod
+    def build(cls, model: str, payload: str) -> list:
+        return [cls.MODELS[model](data) for data in json.loads(payload)]
+
+    def median(self, function: Callable[[], object]) -> float:
+        times: list[float] = []
+        for _ in range(self.runs):
+            start = monotonic()
+            function()
+            times.append(monotonic() - start)
+        return statistics.median(times)
+
+    def tag_strings(self, servers: list) -> None:
+        for _ in range(self.TAG_PASSES):
+            for server in servers:
+                server.pair_tags()
+                server.single_tags()
+
+    def retained(self, model: str, payload: str) -> float:
+        # the decoded JSON is released, only what the model keeps from it is counted
+        gc.collect()
+        tracemalloc.start()
+        servers = self.build(model, payload)
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del servers
+        return current / 1024 / 1024
+
+    def run(self, size: int, model: str) -> ModelResult:
+        payload = self.payload(size)
+        servers = self.build(model, payload)
+        return ModelResult(
+            size=size,
+            model=model,
+            build=self.median(lambda: self.build(model, payload)),
+            tags=self.median(lambda: self.tag_strings(servers)),
+            retained_mb=self.retained(model, payload),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="memory and construction time of the inventory model")
+    parser.add_argument("--sizes", help="the fleet sizes", type=int, nargs="+", default=list(ModelBenchmark.SIZES))
+    parser.add_argument("--runs", help="the number of runs per measure", type=int, default=5)
+    parser.add_argument("--output", choices=TableRenderer.OUTPUTS, default=TableRenderer.TABLE)
+    args = parser.parse_args()
+
+    tested = ModelBenchmark(args.runs)
+    results = [tested.run(size, model) for size in args.sizes for model in ModelBenchmark.MODELS]
+    columns = [
+        PrintColumn(label="servers", alignment=PrintColumn.right(), size=5, formatter=lambda x: x.size),
+        PrintColumn(label="model", alignment=PrintColumn.left(), size=7, formatter=lambda x: x.model),
+        PrintColumn(
+            label="build (ms)", alignment=PrintColumn.right(), size=6, formatter=lambda x: f"{x.build * 1000:.1f}"
+        ),
+        PrintColumn(
+            label="tags (ms)", alignment=PrintColumn.right(), size=6, formatter=lambda x: f"{x.tags * 1000:.1f}"
+        ),
+        PrintColumn(
+            label="retained (MB)", alignment=PrintColumn.right(), size=6, formatter=lambda x: f"{x.retained_mb:.2f}"
+        ),
+    ]
+    TableRenderer(columns, args.output).render(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from time import monotonic
+
+APP = Path(__file__).parent.parent / "app.py"
+
+
+class StartupBenchmark:
+    BUDGET = 0.15  # the time (sec.) above a bare interpreter allowed to `app.py --help`
+    HEAVY_MODULES = ("boto3", "botocore")
+
+    def __init__(self, runs: int) -> None:
+        self.runs = runs
+
+    def elapsed(self, arguments: list[str]) -> float:
+        # the median wall time of the command
+        times: list[float] = []
+        for _ in range(self.runs):
+            start = monotonic()
+            subprocess.run([sys.executable, *arguments], capture_output=True, check=False)
+            times.append(monotonic() - start)
+        return statistics.median(times)
+
+    @classmethod
+    def imports(cls, arguments: list[str]) -> list[tuple[str, int]]:
+        # the modules imported by the command, with their cumulative import time (us.)
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", *arguments], capture_output=True, text=True, check=False
+        )
+        result: list[tuple[str, int]] = []
+        for line in completed.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line:
+                _, cumulative, module = line.split("|")
+                if cumulative.strip().isdigit():
+                    result.append((module.strip(), int(cumulative)))
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="start up time of the command line")
+    parser.add_argument("--runs", help="the number of runs per measure", type=int, default=10)
+    args = parser.parse_args()
+
+    tested = StartupBenchmark(args.runs)
+    bare = tested.elapsed(["-c", "pass"])
+    results = {
+        "--help": tested.elapsed([str(APP), "--help"]),
+        "invalid subcommand": tested.elapsed([str(APP), "unknown"]),
+        "invalid tag": tested.elapsed([str(APP), "servers", "--tag", "env:prod AND"]),
+    }
+    print(f"bare interpreter: {bare * 1000:.1f} ms")
+    for label, elapsed in results.items():
+        print(f"{label}: {elapsed * 1000:.1f} ms (+{(elapsed - bare) * 1000:.1f} ms)")
+
+    imports = tested.imports([str(APP), "--help"])
+    print("slowest imports (cumulative):")
+    for module, cumulative in sorted(imports, key=lambda x: x[1], reverse=True)[:10]:
+        print(f"  {cumulative / 1000:7.1f} ms  {module}")
+
+    failures: list[str] = []
+    heavy = [module for module, _ in imports if module.split(".")[0] in StartupBenchmark.HEAVY_MODULES]
+    if heavy:
+        failures.append(f"--help imports {', '.join(heavy[:5])}")
+    if results["--help"] - bare > StartupBenchmark.BUDGET:
+        failures.append(f"--help exceeds the budget of {StartupBenchmark.BUDGET * 1000:.0f} ms")
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
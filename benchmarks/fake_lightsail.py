@@ -0,0 +1,165 @@
+import base64
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+from threading import Lock
+from time import sleep
+
+from botocore.exceptions import ClientError
+
+
+class FakeLightSail:
+    # in-process stand-in for the boto3 Lightsail client
+    PAGE_SIZE = 100
+    WRITE_OPERATIONS = ("put_alarm", "delete_alarm", "put_instance_public_ports")
+
+    def __init__(self, instances: list[dict], alarms: list[dict], latency: float = 0.0, throttle_every: int = 0):
+        self.instances = {instance["name"]: instance for instance in instances}
+        self.alarms = {alarm["name"]: alarm for alarm in alarms}
+        self.latency = latency  # per call (sec.)
+        self.throttle_every = throttle_every  # every n-th write is throttled, 0 = never
+        self.calls: Counter = Counter()
+        self.throttled = 0
+        self.lock = Lock()
+
+    @classmethod
+    def fleet(cls, size: int, latency: float = 0.0, throttle_every: int = 0) -> "FakeLightSail":
+        instances: list[dict] = []
+        alarms: list[dict] = []
+        for index in range(size):
+            name = f"server-{index:05d}"
+            tags = [
+                {"key": "env", "value": "prod" if index % 4 else "test"},
+                {"key": "role", "value": ("web", "api", "db")[index % 3]},
+            ]
+            if index % 10 == 0:
+                tags.append({"key": "maintenance"})
+            instances.append(
+                {
+                    "name": name,
+                    "tags": tags,
+                    "privateIpAddress": f"172.26.{index // 250}.{index % 250 + 1}",
+                    "publicIpAddress": f"54.{index // 62500}.{index // 250 % 250}.{index % 250 + 1}",
+                    "networking": {
+                        "ports": [{"fromPort": 22, "toPort": 22, "protocol": "tcp", "cidrs": ["1.2.3.4/32"]}],
+                    },
+                    "state": {"name": "running"},
+                    "hardware": {"cpuCount": 2, "ramSizeInGb": 4.0},
+                }
+            )
+            # every 10th server has an outdated threshold
+            alarms.append(cls.alarm(f"{name}_cpu", name, "CPUUtilization", 90 if index % 10 else 95))
+            alarms.append(cls.alarm(f"{name}_burst", name, "BurstCapacityPercentage", 20))
+        return cls(instances, alarms, latency, throttle_every)
+
+    @classmethod
+    def alarm(cls, name: str, server: str, metric: str, threshold: float) -> dict:
+        return {
+            "name": name,
+            "monitoredResourceInfo": {"name": server},
+            "metricName": metric,
+            "period": 300,
+            "statistic": "Average",
+            "threshold": threshold,
+            "unit": "Percent",
+            "state": "OK",
+            "datapointsToAlarm": 2,
+            "evaluationPeriods": 3,
+            "comparisonOperator": "GreaterThanOrEqualToThreshold",
+        }
+
+    def _call(self, operation: str):
+        with self.lock:
+            self.calls[operation] += 1
+            throttled = (
+                operation in self.WRITE_OPERATIONS
+                and self.throttle_every > 0
+                and self.calls[operation] % self.throttle_every == 0
+            )
+            if throttled:
+                self.throttled += 1
+        if self.latency > 0:
+            sleep(self.latency)
+        if throttled:
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, operation)
+
+    @classmethod
+    def _page(cls, items: list, page_token: str) -> tuple[list, dict]:
+        start = int(page_token or 0)
+        extra = {}
+        if start + cls.PAGE_SIZE < len(items):
+            extra = {"nextPageToken": str(start + cls.PAGE_SIZE)}
+        return items[start : start + cls.PAGE_SIZE], extra
+
+    def get_instances(self, pageToken: str = "") -> dict:
+        self._call("get_instances")
+        page, extra = self._page(list(self.instances.values()), pageToken)
+        return {"instances": page} | extra
+
+    def get_alarms(self, pageToken: str = "", monitoredResourceName: str = "") -> dict:
+        self._call("get_alarms")
+        alarms = list(self.alarms.values())
+        if monitoredResourceName:
+            if monitoredResourceName not in self.instances:
+                raise ClientError({"Error": {"Code": "NotFoundException", "Message": "not found"}}, "get_alarms")
+            alarms = [alarm for alarm in alarms if alarm["monitoredResourceInfo"]["name"] == monitoredResourceName]
+        page, extra = self._page(alarms, pageToken)
+        return {"alarms": page} | extra
+
+    def put_alarm(self, **kwargs):
+        self._call("put_alarm")
+        alarm = self.alarm(
+            kwargs["alarmName"], kwargs["monitoredResourceName"], kwargs["metricName"], kwargs["threshold"]
+        )
+        alarm |= {
+            "comparisonOperator": kwargs["comparisonOperator"],
+            "evaluationPeriods": kwargs["evaluationPeriods"],
+            "datapointsToAlarm": kwargs["datapointsToAlarm"],
+        }
+        with self.lock:
+            self.alarms[alarm["name"]] = alarm
+        return {"operations": []}
+
+    def delete_alarm(self, alarmName: str):
+        self._call("delete_alarm")
+        with self.lock:
+            self.alarms.pop(alarmName, None)
+        return {"operations": []}
+
+    def put_instance_public_ports(self, instanceName: str, portInfos: list[dict]):
+        self._call("put_instance_public_ports")
+        ports = [{key: value for key, value in port.items() if key != "cidrListAliases"} for port in portInfos]
+        self.instances[instanceName]["networking"]["ports"] = ports
+        return {"operation": {}}
+
+    def get_instance_metric_data(
+        self,
+        instanceName: str,
+        metricName: str,
+        period: int,
+        startTime: datetime,
+        endTime: datetime,
+        unit: str,
+        statistics: list[str],
+    ) -> dict:
+        # deterministic values per server and metric, about one server in ten runs hot
+        self._call("get_instance_metric_data")
+        if instanceName not in self.instances:
+            raise ClientError({"Error": {"Code": "NotFoundException", "Message": "not found"}}, "get_metric_data")
+        seed = zlib.crc32(f"{instanceName}|{metricName}".encode())
+        base = 85.0 if seed % 10 == 0 else 5.0 + seed % 40
+        first = -(-int(startTime.timestamp()) // period) * period
+        data: list[dict] = []
+        for timestamp in range(first, int(endTime.timestamp()), period):
+            value = min(100.0, base + (timestamp // period * 7 + seed) % 17)
+            if metricName == "BurstCapacityPercentage":
+                value = 100.0 - value
+            point = {"timestamp": datetime.fromtimestamp(timestamp, timezone.utc), "unit": unit}
+            for statistic in statistics:
+                point[statistic[0].lower() + statistic[1:]] = value
+            data.append(point)
+        return {"metricName": metricName, "metricData": data}
+
+    def download_default_key_pair(self):
+        self._call("download_default_key_pair")
+        return {"privateKeyBase64": base64.b64encode(b"fake key").decode()}
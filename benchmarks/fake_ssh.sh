@@ -0,0 +1,13 @@
+#!/bin/sh
+# stand-in for ssh: the last argument is the command, the one before the user@host
+# FAKE_SSH_LATENCY (sec.) simulates the connection and command time
+for last; do :; done
+host=""
+previous=""
+for argument; do
+  if [ "$argument" = "$last" ]; then host="$previous"; fi
+  previous="$argument"
+done
+sleep "${FAKE_SSH_LATENCY:-0}"
+echo "${host#*@}"
+echo "$last"
@@ -0,0 +1,31 @@
+from collections.abc import Sequence
+
+from aws.immutable.port import Port
+from aws.immutable.server import Server
+
+
+def make_server(
+    name: str = "theServer",
+    tags: list[dict[str, str]] | None = None,
+    region: str = "",
+    internal_ip: str = "",
+    external_ip: str = "",
+    firewall: Sequence[Port] = (),
+    state: str = "running",
+    cpu: int = 1,
+    memory_gb: float = 1.0,
+) -> Server:
+    # the tags as returned by the API: [{"key": "env", "value": "prod"}, {"key": "flag"}]
+    pairs, flags = Server.parse_tags(tags or [])
+    return Server(
+        name=name,
+        tags=pairs,
+        internal_ip=internal_ip,
+        external_ip=external_ip,
+        firewall=firewall,
+        state=state,
+        cpu=cpu,
+        memory_gb=memory_gb,
+        region=region,
+        flags=flags,
+    )
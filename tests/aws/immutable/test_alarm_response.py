@@ -1,4 +1,5 @@
 from aws.immutable.alarm_response import AlarmResponse
+from aws.mutable.alarm_definition import AlarmDefinition
 
 
 def test___init__():
@@ -30,3 +31,29 @@ def test___init__():
 
 def test___eq__():
     ...
+
+
+def test_definition():
+    tested = AlarmResponse(
+        name="theName",
+        server="theServer",
+        metric="theMetric",
+        state="theState",
+        period=5,
+        statistic="theStatistic",
+        threshold=57.63,
+        unit="theUnit",
+        datapoints_to_alarm=3,
+        evaluation_periods=67,
+        operator="theOperator",
+    )
+    expected = AlarmDefinition(
+        name="theName",
+        server="theServer",
+        metric="theMetric",
+        operator="theOperator",
+        threshold=57.63,
+        evaluation_periods=67,
+        datapoints_to_alarm=3,
+    )
+    assert expected == tested.definition()
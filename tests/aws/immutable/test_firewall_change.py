@@ -0,0 +1,11 @@
+from aws.immutable.firewall_change import FirewallChange
+from aws.immutable.port import Port
+
+
+def test_changed():
+    port1 = Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=["10.0.0.1/32"])
+    port2 = Port(FromPort=80, ToPort=80, Protocol="tcp", Cidrs=["0.0.0.0/0"])
+    tested = FirewallChange(server="theServer", region="theRegion", current=[port1, port2], desired=[port2, port1])
+    assert tested.changed() is False
+    tested = FirewallChange(server="theServer", region="theRegion", current=[port1], desired=[port2, port1])
+    assert tested.changed() is True
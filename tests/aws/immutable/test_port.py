@@ -0,0 +1,37 @@
+# import sys
+# app_root = "/..../lightsailmanagement/"
+# sys.path.append(app_root)
+from aws.immutable.port import Port
+
+
+def test_to_json():
+    tested = Port(FromPort=10080, ToPort=10081, Protocol="tcp", Cidrs=["10.0.0.1/32", "10.0.0.2/32"])
+    result = tested.to_json()
+    expected = {
+        'fromPort': 10080,
+        'toPort': 10081,
+        'protocol': 'tcp',
+        'cidrs': ['10.0.0.1/32', '10.0.0.2/32'],
+    }
+    assert expected == result, "nope"
+    print("OK")
+
+
+def test_hashed():
+    tested = Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=["10.0.0.2/32", "10.0.0.1/32"])
+    same = Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=["10.0.0.1/32", "10.0.0.2/32", "10.0.0.1/32"])
+    other = Port(FromPort=22, ToPort=22, Protocol="udp", Cidrs=["10.0.0.1/32", "10.0.0.2/32"])
+    assert tested.hashed() == same.hashed()
+    assert tested.hashed() != other.hashed()
+
+
+def test_hashed_rules():
+    port1 = Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=["10.0.0.1/32"])
+    port2 = Port(FromPort=80, ToPort=80, Protocol="tcp", Cidrs=["0.0.0.0/0"])
+    assert Port.hashed_rules([port1, port2]) == Port.hashed_rules([port2, port1, port2])
+    assert Port.hashed_rules([port1, port2]) != Port.hashed_rules([port1])
+    assert Port.hashed_rules([]) == Port.hashed_rules([])
+
+
+if __name__ == "__main__":
+    test_to_json()
@@ -0,0 +1,40 @@
+import json
+
+from aws.immutable.plan_entry import PlanEntry
+from aws.immutable.reconciliation_plan import ReconciliationPlan
+
+
+def test_to_json_from_json():
+    tested = ReconciliationPlan(
+        entries=[
+            PlanEntry("server1", "theRegion", "firewall", "liveHash", "desiredHash", "1 -> 2 rule(s)"),
+            PlanEntry("server2", "theRegion", "alarms", "liveHash", "desiredHash", "1 to set, 0 to delete"),
+        ],
+        unchanged=3,
+        skipped=4,
+    )
+    result = tested.to_json()
+    expected = {
+        "entries": [
+            {
+                "server": "server1",
+                "region": "theRegion",
+                "resource": "firewall",
+                "live": "liveHash",
+                "desired": "desiredHash",
+                "details": "1 -> 2 rule(s)",
+            },
+            {
+                "server": "server2",
+                "region": "theRegion",
+                "resource": "alarms",
+                "live": "liveHash",
+                "desired": "desiredHash",
+                "details": "1 to set, 0 to delete",
+            },
+        ],
+        "unchanged": 3,
+        "skipped": 4,
+    }
+    assert expected == result
+    assert tested == ReconciliationPlan.from_json(json.loads(json.dumps(result)))
@@ -0,0 +1,64 @@
+from dataclasses import FrozenInstanceError
+
+import pytest
+
+from aws.immutable.port import Port
+from aws.immutable.server import Server
+
+
+def test_to_json():
+    tested = Server(
+        name="theServer",
+        tags={"theKey": "theValue"},
+        internal_ip="10.0.0.1",
+        external_ip="1.2.3.4",
+        firewall=[Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=["1.2.3.4/32"])],
+        state="running",
+        cpu=2,
+        memory_gb=4.0,
+        region="theRegion",
+        flags=("theFlag",),
+    )
+    result = tested.to_json()
+    expected = {
+        "name": "theServer",
+        "tags": [{"key": "theKey", "value": "theValue"}, {"key": "theFlag"}],
+        "internalIp": "10.0.0.1",
+        "externalIp": "1.2.3.4",
+        "firewall": [{"fromPort": 22, "toPort": 22, "protocol": "tcp", "cidrs": ["1.2.3.4/32"]}],
+        "state": "running",
+        "cpu": 2,
+        "memoryGb": 4.0,
+        "region": "theRegion",
+    }
+    assert expected == result
+    assert tested == Server.from_json(result)
+
+
+def test_parse_tags():
+    tags, flags = Server.parse_tags(
+        [{"key": "role", "value": "web"}, {"key": "maintenance"}, {"key": "env", "value": "prod"}]
+    )
+    assert {"env": "prod", "role": "web"} == tags
+    assert ["env", "role"] == list(tags)
+    assert ("maintenance",) == flags
+
+
+def test_pair_tags():
+    tested = Server(
+        name="theServer",
+        tags={"env": "prod", "role": "web"},
+        internal_ip="",
+        external_ip="",
+        firewall=(),
+        state="running",
+        cpu=1,
+        memory_gb=1.0,
+        flags=("flag1", "flag2"),
+    )
+    assert " env: prod, role: web" == tested.pair_tags()
+    assert " flag1, flag2" == tested.single_tags()
+    # the strings are built once
+    assert tested.pair_tags() is tested.pair_tags()
+    with pytest.raises(FrozenInstanceError):
+        tested.state = "stopped"  # type: ignore[misc]
@@ -0,0 +1,26 @@
+from aws.mutable.alarm_definition import AlarmDefinition
+
+
+def _alarm(name: str, threshold: float) -> AlarmDefinition:
+    return AlarmDefinition(
+        name=name,
+        server="theServer",
+        metric="CPUUtilization",
+        operator="GreaterThanOrEqualToThreshold",
+        threshold=threshold,
+        evaluation_periods=3,
+        datapoints_to_alarm=2,
+    )
+
+
+def test_hashed():
+    assert _alarm("cpu", 80).hashed() == _alarm("cpu", 80).hashed()
+    assert _alarm("cpu", 80).hashed() != _alarm("cpu", 90).hashed()
+
+
+def test_hashed_alarms():
+    # the order and the duplicates do not matter
+    result = AlarmDefinition.hashed_alarms([_alarm("cpu", 80), _alarm("burst", 20)])
+    assert result == AlarmDefinition.hashed_alarms([_alarm("burst", 20), _alarm("cpu", 80), _alarm("cpu", 80)])
+    assert result != AlarmDefinition.hashed_alarms([_alarm("cpu", 80)])
+    assert AlarmDefinition.hashed_alarms([]) == AlarmDefinition.hashed_alarms([])
@@ -0,0 +1,80 @@
+from unittest.mock import patch, call, Mock
+
+from botocore.exceptions import ClientError
+
+from aws.alarm_watcher import AlarmWatcher
+from aws.immutable.alarm_response import AlarmResponse
+from aws.immutable.alarm_transition import AlarmTransition
+
+
+def _alarm(server: str, state: str) -> AlarmResponse:
+    return AlarmResponse(
+        name=f"{server}_cpu",
+        server=server,
+        metric="CPUUtilization",
+        state=state,
+        period=300,
+        statistic="Average",
+        threshold=80,
+        unit="Percent",
+        datapoints_to_alarm=2,
+        evaluation_periods=3,
+        operator="GreaterThanOrEqualToThreshold",
+        region="theRegion",
+    )
+
+
+def _transition(server: str, change: str, previous: str, state: str) -> AlarmTransition:
+    return AlarmTransition("theTime", "theRegion", server, f"{server}_cpu", "CPUUtilization", change, previous, state)
+
+
+def test_transitions():
+    tested = AlarmWatcher(Mock(), [], 10, 60)
+    # the first poll only reports the alarms not OK
+    result = tested.transitions([_alarm("server1", "OK"), _alarm("server2", "ALARM")], "theTime")
+    assert [_transition("server2", "initial", "", "ALARM")] == result
+    assert 10 == tested.interval()
+    result = tested.transitions([_alarm("server1", "OK"), _alarm("server2", "ALARM")], "theTime")
+    assert [] == result
+    result = tested.transitions([_alarm("server1", "ALARM"), _alarm("server3", "OK")], "theTime")
+    expected = [
+        _transition("server1", "changed", "OK", "ALARM"),
+        _transition("server2", "removed", "ALARM", ""),
+        _transition("server3", "added", "", "OK"),
+    ]
+    assert expected == result
+    result = tested.transitions([_alarm("server1", "OK"), _alarm("server3", "OK")], "theTime")
+    assert [_transition("server1", "changed", "ALARM", "OK")] == result
+    assert 60 == tested.interval()
+
+
+@patch("aws.alarm_watcher.run")
+def test_watch(run):
+    light_sail = Mock()
+    light_sail.list_alarms.side_effect = [
+        [_alarm("server1", "OK")],
+        ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "GetAlarms"),
+        [_alarm("server1", "ALARM")],
+        [_alarm("server1", "ALARM")],
+    ]
+    run.return_value.returncode = 0
+
+    server = Mock()
+    tested = AlarmWatcher(light_sail, [server], 10, 60, "theHook")
+    waits: list[int] = []
+    tested.stop = Mock()
+    tested.stop.is_set.side_effect = lambda: len(waits) >= 4
+    tested.stop.wait.side_effect = waits.append
+    result = list(tested.watch())
+    assert [("server1", "changed", "OK", "ALARM")] == [(x.server, x.change, x.previous, x.state) for x in result]
+    # slow while OK, fast after the failed poll and while in ALARM
+    assert [60, 10, 10, 10] == waits
+    assert [call([server])] * 4 == light_sail.list_alarms.mock_calls
+    assert 1 == len(run.mock_calls)
+    assert "theHook" == run.mock_calls[0].args[0]
+    environment = run.mock_calls[0].kwargs["env"]
+    assert ("server1", "OK", "ALARM") == (
+        environment["ALARM_SERVER"],
+        environment["ALARM_PREVIOUS"],
+        environment["ALARM_STATE"],
+    )
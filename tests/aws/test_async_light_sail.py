@@ -0,0 +1,127 @@
+import asyncio
+from unittest.mock import patch, call, Mock
+
+from aws.async_light_sail import AsyncLightSail
+from aws.immutable.alarm_apply_summary import AlarmApplySummary
+from aws.immutable.port import Port
+from aws.immutable.server import Server
+from aws.immutable.ssh_command_response import SshCommandResponse
+from aws.mutable.alarm_definition import AlarmDefinition
+from aws.ssh_executor import SshExecutor
+from tests.aws.factories import make_server
+
+
+def _server(name: str, region: str) -> Server:
+    return make_server(name, region=region, external_ip=f"{name}.ip")
+
+
+def _alarm(server: str) -> AlarmDefinition:
+    return AlarmDefinition(
+        name=f"{server}_alarm",
+        server=server,
+        metric="CPUUtilization",
+        operator="GreaterThanOrEqualToThreshold",
+        threshold=80,
+        evaluation_periods=3,
+        datapoints_to_alarm=2,
+    )
+
+
+def _light_sail() -> Mock:
+    light_sail = Mock(light_sails={"region1": Mock(region="region1"), "region2": Mock(region="region2")})
+    for light_sail_region in light_sail.light_sails.values():
+        light_sail_region.rate_limiter.call.side_effect = lambda function, **kwargs: function(**kwargs)
+        light_sail_region.rate_limiter.retries = 0
+    return light_sail
+
+
+def test_list_servers():
+    light_sail = _light_sail()
+    light_sail.light_sails["region1"].list_servers.return_value = [_server("server1", "region1")]
+    light_sail.light_sails["region2"].list_servers.return_value = [_server("server2", "region2")]
+
+    tested = AsyncLightSail(light_sail, 5)
+    result = asyncio.run(tested.list_servers("theTag"))
+    assert [_server("server1", "region1"), _server("server2", "region2")] == result
+    for light_sail_region in light_sail.light_sails.values():
+        assert [call.list_servers("theTag")] == light_sail_region.mock_calls
+
+
+def test_list_alarms():
+    light_sail = _light_sail()
+    light_sail.light_sails["region1"].list_alarms.return_value = ["alarm1"]
+
+    tested = AsyncLightSail(light_sail, 5)
+    result = asyncio.run(tested.list_alarms([_server("server1", "region1"), _server("server3", "region1")]))
+    assert ["alarm1"] == result
+    assert [call.list_alarms(["server1", "server3"])] == light_sail.light_sails["region1"].mock_calls
+    assert [] == light_sail.light_sails["region2"].mock_calls
+
+
+@patch("aws.async_light_sail.monotonic")
+def test_set_alarms(monotonic):
+    monotonic.side_effect = [10.0, 12.5]
+    light_sail = _light_sail()
+    region1 = light_sail.light_sails["region1"]
+    region1.alarm_changes.return_value = ([{"alarmName": "server1_alarm"}], ["server1_old"])
+
+    tested = AsyncLightSail(light_sail, 5)
+    result = asyncio.run(tested.set_alarms([_server("server1", "region1")], [_alarm("server1"), _alarm("server2")]))
+    assert AlarmApplySummary(puts=1, deletes=1, retries=0, elapsed=2.5) == result
+    assert call.alarm_changes(["server1"], [_alarm("server1")]) == region1.mock_calls[0]
+    assert [call(alarmName="server1_alarm")] == region1.client.put_alarm.mock_calls
+    assert [call(alarmName="server1_old")] == region1.client.delete_alarm.mock_calls
+    assert [] == light_sail.light_sails["region2"].mock_calls
+
+
+def test_set_rules():
+    light_sail = _light_sail()
+    rules = [Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=["1.2.3.4/32"])]
+
+    tested = AsyncLightSail(light_sail, 5)
+    asyncio.run(tested.set_rules(_server("server1", "region1"), rules))
+    assert [call.set_rules(_server("server1", "region1"), rules)] == light_sail.mock_calls
+
+
+def test_run_command(tmp_path):
+    executor = SshExecutor(
+        ssh_keys={"region1": "theKey"},
+        parallel=1,
+        connect_timeout=7,
+        command_timeout=0,
+        max_lines=2,
+        log_directory=tmp_path,
+    )
+    executor.ssh_arguments = lambda ssh_key, public_ip, command: [  # type: ignore[method-assign]
+        "sh",
+        "-c",
+        f"echo {public_ip}; {command}",
+    ]
+
+    tested = AsyncLightSail(_light_sail(), 2, executor)
+    servers = [_server(f"server{i}", "region1") for i in range(3)]
+    result = asyncio.run(tested.run_command(servers, "echo line1; printf 'line2\\nline3'; exit 3"))
+    expected = [
+        SshCommandResponse(
+            server=f"server{i} (server{i}.ip)", response=["line2", "line3"], elapsed=0.0, exit_code=3, dropped=2
+        )
+        for i in range(3)
+    ]
+    assert expected == [response._replace(elapsed=0.0) for response in result]
+    assert b"server0.ip\nline1\nline2\nline3" == (tmp_path / "server0.log").read_bytes()
+
+
+def test_run_command__timeout():
+    executor = SshExecutor(ssh_keys={}, parallel=1, connect_timeout=7, command_timeout=1)
+    executor.ssh_arguments = lambda ssh_key, public_ip, command: ["sh", "-c", command]  # type: ignore[method-assign]
+    light_sail = _light_sail()
+    light_sail.get_ssh_keys.return_value = {"region1": "theKey"}
+
+    tested = AsyncLightSail(light_sail, 2, executor)
+    result = asyncio.run(tested.run_command([_server("server1", "region1")], "echo partial; exec sleep 5"))
+    # the key is only resolved for the region of the server
+    assert [call.get_ssh_keys([_server("server1", "region1")])] == light_sail.mock_calls
+    assert {"region1": "theKey"} == executor.ssh_keys
+    assert ["partial", "*** timed out after 1s"] == result[0].response
+    assert SshExecutor.EXIT_TIMEOUT == result[0].exit_code
+    assert result[0].elapsed < 4
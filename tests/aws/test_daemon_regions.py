@@ -0,0 +1,23 @@
+from unittest.mock import patch, call
+
+from aws.daemon_regions import DaemonRegions
+from aws.immutable.alarm_scan import AlarmScan
+
+
+@patch("aws.light_sail_regions.LightSailRegions.list_alarms")
+@patch("aws.light_sail_regions.LightSailRegions.list_servers")
+def test_daemon_regions__not_running(list_servers, list_alarms, tmp_path):
+    list_servers.return_value = []
+    list_alarms.return_value = []
+
+    tested = DaemonRegions(["region1"], socket_path=tmp_path / "daemon.sock")
+    assert [] == tested.list_servers("theTag")
+    assert [] == tested.list_alarms([])
+    assert [call("theTag")] == list_servers.mock_calls
+    assert [call([])] == list_alarms.mock_calls
+    assert AlarmScan(strategy="", pages=0) == tested.alarm_scans()["region1"]
+    assert tested.invalidate() is False
+    # the socket is left over
+    (tmp_path / "daemon.sock").write_text("")
+    assert [] == tested.list_servers("theTag")
+    assert 2 == len(list_servers.mock_calls)
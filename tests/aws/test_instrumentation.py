@@ -0,0 +1,77 @@
+from unittest.mock import patch, Mock
+
+import pytest
+from botocore.exceptions import ClientError
+
+from aws.immutable.operation_profile import OperationProfile
+from aws.instrumentation import Instrumentation, InstrumentedClient
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+    assert 50.0 == Instrumentation.percentile(values, 50)
+    assert 95.0 == Instrumentation.percentile(values, 95)
+    assert 100.0 == Instrumentation.percentile(values, 100)
+    assert 1.0 == Instrumentation.percentile([1.0], 99)
+    assert 0.0 == Instrumentation.percentile([], 50)
+
+
+def test_profiles():
+    tested = Instrumentation()
+    tested.record("get_alarms", 0.5, size=100)
+    tested.record("get_alarms", 0.25, retries=2, size=50)
+    tested.record("put_alarm", 1.5, error=True)
+    result = tested.profiles()
+    expected = [
+        OperationProfile(
+            operation="put_alarm",
+            calls=1,
+            errors=1,
+            retries=0,
+            total=1.5,
+            p50=1.5,
+            p95=1.5,
+            p99=1.5,
+            max=1.5,
+            size=0,
+        ),
+        OperationProfile(
+            operation="get_alarms",
+            calls=2,
+            errors=0,
+            retries=2,
+            total=0.75,
+            p50=0.25,
+            p95=0.5,
+            p99=0.5,
+            max=0.5,
+            size=150,
+        ),
+    ]
+    assert expected == result
+    assert [profile._asdict() for profile in expected] == tested.to_json()
+
+
+@patch("aws.instrumentation.monotonic")
+def test_instrumented_client(monotonic):
+    monotonic.side_effect = [1.0, 1.5, 2.0, 2.25]
+    client = Mock(region="theRegion")
+    client.get_alarms.return_value = {
+        "alarms": [],
+        "ResponseMetadata": {"RetryAttempts": 1, "HTTPHeaders": {"content-length": "123"}},
+    }
+    client.put_alarm.side_effect = [
+        ClientError({"Error": {"Code": "ThrottlingException", "Message": "theMessage"}}, "PutAlarm")
+    ]
+    instrumentation = Instrumentation()
+
+    tested = InstrumentedClient(client, instrumentation)
+    assert "theRegion" == tested.region
+    assert client.get_alarms.return_value == tested.get_alarms(pageToken="theToken")
+    client.get_alarms.assert_called_once_with(pageToken="theToken")
+    with pytest.raises(ClientError):
+        tested.put_alarm(alarmName="theAlarm")
+    assert {"get_alarms": [0.5], "put_alarm": [0.25]} == instrumentation.elapsed
+    assert {"get_alarms": 1, "put_alarm": 1} == instrumentation.retries
+    assert {"get_alarms": 0, "put_alarm": 1} == instrumentation.errors
+    assert {"get_alarms": 123, "put_alarm": 0} == instrumentation.sizes
@@ -0,0 +1,56 @@
+import json
+from unittest.mock import patch
+
+from aws.immutable.port import Port
+from aws.immutable.server import Server
+from aws.inventory_cache import InventoryCache
+from tests.aws.factories import make_server
+
+
+def _server(name: str) -> Server:
+    return make_server(
+        name,
+        [{"key": "theKey", "value": "theValue"}, {"key": "theFlag"}],
+        region="theRegion",
+        internal_ip="10.0.0.1",
+        external_ip="1.2.3.4",
+        firewall=[Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=["1.2.3.4/32"])],
+        cpu=2,
+        memory_gb=4.0,
+    )
+
+
+def test_cache_file():
+    tested = InventoryCache("theRegion", 60)
+    result = tested.cache_file()
+    assert "inventory_theRegion.json" == result.name
+    assert "secrets" == result.parent.name
+
+
+@patch("aws.inventory_cache.time")
+@patch("aws.inventory_cache.InventoryCache.cache_file")
+def test_save_load(cache_file, time, tmp_path):
+    cache_file.return_value = tmp_path / "inventory.json"
+    time.side_effect = [1000.0, 1030.0, 1061.0]
+
+    tested = InventoryCache("theRegion", 60)
+    assert tested.load() is None
+    tested.save([_server("server1"), _server("server2")])
+    assert [_server("server1"), _server("server2")] == tested.load()
+    # expired
+    assert tested.load() is None
+    # invalidated
+    tested.invalidate()
+    assert (tmp_path / "inventory.json").exists() is False
+    tested.invalidate()
+
+
+@patch("aws.inventory_cache.InventoryCache.cache_file")
+def test_save_load__no_ttl(cache_file, tmp_path):
+    cache_file.return_value = tmp_path / "inventory.json"
+    cache_file.return_value.write_text(json.dumps({"timestamp": 0, "servers": []}))
+
+    tested = InventoryCache("theRegion", 0)
+    assert tested.load() is None
+    tested.save([_server("server1")])
+    assert {"timestamp": 0, "servers": []} == json.loads(cache_file.return_value.read_text())
@@ -0,0 +1,136 @@
+from threading import Thread
+from unittest.mock import patch, call, Mock
+
+from aws.daemon_regions import DaemonRegions
+from aws.immutable.alarm_response import AlarmResponse
+from aws.immutable.alarm_scan import AlarmScan
+from aws.immutable.server import Server
+from aws.inventory_daemon import InventoryDaemon
+from tests.aws.factories import make_server
+
+
+def _alarm(server: str, region: str) -> AlarmResponse:
+    return AlarmResponse(
+        name=f"{server}_cpu",
+        server=server,
+        metric="CPUUtilization",
+        state="OK",
+        period=300,
+        statistic="Average",
+        threshold=80,
+        unit="Percent",
+        datapoints_to_alarm=2,
+        evaluation_periods=3,
+        operator="GreaterThanOrEqualToThreshold",
+        region=region,
+    )
+
+
+def _light_sail(servers: dict[str, list[Server]]) -> Mock:
+    light_sail = Mock(light_sails={region: Mock(region=region) for region in servers})
+    for region, light_sail_region in light_sail.light_sails.items():
+        light_sail_region.fetch_servers.return_value = servers[region]
+        light_sail_region.list_alarms.return_value = [_alarm(server.name, region) for server in servers[region]]
+    return light_sail
+
+
+@patch("aws.inventory_daemon.time")
+def test_answer(time):
+    time.return_value = 1000.0
+    servers = {
+        "region1": [make_server("server1", [{"key": "env", "value": "prod"}], region="region1")],
+        "region2": [make_server("server2", [{"key": "env", "value": "test"}], region="region2")],
+    }
+    light_sail = _light_sail(servers)
+
+    tested = InventoryDaemon(light_sail, 30)
+    assert {"error": "region(s) not served: region1"} == tested.answer({"query": "servers", "regions": ["region1"]})
+    tested.refresh()
+    for region, servers_region in servers.items():
+        calls = [call.fetch_servers(), call.cache.save(servers_region), call.list_alarms([servers_region[0].name])]
+        assert calls == light_sail.light_sails[region].mock_calls
+
+    assert {"regions": {"region1": 1000.0, "region2": 1000.0}} == tested.answer({"query": "status"})
+    result = tested.answer({"query": "servers", "regions": ["region1", "region2"], "tag": "NOT env:test"})
+    assert {"servers": [servers["region1"][0].to_json()]} == result
+    result = tested.answer({"query": "servers", "regions": ["region2"], "tag": ""})
+    assert {"servers": [servers["region2"][0].to_json()]} == result
+    result = tested.answer({"query": "servers", "regions": ["region3"], "tag": ""})
+    assert {"error": "region(s) not served: region3"} == result
+    result = tested.answer({"query": "servers", "regions": ["region1"], "tag": "env:prod AND"})
+    assert "error" in result
+    result = tested.answer({"query": "alarms", "servers": [["region2", "server2"]]})
+    assert {"alarms": [_alarm("server2", "region2")._asdict()]} == result
+    assert {"error": "unknown query 'other'"} == tested.answer({"query": "other"})
+
+
+@patch("aws.inventory_daemon.Thread")
+@patch("aws.inventory_daemon.time")
+def test_answer__invalidate(time, thread):
+    servers = {
+        "region1": [make_server("server1", [], region="region1")],
+        "region2": [make_server("server2", [], region="region2")],
+    }
+    light_sail = _light_sail(servers)
+    time.return_value = 1000.0
+
+    tested = InventoryDaemon(light_sail, 30)
+    tested.refresh()
+    # the regions changed are answered by the API until reloaded
+    time.return_value = 1010.0
+    result = tested.answer({"query": "invalidate", "regions": ["region1", "region3"]})
+    assert {"invalidated": ["region1"]} == result
+    assert [call(target=tested.refresh, args=(["region1"],), daemon=True), call().start()] == thread.mock_calls
+    result = tested.answer({"query": "servers", "regions": ["region1"], "tag": ""})
+    assert {"error": "region(s) not served: region1"} == result
+    # a refresh started before the change is not kept
+    time.side_effect = [1005.0, 1020.0, 1020.0]
+    tested.refresh()
+    assert {"regions": {"region2": 1020.0}} == tested.answer({"query": "status"})
+    time.side_effect = [1030.0, 1040.0]
+    tested.refresh(["region1"])
+    assert {"regions": {"region1": 1040.0, "region2": 1020.0}} == tested.answer({"query": "status"})
+
+
+def test_refresh__failed(capsys):
+    light_sail = _light_sail({"region1": [make_server("server1", [], region="region1")]})
+
+    tested = InventoryDaemon(light_sail, 30)
+    tested.refresh()
+    light_sail.light_sails["region1"].fetch_servers.side_effect = [RuntimeError("theError")]
+    tested.refresh()
+    # the previous snapshot is kept
+    assert ["server1"] == [server.name for server in tested.snapshots["region1"].servers]
+    assert "Refresh of region1 failed: theError" in capsys.readouterr().err
+
+
+def test_serve(tmp_path):
+    servers = {"region1": [make_server("server1", [{"key": "env", "value": "prod"}], region="region1")]}
+    socket_path = tmp_path / "daemon.sock"
+
+    tested = InventoryDaemon(_light_sail(servers), 30, socket_path)
+    thread = Thread(target=tested.serve)
+    thread.start()
+    try:
+        for _ in range(100):
+            if tested.server is not None:
+                break
+            thread.join(0.01)
+        client = DaemonRegions(["region1"], socket_path=socket_path)
+        with patch("aws.light_sail_regions.LightSailRegions.list_servers") as list_servers:
+            assert servers["region1"] == client.list_servers("env:prod")
+            assert [] == list_servers.mock_calls
+        assert [_alarm("server1", "region1")] == client.list_alarms(servers["region1"])
+        assert AlarmScan(strategy="from the daemon", pages=0) == client.alarm_scans()["region1"]
+        # region not served, the API is called
+        client = DaemonRegions(["region1", "region2"], socket_path=socket_path)
+        with patch("aws.light_sail_regions.LightSailRegions.list_servers") as list_servers:
+            list_servers.return_value = []
+            assert [] == client.list_servers("env:prod")
+            assert [call("env:prod")] == list_servers.mock_calls
+        # after a change
+        assert client.invalidate() is True
+    finally:
+        tested.stop()
+        thread.join()
+    assert socket_path.exists() is False
@@ -0,0 +1,137 @@
+from unittest.mock import patch, call, Mock
+
+from aws.immutable.alarm_apply_summary import AlarmApplySummary
+from aws.immutable.firewall_change import FirewallChange
+from aws.immutable.metric_series import MetricSeries
+from aws.immutable.port import Port
+from aws.light_sail_regions import LightSailRegions
+from aws.mutable.alarm_definition import AlarmDefinition
+from tests.aws.factories import make_server
+
+
+def _alarm(server: str) -> AlarmDefinition:
+    return AlarmDefinition(
+        name=f"{server}_alarm",
+        server=server,
+        metric="CPUUtilization",
+        operator="GreaterThanOrEqualToThreshold",
+        threshold=80,
+        evaluation_periods=3,
+        datapoints_to_alarm=2,
+    )
+
+
+@patch("boto3.Session")
+def test_regions(session):
+    session.return_value.get_available_regions.return_value = ["region1", "region2", "region3"]
+
+    assert ["region1", "region2"] == LightSailRegions.regions("region1, region2,region1,")
+    assert [] == session.mock_calls
+    assert ["region1", "region2", "region3"] == LightSailRegions.regions("region2,all")
+    calls = [call(), call().get_available_regions("lightsail")]
+    assert calls == session.mock_calls
+
+
+@patch("aws.light_sail_regions.LightSail")
+def test_list_servers(light_sail):
+    regions = {"region1": Mock(region="region1"), "region2": Mock(region="region2")}
+    light_sail.side_effect = lambda region, cache_ttl, refresh, client, instrumentation, snapshots: regions[region]
+    regions["region1"].list_servers.return_value = [make_server("server1", region="region1")]
+    regions["region2"].list_servers.return_value = [
+        make_server("server2", region="region2"),
+        make_server("server3", region="region2"),
+    ]
+
+    tested = LightSailRegions(["region1", "region2"])
+    result = tested.list_servers("theKey:theValue")
+    expected = [
+        make_server("server1", region="region1"),
+        make_server("server2", region="region2"),
+        make_server("server3", region="region2"),
+    ]
+    assert expected == result
+    for mock in regions.values():
+        assert [call.list_servers("theKey:theValue")] == mock.mock_calls
+
+
+@patch("aws.light_sail_regions.LightSail")
+def test_list_metrics(light_sail):
+    regions = {"region1": Mock(region="region1"), "region2": Mock(region="region2")}
+    light_sail.side_effect = lambda region, cache_ttl, refresh, client, instrumentation, snapshots: regions[region]
+    series = [MetricSeries(f"server{index}", "", "CPUUtilization", 300, [], []) for index in range(3)]
+    regions["region1"].list_metrics.return_value = series[:1]
+    regions["region2"].list_metrics.return_value = series[1:]
+
+    tested = LightSailRegions(["region1", "region2"])
+    servers = [
+        make_server("server1", region="region1"),
+        make_server("server2", region="region2"),
+        make_server("server3", region="region2"),
+    ]
+    result = tested.list_metrics(servers, ["CPUUtilization"], 3600, 300, 7)
+    assert series == result
+    assert [call.list_metrics(["server1"], ["CPUUtilization"], 3600, 300, 7)] == regions["region1"].mock_calls
+    calls = [call.list_metrics(["server2", "server3"], ["CPUUtilization"], 3600, 300, 7)]
+    assert calls == regions["region2"].mock_calls
+
+
+@patch("aws.light_sail_regions.LightSail")
+def test_set_alarms(light_sail):
+    regions = {"region1": Mock(region="region1"), "region2": Mock(region="region2")}
+    light_sail.side_effect = lambda region, cache_ttl, refresh, client, instrumentation, snapshots: regions[region]
+
+    regions["region1"].set_alarms.return_value = AlarmApplySummary(puts=1, deletes=2, retries=3, elapsed=4.5)
+    regions["region2"].set_alarms.return_value = AlarmApplySummary(puts=5, deletes=6, retries=7, elapsed=2.5)
+
+    tested = LightSailRegions(["region1", "region2"])
+    servers = [make_server("server1", region="region1"), make_server("server2", region="region2")]
+    result = tested.set_alarms(servers, [_alarm("server1"), _alarm("server2"), _alarm("server2")], 7)
+    assert AlarmApplySummary(puts=6, deletes=8, retries=10, elapsed=4.5) == result
+    assert [call.set_alarms(["server1"], [_alarm("server1")], 7)] == regions["region1"].mock_calls
+    calls = [call.set_alarms(["server2"], [_alarm("server2"), _alarm("server2")], 7)]
+    assert calls == regions["region2"].mock_calls
+
+
+@patch("aws.light_sail_regions.LightSail")
+def test_set_rules(light_sail):
+    regions = {"region1": Mock(region="region1"), "region2": Mock(region="region2")}
+    light_sail.side_effect = lambda region, cache_ttl, refresh, client, instrumentation, snapshots: regions[region]
+
+    tested = LightSailRegions(["region1", "region2"])
+    rules = [Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=["1.2.3.4/32"])]
+    tested.set_rules(make_server("server2", region="region2"), rules)
+    assert [] == regions["region1"].mock_calls
+    assert [call.set_rules("server2", rules)] == regions["region2"].mock_calls
+
+
+@patch("aws.light_sail_regions.LightSail")
+def test_apply_rules(light_sail):
+    regions = {"region1": Mock(region="region1"), "region2": Mock(region="region2")}
+    light_sail.side_effect = lambda region, cache_ttl, refresh, client, instrumentation, snapshots: regions[region]
+
+    tested = LightSailRegions(["region1", "region2"])
+    rules = [Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=["1.2.3.4/32"])]
+    changes = [
+        FirewallChange(server="server1", region="region1", current=[], desired=rules),
+        FirewallChange(server="server2", region="region2", current=[], desired=rules),
+        FirewallChange(server="server3", region="region2", current=[], desired=[]),
+    ]
+    tested.apply_rules(changes, 2)
+    assert [call.set_rules("server1", rules)] == regions["region1"].mock_calls
+    calls = [call.set_rules("server2", rules), call.set_rules("server3", [])]
+    assert sorted(calls) == sorted(regions["region2"].mock_calls)
+
+
+@patch("aws.light_sail_regions.LightSail")
+def test_get_ssh_keys(light_sail):
+    regions = {"region1": Mock(region="region1"), "region2": Mock(region="region2")}
+    light_sail.side_effect = lambda region, cache_ttl, refresh, client, instrumentation, snapshots: regions[region]
+    regions["region2"].get_ssh_key.return_value = "theKeyFile"
+
+    tested = LightSailRegions(["region1", "region2"])
+    servers = [make_server("server2", region="region2"), make_server("server3", region="region2")]
+    assert {"region2": "theKeyFile"} == tested.get_ssh_keys(servers)
+    # no key pair is downloaded for the regions without selected server
+    assert [] == regions["region1"].mock_calls
+    assert [call.get_ssh_key()] == regions["region2"].mock_calls
+    assert {} == tested.get_ssh_keys([])
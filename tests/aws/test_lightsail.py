@@ -1,12 +1,17 @@
-from multiprocessing import Queue
-from time import sleep
+from datetime import datetime, timezone
 from unittest.mock import patch, call, Mock
 
-from aws.immutable.ssh_command_response import SshCommandResponse
+from botocore.exceptions import ClientError
+
+from aws.immutable.alarm_scan import AlarmScan
+from aws.immutable.port import Port
+from aws.immutable.server import Server
 from aws.lightsail import LightSail
+from aws.mutable.alarm_definition import AlarmDefinition
+from aws.rule_compactor import RuleCompactor
 
 
-@patch("aws.lightsail.Session")
+@patch("boto3.Session")
 @patch("aws.lightsail.getenv")
 def test___init__(getenv, session):
     mock = Mock()
@@ -14,6 +19,10 @@ def test___init__(getenv, session):
     getenv.side_effect = ['firstCall', 'secondCall']
 
     tested = LightSail("theRegion")
+    # the client is created on first use
+    assert [] == session.mock_calls
+    assert [] == getenv.mock_calls
+    assert mock == tested.client
     assert mock == tested.client
     calls = [
         call(aws_access_key_id='firstCall', aws_secret_access_key='secondCall', region_name='theRegion'),
@@ -27,27 +36,373 @@ def test___init__(getenv, session):
     assert calls == getenv.mock_calls
 
 
-@patch("aws.lightsail.check_output")
-@patch("aws.lightsail.LightSail.get_ssh_key")
-def test_run_command(get_ssh_key, check_output):
-    get_ssh_key.return_value = "theKeyFile"
-    check_output.return_value = b"line1\nline2\nline3"
+def _instance(name: str, tags: list[dict]) -> dict:
+    return {
+        "name": name,
+        "tags": tags,
+        "privateIpAddress": "10.0.0.1",
+        "publicIpAddress": "1.2.3.4",
+        "networking": {"ports": [{"fromPort": 22, "toPort": 22, "protocol": "tcp", "cidrs": ["1.2.3.4/32"]}]},
+        "state": {"name": "running"},
+        "hardware": {"cpuCount": 2, "ramSizeInGb": 4.0},
+    }
 
-    tested = LightSail("region")
-    #
-    calls: list = []
-    assert calls == get_ssh_key.mock_calls
-    assert calls == check_output.mock_calls
+
+@patch("aws.lightsail.InventoryCache")
+@patch("boto3.Session")
+def test_list_servers(session, inventory_cache):
+    client = session.return_value.client.return_value
+    client.get_instances.side_effect = [
+        {"instances": [_instance("server1", [{"key": "env", "value": "prod"}])], "nextPageToken": "token"},
+        {"instances": [_instance("server2", [{"key": "env", "value": "test"}, {"key": "flag"}])]},
+    ]
+    inventory_cache.return_value.load.return_value = None
+
+    tested = LightSail("theRegion", 60)
+    result = tested.list_servers("env:prod")
+    assert ["server1"] == [server.name for server in result]
+    result = tested.list_servers("flag OR env:none")
+    assert ["server2"] == [server.name for server in result]
+    result = tested.list_servers("")
+    assert ["server1", "server2"] == [server.name for server in result]
+    assert {"env": "test"} == result[1].tags
+    assert ("flag",) == result[1].flags
+    assert "theRegion" == result[1].region
+    # the inventory is fetched once
+    calls = [call.get_instances(), call.get_instances(pageToken="token")]
+    assert calls == client.mock_calls
+    calls = [call("theRegion", 60), call().load(), call().save(result)]
+    assert calls == inventory_cache.mock_calls
+
+
+@patch("aws.lightsail.InventoryCache")
+@patch("boto3.Session")
+def test_list_servers__cached(session, inventory_cache):
+    client = session.return_value.client.return_value
+    cached = [Server.from_json(_server_json("server1"))]
+    inventory_cache.return_value.load.return_value = cached
+
+    tested = LightSail("theRegion", 60)
+    assert cached == tested.list_servers("")
+    assert [] == client.mock_calls
+    # the cache is bypassed
+    inventory_cache.reset_mock()
+    client.get_instances.side_effect = [{"instances": [_instance("server2", [])]}]
+    tested = LightSail("theRegion", 60, refresh=True)
+    assert ["server2"] == [server.name for server in tested.list_servers("")]
+    assert [call.get_instances()] == client.mock_calls
+    calls = [call("theRegion", 60), call().save(tested.servers)]
+    assert calls == inventory_cache.mock_calls
+
+
+@patch("aws.lightsail.InventoryCache")
+@patch("boto3.Session")
+def test_list_servers__snapshots(session, inventory_cache):
+    client = session.return_value.client.return_value
+    client.get_instances.side_effect = [{"instances": [_instance("server1", [])]}]
+    client.get_alarms.side_effect = [
+        {"alarms": [_alarm("server1_cpu", "server1", 80)]},
+        {"alarms": [_alarm("server1_cpu", "server1", 80)]},
+    ]
+    inventory_cache.return_value.load.return_value = None
+    snapshots = Mock()
+
+    tested = LightSail("theRegion", 60, snapshots=snapshots)
+    tested.ALARM_LOOKUP_LIMIT = 0
+    # the alarms are only recorded for all the servers of the region
+    tested.list_alarms(["server1"])
+    result = tested.list_servers("")
+    alarms = tested.list_alarms(["server1"])
+    calls = [call.record_servers("theRegion", result), call.record_alarms("theRegion", alarms)]
+    assert calls == snapshots.mock_calls
+
+
+@patch("aws.lightsail.InventoryCache")
+@patch("boto3.Session")
+def test_set_rules(session, inventory_cache):
+    client = session.return_value.client.return_value
+    inventory_cache.return_value.load.return_value = [Server.from_json(_server_json("server1"))]
+    rules = [
+        Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=["1.2.3.4/32"]),
+        Port(FromPort=80, ToPort=80, Protocol="tcp", Cidrs=["0.0.0.0/0"]),
+    ]
+
+    tested = LightSail("theRegion", 60)
+    tested.set_rules("server1", rules)
+    calls = [
+        call.put_instance_public_ports(
+            instanceName="server1",
+            portInfos=[
+                {
+                    "fromPort": 22,
+                    "toPort": 22,
+                    "protocol": "tcp",
+                    "cidrs": ["1.2.3.4/32"],
+                    "cidrListAliases": ["lightsail-connect"],
+                },
+                {"fromPort": 80, "toPort": 80, "protocol": "tcp", "cidrs": ["0.0.0.0/0"]},
+            ],
+        )
+    ]
+    assert calls == client.mock_calls
+    calls = [call("theRegion", 60), call().invalidate()]
+    assert calls == inventory_cache.mock_calls
+    # the loaded inventory is updated
+    inventory_cache.reset_mock()
+    tested.list_servers("")
+    tested.set_rules("server1", rules)
+    assert tuple(rules) == tested.list_servers("")[0].firewall
+    calls = [call().load(), call().invalidate()]
+    assert calls == inventory_cache.mock_calls
+
+
+@patch("aws.lightsail.InventoryCache")
+@patch("boto3.Session")
+def test_set_rules__compacted(session, inventory_cache):
+    # only the SSH rule has the access from the console, it is neither merged into nor dropped by a wider range
+    client = session.return_value.client.return_value
+    ssh = {
+        "fromPort": 22,
+        "toPort": 22,
+        "protocol": "tcp",
+        "cidrs": ["1.2.3.4/32"],
+        "cidrListAliases": ["lightsail-connect"],
+    }
+    tests = [
+        (
+            [
+                Port(FromPort=21, ToPort=21, Protocol="tcp", Cidrs=["1.2.3.4/32"]),
+                Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=["1.2.3.4/32"]),
+                Port(FromPort=23, ToPort=443, Protocol="tcp", Cidrs=["1.2.3.4/32"]),
+                Port(FromPort=443, ToPort=8080, Protocol="tcp", Cidrs=["1.2.3.4/32"]),
+            ],
+            [
+                {"fromPort": 21, "toPort": 21, "protocol": "tcp", "cidrs": ["1.2.3.4/32"]},
+                ssh,
+                {"fromPort": 23, "toPort": 8080, "protocol": "tcp", "cidrs": ["1.2.3.4/32"]},
+            ],
+        ),
+        (
+            [
+                Port(FromPort=0, ToPort=65535, Protocol="tcp", Cidrs=["1.0.0.0/8"]),
+                Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=["1.2.3.4/32"]),
+                Port(FromPort=0, ToPort=65535, Protocol="udp", Cidrs=["1.0.0.0/8"]),
+            ],
+            [
+                {"fromPort": 0, "toPort": 65535, "protocol": "tcp", "cidrs": ["1.0.0.0/8"]},
+                ssh,
+                {"fromPort": 0, "toPort": 65535, "protocol": "udp", "cidrs": ["1.0.0.0/8"]},
+            ],
+        ),
+    ]
+    for rules, expected in tests:
+        client.reset_mock()
+        tested = LightSail("theRegion", 60)
+        tested.set_rules("server1", RuleCompactor.compact(rules))
+        assert [call.put_instance_public_ports(instanceName="server1", portInfos=expected)] == client.mock_calls
+
+
+def _server_json(name: str) -> dict:
+    return {
+        "name": name,
+        "tags": [],
+        "internalIp": "",
+        "externalIp": "",
+        "firewall": [],
+        "state": "running",
+        "cpu": 1,
+        "memoryGb": 1.0,
+        "region": "theRegion",
+    }
+
+
+def _alarm(name: str, server: str, threshold: float) -> dict:
+    return {
+        "name": name,
+        "monitoredResourceInfo": {"name": server},
+        "metricName": "CPUUtilization",
+        "period": 300,
+        "statistic": "Average",
+        "threshold": threshold,
+        "unit": "Percent",
+        "state": "OK",
+        "datapointsToAlarm": 2,
+        "evaluationPeriods": 3,
+        "comparisonOperator": "GreaterThanOrEqualToThreshold",
+    }
+
+
+@patch("aws.lightsail.LightSail.key_file")
+@patch("boto3.Session")
+def test_get_ssh_key(session, key_file, tmp_path):
+    client = session.return_value.client.return_value
+    client.download_default_key_pair.return_value = {"privateKeyBase64": "theKey"}
+    key_file.side_effect = lambda region: tmp_path / f"key{region}.txt"
+    # downloaded once per region
+    tested = LightSail("eu-west-3")
+    assert (tmp_path / "keyeu-west-3.txt").as_posix() == tested.get_ssh_key()
+    assert (tmp_path / "keyeu-west-3.txt").as_posix() == tested.get_ssh_key()
+    assert "theKey" == (tmp_path / "keyeu-west-3.txt").read_text()
+    assert [call.download_default_key_pair()] == client.mock_calls
+    # the key file without region is the one of the original region
+    client.reset_mock()
+    (tmp_path / "key.txt").write_text("theLegacyKey")
+    assert (tmp_path / "key.txt").as_posix() == LightSail(LightSail.LEGACY_KEY_REGION).get_ssh_key()
+    assert (tmp_path / "keyeu-west-1.txt").as_posix() == LightSail("eu-west-1").get_ssh_key()
+    assert [call.download_default_key_pair()] == client.mock_calls
+
+
+@patch("boto3.Session")
+def test_set_alarms(session):
+    client = session.return_value.client.return_value
+    alarms = {
+        "server1": [
+            _alarm("server1_unchanged", "server1", 80),
+            _alarm("server1_changed", "server1", 80),
+            _alarm("server1_deleted", "server1", 80),
+        ],
+        "server2": [],
+    }
+    client.get_alarms.side_effect = lambda monitoredResourceName: {"alarms": alarms[monitoredResourceName]}
+    definitions = [
+        AlarmDefinition(
+            name=name,
+            server="server1",
+            metric="CPUUtilization",
+            operator="GreaterThanOrEqualToThreshold",
+            threshold=threshold,
+            evaluation_periods=3,
+            datapoints_to_alarm=2,
+        )
+        for name, threshold in [("server1_unchanged", 80), ("server1_changed", 90), ("server1_new", 80)]
+    ]
+
+    tested = LightSail("theRegion")
+    result = tested.set_alarms(["server1", "server2"], definitions, 3)
+    assert (2, 1, 0) == (result.puts, result.deletes, result.retries)
+    calls = [
+        call.get_alarms(monitoredResourceName="server1"),
+        call.get_alarms(monitoredResourceName="server2"),
+        call.put_alarm(**definitions[1].to_json()),
+        call.put_alarm(**definitions[2].to_json()),
+        call.delete_alarm(alarmName="server1_deleted"),
+    ]
+    assert len(calls) == len(client.mock_calls)
+    for expected in calls:
+        assert expected in client.mock_calls
+
+
+@patch("boto3.Session")
+def test_list_alarms(session):
+    client = session.return_value.client.return_value
+    client.get_alarms.side_effect = [
+        {"alarms": [_alarm("server1_cpu", "server1", 80), _alarm("server2_cpu", "server2", 80)], "nextPageToken": "t"},
+        {"alarms": [_alarm("server3_cpu", "server3", 80)]},
+    ]
+
+    tested = LightSail("theRegion")
+    tested.ALARM_LOOKUP_LIMIT = 1
+    result = tested.list_alarms(["server1", "server3"])
+    assert ["server1_cpu", "server3_cpu"] == [alarm.name for alarm in result]
+    assert "theRegion" == result[0].region
+    assert AlarmScan(strategy="full scan", pages=2) == tested.alarm_scan
+    calls = [call.get_alarms(), call.get_alarms(pageToken="t")]
+    assert calls == client.mock_calls
+
+
+@patch("boto3.Session")
+def test_list_alarms__per_server(session):
+    client = session.return_value.client.return_value
+    pages = {
+        ("server1", ""): {"alarms": [_alarm("server1_cpu", "server1", 80)], "nextPageToken": "t"},
+        ("server1", "t"): {"alarms": [_alarm("server1_burst", "server1", 80)]},
+    }
+
+    def get_alarms(monitoredResourceName: str, pageToken: str = ""):
+        if monitoredResourceName == "server2":
+            raise ClientError({"Error": {"Code": "NotFoundException", "Message": "theMessage"}}, "GetAlarms")
+        return pages[(monitoredResourceName, pageToken)]
+
+    client.get_alarms.side_effect = get_alarms
+
+    tested = LightSail("theRegion")
+    result = tested.list_alarms(["server1", "server2"])
+    assert ["server1_cpu", "server1_burst"] == [alarm.name for alarm in result]
+    assert AlarmScan(strategy="per server", pages=3) == tested.alarm_scan
     #
-    queue: Queue = Queue()
-    tested.run_command(queue, "theServer", "extIp", "the command")
-    sleep(0.001)  # <-- give the queue the chance to store the response
-    calls = [call()]
-    assert calls == get_ssh_key.mock_calls
-    calls = [call('ssh -i theKeyFile -o StrictHostKeyChecking=no ubuntu@extIp  "the command" ', shell=True, stderr=-2)]
-    assert calls == check_output.mock_calls
-    responses: list = []
-    while not queue.empty():
-        responses.append(queue.get())
-    expected = [SshCommandResponse(server="theServer (extIp)", response=["line1", "line2", "line3"])]
-    assert expected == responses
+    client.reset_mock()
+    assert [] == tested.list_alarms([])
+    assert AlarmScan(strategy="per server", pages=0) == tested.alarm_scan
+    assert [] == client.mock_calls
+
+
+@patch("aws.lightsail.time")
+@patch("aws.lightsail.MetricCache.save")
+@patch("boto3.Session")
+def test_list_metrics(session, save, time):
+    client = session.return_value.client.return_value
+    time.side_effect = [3600.0 * 24, 3600.0 * 25, 3600.0 * 25]
+
+    def get_instance_metric_data(instanceName: str, metricName: str, startTime: datetime, endTime: datetime, **kwargs):
+        return {
+            "metricData": [
+                {"timestamp": datetime.fromtimestamp(timestamp, timezone.utc), "average": timestamp / 3600}
+                for timestamp in range(int(startTime.timestamp()), int(endTime.timestamp()), 3600)
+            ]
+        }
+
+    client.get_instance_metric_data.side_effect = get_instance_metric_data
+
+    tested = LightSail("theRegion", 60)
+    tested.MAX_DATAPOINTS = 4
+    result = tested.list_metrics(["server1", "server2"], ["CPUUtilization"], 3600 * 10, 3600, 2)
+    assert ["server1", "server2"] == [series.server for series in result]
+    assert {"theRegion"} == {series.region for series in result}
+    assert [float(hour) for hour in range(14, 24)] == result[0].values
+    assert [3600.0 * hour for hour in range(14, 24)] == result[0].timestamps
+    # the window is requested by chunks of MAX_DATAPOINTS
+    assert 6 == len(client.get_instance_metric_data.mock_calls)
+    expected = call.get_instance_metric_data(
+        instanceName="server1",
+        metricName="CPUUtilization",
+        period=3600,
+        startTime=datetime.fromtimestamp(3600 * 14, timezone.utc),
+        endTime=datetime.fromtimestamp(3600 * 18, timezone.utc),
+        unit="Percent",
+        statistics=["Average"],
+    )
+    assert expected in client.mock_calls
+    assert [call()] == save.mock_calls
+    # only the last period and the new ones are requested again
+    client.reset_mock()
+    result = tested.list_metrics(["server1"], ["CPUUtilization"], 3600 * 10, 3600, 2)
+    assert [float(hour) for hour in range(15, 25)] == result[0].values
+    expected = [
+        call.get_instance_metric_data(
+            instanceName="server1",
+            metricName="CPUUtilization",
+            period=3600,
+            startTime=datetime.fromtimestamp(3600 * 23, timezone.utc),
+            endTime=datetime.fromtimestamp(3600 * 25, timezone.utc),
+            unit="Percent",
+            statistics=["Average"],
+        )
+    ]
+    assert expected == client.mock_calls
+    # a wider window: the older part is requested too
+    client.reset_mock()
+    result = tested.list_metrics(["server1"], ["CPUUtilization"], 3600 * 20, 3600, 2)
+    assert [float(hour) for hour in range(5, 25)] == result[0].values
+    expected = [
+        call.get_instance_metric_data(
+            instanceName="server1",
+            metricName="CPUUtilization",
+            period=3600,
+            startTime=datetime.fromtimestamp(3600 * since, timezone.utc),
+            endTime=datetime.fromtimestamp(3600 * until, timezone.utc),
+            unit="Percent",
+            statistics=["Average"],
+        )
+        for since, until in [(5, 9), (9, 13), (13, 14), (24, 25)]
+    ]
+    assert expected == client.mock_calls
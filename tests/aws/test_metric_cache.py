@@ -0,0 +1,72 @@
+from unittest.mock import patch
+
+from aws.metric_cache import MetricCache
+
+
+def test_cache_file():
+    tested = MetricCache("theRegion", True)
+    result = tested.cache_file()
+    assert "metrics_theRegion.json" == result.name
+    assert "secrets" == result.parent.name
+
+
+def test_key():
+    assert "theServer|CPUUtilization|Average|300" == MetricCache.key("theServer", "CPUUtilization", "Average", 300)
+
+
+@patch("aws.metric_cache.MetricCache.cache_file")
+def test_merge_save(cache_file, tmp_path):
+    cache_file.return_value = tmp_path / "metrics.json"
+
+    tested = MetricCache("theRegion", True)
+    assert (0.0, 0.0, []) == tested.get("theKey")
+    result = tested.merge("theKey", [[2000.0, 2.0], [1000.0, 1.0]], 1000.0, 2100.0)
+    assert [[1000.0, 1.0], [2000.0, 2.0]] == result
+    # the datapoints fetched again replace the cached ones, the ranges overlapping are merged
+    result = tested.merge("theKey", [[2000.0, 2.5], [3000.0, 3.0]], 2000.0, 3100.0)
+    assert [[1000.0, 1.0], [2000.0, 2.5], [3000.0, 3.0]] == result
+    assert (1000.0, 3100.0, result) == tested.get("theKey")
+    result = tested.merge("theKey", [[500.0, 0.5]], 500.0, 3200.0)
+    assert (500.0, 3200.0, [[500.0, 0.5]] + result[1:]) == tested.get("theKey")
+    # a range apart replaces the cached one
+    result = tested.merge("theKey", [[5000.0, 5.0]], 5000.0, 5100.0)
+    assert (5000.0, 5100.0, [[5000.0, 5.0]]) == tested.get("theKey")
+    # out of retention
+    tested.merge("theKey", [[6000.0, 6.0]], 5000.0, 6100.0)
+    result = tested.merge("theKey", [], 6100.0, 5500.0 + MetricCache.RETENTION)
+    assert [[6000.0, 6.0]] == result
+    tested.save()
+    assert 0o600 == (tmp_path / "metrics.json").stat().st_mode & 0o777
+
+    tested = MetricCache("theRegion", True)
+    assert (5500.0, 5500.0 + MetricCache.RETENTION, [[6000.0, 6.0]]) == tested.get("theKey")
+
+
+@patch("aws.metric_cache.MetricCache.cache_file")
+def test_get__without_since(cache_file, tmp_path):
+    # cached before the start of the range was kept: nothing is known to be complete
+    cache_file.return_value = tmp_path / "metrics.json"
+    (tmp_path / "metrics.json").write_text('{"theKey": {"until": 2100.0, "datapoints": [[2000.0, 2.0]]}}')
+
+    tested = MetricCache("theRegion", True)
+    assert (2100.0, 2100.0, [[2000.0, 2.0]]) == tested.get("theKey")
+
+
+@patch("aws.metric_cache.MetricCache.cache_file")
+def test_merge_save__not_persisted(cache_file, tmp_path):
+    cache_file.return_value = tmp_path / "metrics.json"
+
+    tested = MetricCache("theRegion", False)
+    tested.merge("theKey", [[1000.0, 1.0]], 1000.0, 1100.0)
+    tested.save()
+    assert (1000.0, 1100.0, [[1000.0, 1.0]]) == tested.get("theKey")
+    assert (tmp_path / "metrics.json").exists() is False
+
+
+@patch("aws.metric_cache.MetricCache.cache_file")
+def test_get__invalid_file(cache_file, tmp_path):
+    cache_file.return_value = tmp_path / "metrics.json"
+    (tmp_path / "metrics.json").write_text("{")
+
+    tested = MetricCache("theRegion", True)
+    assert (0.0, 0.0, []) == tested.get("theKey")
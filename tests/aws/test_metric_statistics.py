@@ -0,0 +1,108 @@
+import numpy as np
+
+from aws.immutable.alarm_evaluation import AlarmEvaluation
+from aws.immutable.alarm_rule import AlarmRule
+from aws.immutable.metric_series import MetricSeries
+from aws.immutable.metric_summary import MetricSummary
+from aws.metric_statistics import MetricStatistics
+
+
+def _series(server: str, metric: str, values: list[float]) -> MetricSeries:
+    return MetricSeries(
+        server=server,
+        region="theRegion",
+        metric=metric,
+        period=300,
+        timestamps=[300.0 * index for index in range(len(values))],
+        values=values,
+    )
+
+
+def _rule(name: str, metric: str, operator: str, threshold: float) -> AlarmRule:
+    return AlarmRule(
+        name=name,
+        metric=metric,
+        operator=operator,
+        threshold=threshold,
+        evaluation_periods=3,
+        datapoints_to_alarm=2,
+    )
+
+
+def test_triggered():
+    rule = _rule("cpu", "CPUUtilization", "GreaterThanOrEqualToThreshold", 80)
+    tests = [
+        ([], False),
+        ([90], False),
+        ([90, 80], True),
+        ([90, 10, 10, 85], False),
+        ([10, 90, 10, 85], True),
+        ([10, 10, 10, 10, 79, 80, 81], True),
+    ]
+    for values, expected in tests:
+        assert expected is MetricStatistics.triggered(np.asarray(values, dtype=np.float64), rule), values
+    rule = _rule("burst", "BurstCapacityPercentage", "LessThanThreshold", 20)
+    assert MetricStatistics.triggered(np.asarray([19, 20, 5], dtype=np.float64), rule) is True
+    assert MetricStatistics.triggered(np.asarray([19, 20, 20, 5], dtype=np.float64), rule) is False
+
+
+def test_summaries():
+    cpu = _rule("cpu", "CPUUtilization", "GreaterThanThreshold", 50)
+    burst = _rule("burst", "BurstCapacityPercentage", "LessThanThreshold", 20)
+    tested = MetricStatistics(
+        [
+            _series("server1", "CPUUtilization", [10.0, 20.0, 30.0, 40.0, 50.0]),
+            _series("server2", "CPUUtilization", [60.0, 70.0, 60.0]),
+            _series("server2", "BurstCapacityPercentage", []),
+        ]
+    )
+    result = tested.summaries({"server1": [cpu], "server2": [cpu, burst]}, 35)
+    expected = [
+        MetricSummary("server1", "theRegion", "CPUUtilization", 5, 30.0, 48.0, 50.0, 600.0, []),
+        MetricSummary("server2", "theRegion", "CPUUtilization", 3, 60.0, 69.0, 70.0, 900.0, ["cpu"]),
+        MetricSummary("server2", "theRegion", "BurstCapacityPercentage", 0, 0.0, 0.0, 0.0, 0.0, []),
+        MetricSummary("(fleet)", "", "CPUUtilization", 8, 45.0, 66.5, 70.0, 1500.0, []),
+        MetricSummary("(fleet)", "", "BurstCapacityPercentage", 0, 0.0, 0.0, 0.0, 0.0, []),
+    ]
+    assert expected == result
+    # no threshold
+    assert [0.0] * 5 == [summary.above for summary in tested.summaries({})]
+
+
+def test_evaluate():
+    cpu = _rule("cpu", "CPUUtilization", "GreaterThanThreshold", 50)
+    burst = _rule("burst", "BurstCapacityPercentage", "LessThanThreshold", 20)
+    tested = MetricStatistics(
+        [
+            _series("server1", "CPUUtilization", [10.0, 60.0, 30.0, 60.0]),
+            _series("server2", "CPUUtilization", [60.0, 70.0, 10.0]),
+            _series("server3", "CPUUtilization", [90.0, 90.0, 90.0]),
+            _series("server1", "BurstCapacityPercentage", [50.0, 10.0]),
+        ]
+    )
+    result = tested.evaluate({"server1": [cpu, burst], "server2": [cpu], "server4": [cpu]})
+    expected = [
+        AlarmEvaluation(
+            alarm="cpu",
+            metric="CPUUtilization",
+            operator="GreaterThanThreshold",
+            threshold=50,
+            evaluation_periods=3,
+            datapoints_to_alarm=2,
+            servers=2,
+            triggered=["server1", "server2"],
+            breaching=1200.0,
+        ),
+        AlarmEvaluation(
+            alarm="burst",
+            metric="BurstCapacityPercentage",
+            operator="LessThanThreshold",
+            threshold=20,
+            evaluation_periods=3,
+            datapoints_to_alarm=2,
+            servers=1,
+            triggered=[],
+            breaching=300.0,
+        ),
+    ]
+    assert expected == result
@@ -0,0 +1,36 @@
+from aws.immutable.ssh_command_response import SshCommandResponse
+from aws.output_grouper import OutputGrouper
+from tests.aws.factories import make_server
+
+SERVERS = [
+    make_server(f"web{i}", region="theRegion", internal_ip=f"172.26.0.{i}", external_ip=f"54.0.0.{i}")
+    for i in range(1, 5)
+]
+
+
+def _response(index: int, lines: list[str], exit_code: int = 0) -> SshCommandResponse:
+    return SshCommandResponse(server=f"web{index} (54.0.0.{index})", response=lines, exit_code=exit_code)
+
+
+def test_add():
+    tested = OutputGrouper(SERVERS)
+    # only the last line is kept
+    assert _response(1, ["no reboot"]) == tested.add(_response(1, ["line1", "no reboot"]))
+    tested.add(_response(2, ["line1", "no reboot"]))
+    tested.add(_response(3, ["line1", "no reboot"], 1))
+    tested.add(_response(4, ["web4"]))
+    result = tested.sorted_groups()
+    assert [["web1", "web2"], ["web4"], ["web3"]] == [group.servers for group in result]
+    assert [0, 0, 1] == [group.exit_code for group in result]
+    assert ["line1", "no reboot"] == result[0].response
+
+
+def test_add__normalized():
+    tested = OutputGrouper(SERVERS, normalize=True)
+    tested.add(_response(1, ["web1", "inet 172.26.0.1 (ip-172-26-0-1)", "webserver"]))
+    tested.add(_response(2, ["web2", "inet 172.26.0.2 (ip-172-26-0-2)", "webserver"]))
+    tested.add(_response(3, ["web3", "inet 172.26.0.3 (ip-172-26-0-3)", "web1"]))
+    result = tested.sorted_groups()
+    assert [["web1", "web2"], ["web3"]] == [group.servers for group in result]
+    assert ["<host>", "inet <ip> (<host>)", "webserver"] == result[0].response
+    assert ["<host>", "inet <ip> (<host>)", "web1"] == result[1].response
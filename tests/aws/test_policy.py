@@ -0,0 +1,163 @@
+import json
+
+import pytest
+
+from aws.immutable.port import Port
+from aws.mutable.alarm_definition import AlarmDefinition
+from aws.policy import Policy
+from tests.aws.factories import make_server
+
+
+def _port(tag_key: str, tag_value: str, port: int) -> dict:
+    return {
+        "comment": "theComment",
+        "tagKey": tag_key,
+        "tagValue": tag_value,
+        "fromPort": port,
+        "toPort": port,
+        "protocol": "tcp",
+        "cidrs": ["1.2.3.4/32"],
+    }
+
+
+def _alarm(tag_key: str, tag_value: str, name: str) -> dict:
+    return {
+        "tagKey": tag_key,
+        "tagValue": tag_value,
+        "alarmName": name,
+        "metricName": "CPUUtilization",
+        "threshold": 80,
+        "evaluationPeriods": 3,
+        "datapointsToAlarm": 2,
+        "comparisonOperator": "GreaterThanOrEqualToThreshold",
+    }
+
+
+def test_ports_for(tmp_path):
+    (tmp_path / Policy.FIREWALL_FILE).write_text(
+        json.dumps([_port("", "", 22), _port("server", "web", 80), _port("webServer", "", 443), _port("a", "b", 1)])
+    )
+
+    tested = Policy(tmp_path)
+    assert {"ALL_SERVER", "server:web", "webServer", "a:b"} == set(tested.ports.keys())
+    result = tested.ports_for(make_server(tags=[{"key": "server", "value": "web"}, {"key": "webServer"}]))
+    expected = [
+        Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=["1.2.3.4/32"]),
+        Port(FromPort=80, ToPort=80, Protocol="tcp", Cidrs=["1.2.3.4/32"]),
+        Port(FromPort=443, ToPort=443, Protocol="tcp", Cidrs=["1.2.3.4/32"]),
+    ]
+    assert expected == result
+    result = tested.ports_for(make_server(tags=[{"key": "webServer", "value": "yes"}]))
+    assert [Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=["1.2.3.4/32"])] == result
+
+
+def test_compaction(tmp_path):
+    (tmp_path / Policy.FIREWALL_FILE).write_text(
+        json.dumps([_port("", "", 22), _port("server", "web", 22), _port("server", "web", 23), _port("a", "b", 80)])
+    )
+
+    tested = Policy(tmp_path)
+    web = make_server(tags=[{"key": "server", "value": "web"}])
+    # the duplicate is removed, the SSH rule is not merged
+    expected = [
+        Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=["1.2.3.4/32"]),
+        Port(FromPort=23, ToPort=23, Protocol="tcp", Cidrs=["1.2.3.4/32"]),
+    ]
+    assert (expected, 1) == tested.compaction(web)
+    assert expected == tested.ports_for(web)
+    assert ([Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=["1.2.3.4/32"])], 0) == tested.compaction(
+        make_server(tags=[])
+    )
+    # compacted once per combination of the matching tags
+    assert {("ALL_SERVER", "server:web"), ("ALL_SERVER",)} == set(tested.compacted.keys())
+    assert (
+        tested.compaction(web)[0]
+        is tested.compaction(make_server(tags=[{"key": "server", "value": "web"}, {"key": "x"}]))[0]
+    )
+
+
+def test_alarms_for(tmp_path):
+    (tmp_path / Policy.ALARMS_FILE).write_text(json.dumps([_alarm("", "", "cpu"), _alarm("env", "prod", "burst")]))
+
+    tested = Policy(tmp_path)
+    result = tested.alarms_for(make_server(tags=[{"key": "env", "value": "prod"}]))
+    expected = [
+        AlarmDefinition(
+            name=f"theServer_{name}",
+            server="theServer",
+            metric="CPUUtilization",
+            operator="GreaterThanOrEqualToThreshold",
+            threshold=80,
+            evaluation_periods=3,
+            datapoints_to_alarm=2,
+        )
+        for name in ["cpu", "burst"]
+    ]
+    assert expected == result
+    assert expected[:1] == tested.alarms_for(make_server(tags=[{"key": "env", "value": "test"}]))
+
+
+def test_alarm_rules_for(tmp_path):
+    (tmp_path / Policy.ALARMS_FILE).write_text(json.dumps([_alarm("", "", "cpu"), _alarm("env", "prod", "burst")]))
+
+    tested = Policy(tmp_path)
+    result = tested.alarm_rules_for(make_server(tags=[{"key": "env", "value": "prod"}]))
+    assert ["cpu", "burst"] == [rule.name for rule in result]
+    assert ["cpu"] == [
+        rule.name for rule in tested.alarm_rules_for(make_server(tags=[{"key": "env", "value": "test"}]))
+    ]
+    assert [] == Policy(None).alarm_rules_for(make_server(tags=[]))
+
+
+def test___init__empty(tmp_path):
+    for tested in [Policy(tmp_path), Policy(None)]:
+        assert {} == tested.ports
+        assert {} == tested.alarms
+        assert [] == tested.ports_for(make_server(tags=[]))
+
+
+def test___init__required(tmp_path):
+    # the directory given explicitly must hold both files
+    with pytest.raises(ValueError) as exc:
+        Policy(tmp_path / "unknown", required=True)
+    assert "the policy directory does not exist" in str(exc.value)
+    (tmp_path / Policy.FIREWALL_FILE).write_text(json.dumps([_port("", "", 22)]))
+    with pytest.raises(ValueError) as exc:
+        Policy(tmp_path, required=True)
+    assert f"{Policy.ALARMS_FILE}: the policy file does not exist" in str(exc.value)
+    (tmp_path / Policy.ALARMS_FILE).write_text("[]")
+    assert ["ALL_SERVER"] == list(Policy(tmp_path, required=True).ports.keys())
+    # the commands not using the policy
+    assert {} == Policy(None, required=True).ports
+
+
+def test_empty_files(tmp_path):
+    (tmp_path / Policy.FIREWALL_FILE).write_text(json.dumps([_port("", "", 22)]))
+    (tmp_path / Policy.ALARMS_FILE).write_text("[]")
+
+    tested = Policy(tmp_path)
+    assert [Policy.ALARMS_FILE] == tested.empty_files(["firewall", "alarms"])
+    assert [] == tested.empty_files(["firewall"])
+    assert [Policy.FIREWALL_FILE, Policy.ALARMS_FILE] == Policy(None).empty_files(["firewall", "alarms"])
+
+
+@pytest.mark.parametrize(
+    "file_name,content,message",
+    [
+        (Policy.FIREWALL_FILE, "[", "invalid JSON"),
+        (Policy.FIREWALL_FILE, "{}", "a list of rules is expected"),
+        (Policy.FIREWALL_FILE, json.dumps(["rule"]), "rule #1: an object is expected"),
+        (Policy.FIREWALL_FILE, json.dumps([_port("", "", 22) | {"toPort": "22"}]), "'toPort' has an invalid value"),
+        (Policy.FIREWALL_FILE, json.dumps([_port("", "", 22) | {"protocol": "tls"}]), "'protocol' must be one of"),
+        (Policy.FIREWALL_FILE, json.dumps([_port("", "", 22) | {"fromPort": 23}]), "invalid port range 23-22"),
+        (Policy.FIREWALL_FILE, json.dumps([_port("", "", 22) | {"cidrs": ["1.2.3/40"]}]), "invalid CIDR"),
+        (Policy.ALARMS_FILE, json.dumps([_alarm("", "", "cpu"), {"tagKey": ""}]), "rule #2: 'tagValue' is missing"),
+        (Policy.ALARMS_FILE, json.dumps([_alarm("", "", "cpu") | {"threshold": True}]), "'threshold' has an invalid"),
+    ],
+)
+def test___init__errors(tmp_path, file_name, content, message):
+    (tmp_path / file_name).write_text(content)
+    with pytest.raises(ValueError) as exc:
+        Policy(tmp_path)
+    assert message in str(exc.value)
+    assert file_name in str(exc.value)
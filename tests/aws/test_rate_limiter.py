@@ -0,0 +1,72 @@
+from unittest.mock import patch, call, Mock
+
+import pytest
+from botocore.exceptions import ClientError
+
+from aws.rate_limiter import RateLimiter
+
+
+def _error(code: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": "theMessage"}}, "theOperation")
+
+
+@patch("aws.rate_limiter.sleep")
+@patch("aws.rate_limiter.monotonic")
+def test_acquire(monotonic, sleep):
+    monotonic.side_effect = [100.0, 100.0, 100.0, 100.5]
+
+    tested = RateLimiter(rate=4.0)
+    tested.acquire()
+    tested.acquire()
+    tested.acquire()
+    assert [call(0.25)] == sleep.mock_calls
+    assert 100.75 == tested.next_slot
+
+
+@patch("aws.rate_limiter.sleep")
+def test_call(sleep):
+    function = Mock()
+    function.side_effect = [_error("ThrottlingException"), _error("TooManyRequestsException"), "theResponse"]
+
+    tested = RateLimiter(rate=8.0, min_rate=1.0, max_rate=10.0, increase=0.5)
+    result = tested.call(function, key="value")
+    assert "theResponse" == result
+    assert [call(key="value")] * 3 == function.mock_calls
+    assert 2 == tested.retries
+    assert 2.5 == tested.rate  # 8 -> 4 -> 2 -> 2.5
+    assert call(1 / 4) in sleep.mock_calls
+    assert call(2 / 2) in sleep.mock_calls
+
+
+@patch("aws.rate_limiter.sleep")
+def test_call__unpaced(sleep):
+    # not paced until throttled, then from half the max rate
+    function = Mock()
+    function.side_effect = ["theResponse"] * 100 + [_error("ThrottlingException"), "theResponse", "theResponse"]
+
+    tested = RateLimiter(max_rate=50.0, increase=0.5)
+    for _ in range(100):
+        tested.call(function)
+    assert [] == sleep.mock_calls
+    assert 50.0 == tested.rate
+    tested.call(function)
+    tested.call(function)
+    assert 26.0 == tested.rate  # 50 -> 25 -> 25.5 -> 26
+    assert call(1 / 25) in sleep.mock_calls
+    assert tested.paced
+
+
+@patch("aws.rate_limiter.sleep")
+def test_call__errors(sleep):
+    function = Mock()
+    function.side_effect = [_error("AccessDeniedException")]
+    tested = RateLimiter()
+    with pytest.raises(ClientError):
+        tested.call(function)
+    assert 0 == tested.retries
+    #
+    function.side_effect = [_error("ThrottlingException")] * 3
+    tested = RateLimiter(max_retries=2)
+    with pytest.raises(ClientError):
+        tested.call(function)
+    assert 2 == tested.retries
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from aws.immutable.plan_entry import PlanEntry
+from aws.light_sail_regions import LightSailRegions
+from aws.policy import Policy
+from aws.reconciler import Reconciler
+from aws.state_journal import StateJournal
+from benchmarks.fake_lightsail import FakeLightSail
+
+FIREWALL_RULES = [
+    {"tagKey": "", "tagValue": "", "fromPort": 22, "toPort": 22, "protocol": "tcp", "cidrs": ["1.2.3.4/32"]},
+    {"tagKey": "role", "tagValue": "web", "fromPort": 80, "toPort": 80, "protocol": "tcp", "cidrs": ["0.0.0.0/0"]},
+]
+ALARMS = [
+    {
+        "tagKey": "",
+        "tagValue": "",
+        "alarmName": "cpu",
+        "metricName": "CPUUtilization",
+        "threshold": 90,
+        "evaluationPeriods": 3,
+        "datapointsToAlarm": 2,
+        "comparisonOperator": "GreaterThanOrEqualToThreshold",
+    },
+]
+
+
+def _reconciler(fake: FakeLightSail, tmp_path, refresh: bool = False) -> Reconciler:
+    (tmp_path / Policy.FIREWALL_FILE).write_text(json.dumps(FIREWALL_RULES))
+    (tmp_path / Policy.ALARMS_FILE).write_text(json.dumps(ALARMS))
+    light_sail = LightSailRegions(["theRegion"], clients={"theRegion": fake})
+    return Reconciler(light_sail, Policy(tmp_path), StateJournal(tmp_path / "journal.json"), refresh)
+
+
+def test_plan_apply(tmp_path):
+    fake = FakeLightSail.fleet(12)
+
+    tested = _reconciler(fake, tmp_path)
+    servers = tested.light_sail.list_servers("")
+    result = tested.plan(servers, list(Reconciler.RESOURCES))
+    # the web servers miss the port 80, the servers have a burst alarm no longer in the policy
+    expected = [(f"server-{index:05d}", "firewall") for index in (0, 3, 6, 9)]
+    expected += [(f"server-{index:05d}", "alarms") for index in range(12)]
+    assert sorted(expected) == sorted((entry.server, entry.resource) for entry in result.entries)
+    assert 8 == result.unchanged
+    assert 0 == result.skipped
+    entry = [x for x in result.entries if x.server == "server-00000" and x.resource == "alarms"][0]
+    assert "1 to set, 1 to delete" == entry.details
+
+    firewalls, summary = tested.apply(result, 5)
+    assert 4 == firewalls
+    assert (2, 12) == (summary.puts, summary.deletes)
+    assert ["server-00000_cpu"] == [name for name in fake.alarms if name.startswith("server-00000")]
+
+    # the alarms in line according to the journal are not read again
+    tested = _reconciler(fake, tmp_path)
+    calls = fake.calls["get_alarms"]
+    result = tested.plan(tested.light_sail.list_servers(""), list(Reconciler.RESOURCES))
+    assert [] == result.entries
+    assert (12, 12) == (result.unchanged, result.skipped)
+    assert calls == fake.calls["get_alarms"]
+    # unless refreshed
+    tested = _reconciler(fake, tmp_path, refresh=True)
+    result = tested.plan(tested.light_sail.list_servers(""), [PlanEntry.alarms()])
+    assert (12, 0) == (result.unchanged, result.skipped)
+    assert calls < fake.calls["get_alarms"]
+
+
+def test_apply__drifted(tmp_path):
+    fake = FakeLightSail.fleet(4)
+
+    tested = _reconciler(fake, tmp_path)
+    plan = tested.plan(tested.light_sail.list_servers(""), [PlanEntry.firewall()])
+    assert ["server-00000", "server-00003"] == [entry.server for entry in plan.entries]
+    # the firewall of a server is changed in between
+    fake.put_instance_public_ports(instanceName="server-00003", portInfos=[])
+    tested = _reconciler(fake, tmp_path)
+    with pytest.raises(ValueError) as exc:
+        tested.apply(plan, 5)
+    assert "the state drifted since the plan: server-00003 (firewall changed)" == str(exc.value)
+    assert 1 == fake.calls["put_instance_public_ports"]
+    # the policy is changed in between
+    (tmp_path / Policy.FIREWALL_FILE).write_text(json.dumps(FIREWALL_RULES[:1]))
+    tested = Reconciler(tested.light_sail, Policy(tmp_path), tested.journal, False)
+    plan = plan._replace(entries=plan.entries[:1])
+    with pytest.raises(ValueError) as exc:
+        tested.apply(plan, 5)
+    assert "the state drifted since the plan: server-00000 (firewall policy changed)" == str(exc.value)
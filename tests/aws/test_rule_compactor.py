@@ -0,0 +1,65 @@
+from aws.immutable.port import Port
+from aws.rule_compactor import RuleCompactor
+
+
+def _port(from_port: int, to_port: int, cidrs: list[str], protocol: str = "tcp") -> Port:
+    return Port(FromPort=from_port, ToPort=to_port, Protocol=protocol, Cidrs=cidrs)
+
+
+def test_compact():
+    # duplicates
+    rules = [_port(22, 22, ["1.2.3.4/32"]), _port(22, 22, ["1.2.3.4/32"])]
+    assert [_port(22, 22, ["1.2.3.4/32"])] == RuleCompactor.compact(rules)
+    # the CIDRs of a same range are collapsed (adjacent, nested, host bits set)
+    rules = [_port(22, 22, ["10.0.0.0/25", "10.0.0.200/25"]), _port(22, 22, ["10.0.0.7/32", "2001:db8::/32"])]
+    assert [_port(22, 22, ["10.0.0.0/24", "2001:db8::/32"])] == RuleCompactor.compact(rules)
+    # the overlapping or adjacent ranges open to the same CIDRs are merged
+    rules = [_port(80, 80, ["0.0.0.0/0"]), _port(81, 90, ["0.0.0.0/0"]), _port(85, 100, ["0.0.0.0/0"])]
+    assert [_port(80, 100, ["0.0.0.0/0"])] == RuleCompactor.compact(rules)
+    # the ranges merged once their CIDRs are collapsed
+    rules = [_port(80, 80, ["10.0.0.0/25"]), _port(80, 80, ["10.0.0.128/25"]), _port(81, 81, ["10.0.0.0/24"])]
+    assert [_port(80, 81, ["10.0.0.0/24"])] == RuleCompactor.compact(rules)
+    # the CIDRs allowed by a wider range are dropped
+    rules = [
+        _port(0, 65535, ["1.2.3.0/24"]),
+        _port(23, 23, ["1.2.3.4/32", "5.6.7.8/32"]),
+        _port(80, 80, ["1.2.3.5/32"]),
+    ]
+    expected = [_port(0, 65535, ["1.2.3.0/24"]), _port(23, 23, ["5.6.7.8/32"])]
+    assert expected == RuleCompactor.compact(rules)
+    # the SSH rules are neither merged nor dropped, only collapsed
+    rules = [
+        _port(0, 65535, ["1.2.3.0/24"]),
+        _port(21, 21, ["1.2.3.4/32"]),
+        _port(22, 22, ["1.2.3.4/32", "1.2.3.5/32"]),
+        _port(22, 22, ["1.2.3.4/31"]),
+        _port(23, 23, ["1.2.3.4/32"]),
+    ]
+    expected = [_port(0, 65535, ["1.2.3.0/24"]), _port(22, 22, ["1.2.3.4/31"])]
+    assert expected == RuleCompactor.compact(rules)
+    rules = [_port(21, 21, ["1.2.3.4/32"]), _port(22, 22, ["1.2.3.4/32"]), _port(23, 23, ["1.2.3.4/32"])]
+    assert rules == RuleCompactor.compact(rules)
+    # different CIDRs, protocols not merged
+    rules = [
+        _port(22, 22, ["1.2.3.4/32"]),
+        _port(23, 23, ["5.6.7.8/32"]),
+        _port(22, 22, ["1.2.3.4/32"], "udp"),
+        _port(8, 8, ["0.0.0.0/0"], "icmp"),
+        _port(9, 9, ["0.0.0.0/0"], "icmp"),
+    ]
+    expected = [
+        _port(8, 8, ["0.0.0.0/0"], "icmp"),
+        _port(9, 9, ["0.0.0.0/0"], "icmp"),
+        _port(22, 22, ["1.2.3.4/32"]),
+        _port(23, 23, ["5.6.7.8/32"]),
+        _port(22, 22, ["1.2.3.4/32"], "udp"),
+    ]
+    assert expected == RuleCompactor.compact(rules)
+    # a rule without CIDR is kept
+    assert [_port(22, 22, [])] == RuleCompactor.compact([_port(22, 22, [])])
+    assert [] == RuleCompactor.compact([])
+
+
+def test_merge():
+    assert [(1, 5), (7, 7)] == RuleCompactor.merge([(4, 5), (7, 7), (1, 3), (2, 2)])
+    assert [] == RuleCompactor.merge([])
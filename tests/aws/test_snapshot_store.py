@@ -0,0 +1,130 @@
+from contextlib import closing
+
+from aws.immutable.alarm_response import AlarmResponse
+from aws.immutable.alarm_transition import AlarmTransition
+from aws.immutable.port import Port
+from aws.immutable.server import Server
+from aws.immutable.server_change import ServerChange
+from aws.snapshot_store import SnapshotStore
+from tests.aws.factories import make_server
+
+
+def _server(name: str, state: str = "running", cidr: str = "1.2.3.4/32", tags: list | None = None) -> Server:
+    return make_server(
+        name,
+        tags if tags is not None else [{"key": "env", "value": "prod"}],
+        region="theRegion",
+        internal_ip="10.0.0.1",
+        external_ip="1.1.1.1",
+        firewall=[Port(FromPort=22, ToPort=22, Protocol="tcp", Cidrs=[cidr])],
+        state=state,
+    )
+
+
+def _alarm(server: str, state: str) -> AlarmResponse:
+    return AlarmResponse(
+        name=f"{server}_cpu",
+        server=server,
+        metric="CPUUtilization",
+        state=state,
+        period=300,
+        statistic="Average",
+        threshold=80,
+        unit="Percent",
+        datapoints_to_alarm=2,
+        evaluation_periods=3,
+        operator="GreaterThanOrEqualToThreshold",
+        region="theRegion",
+    )
+
+
+def test_record(tmp_path):
+    tested = SnapshotStore(tmp_path / "snapshots.sqlite3")
+    first = tested.record_servers("theRegion", [_server("server1"), _server("server2")], 100)
+    # an identical load only extends the snapshot
+    assert first == tested.record_servers("theRegion", [_server("server2"), _server("server1")], 200)
+    second = tested.record_servers("theRegion", [_server("server1", "stopped"), _server("server2")], 300)
+    assert first != second
+    with closing(tested.connect()) as connection:
+        assert [(100, 200), (300, 300)] == connection.execute("SELECT taken, seen FROM snapshots").fetchall()
+        # the unchanged server is stored once
+        assert 3 == connection.execute("SELECT COUNT(*) FROM contents").fetchone()[0]
+        assert [(first, 100.0)] == tested.snapshots(connection, SnapshotStore.SERVERS, "theRegion", 250, 250)
+        expected = [(first, 100.0), (second, 300.0)]
+        assert expected == tested.snapshots(connection, SnapshotStore.SERVERS, "theRegion", 150, 400)
+        assert [(second, 300.0)] == tested.snapshots(connection, SnapshotStore.SERVERS, "theRegion", 300, 400)
+        assert [] == tested.snapshots(connection, SnapshotStore.SERVERS, "otherRegion", 0, 400)
+
+
+def test_diff(tmp_path):
+    tested = SnapshotStore(tmp_path / "snapshots.sqlite3")
+    tested.record_servers("theRegion", [_server("server1"), _server("server2"), _server("server3")], 100)
+    tested.record_servers("theRegion", [_server("server1", "stopped"), _server("server2")], 200)
+    tested.record_servers(
+        "theRegion",
+        [
+            _server("server1", "running", "5.6.7.8/32"),
+            _server("server2", tags=[{"key": "env", "value": "test"}, {"key": "maintenance"}]),
+            _server("server4"),
+        ],
+        300,
+    )
+    now = SnapshotStore.timestamp(300)
+    expected = [
+        ServerChange(now, "theRegion", "server1", "firewall", "22/tcp 1.2.3.4/32", "22/tcp 5.6.7.8/32"),
+        ServerChange(now, "theRegion", "server2", "tags", "env:prod", "env:test, maintenance"),
+        ServerChange(now, "theRegion", "server3", "removed", "", ""),
+        ServerChange(now, "theRegion", "server4", "added", "", ""),
+    ]
+    assert expected == tested.diff(["theRegion", "otherRegion"], 150, 400)
+    assert {"theRegion": (SnapshotStore.timestamp(100), SnapshotStore.timestamp(300))} == tested.compared
+
+    assert [] == tested.diff(["theRegion"], 350, 400)
+
+
+def test_history(tmp_path):
+    tested = SnapshotStore(tmp_path / "snapshots.sqlite3")
+    tested.record_servers("theRegion", [_server("server1"), _server("server2")], 100)
+    tested.record_servers("theRegion", [_server("server1", "stopped"), _server("server2")], 200)
+    tested.record_servers("theRegion", [_server("server1")], 300)
+    expected = [
+        ServerChange(SnapshotStore.timestamp(200), "theRegion", "server1", "state", "running", "stopped"),
+        ServerChange(SnapshotStore.timestamp(300), "theRegion", "server1", "state", "stopped", "running"),
+        ServerChange(SnapshotStore.timestamp(300), "theRegion", "server2", "removed", "", ""),
+    ]
+    assert expected == tested.history(["theRegion"], 150, 400)
+    assert expected[1:] == tested.history(["theRegion"], 250, 400)
+
+
+def test_tag_index(tmp_path):
+    tested = SnapshotStore(tmp_path / "snapshots.sqlite3")
+    tested.record_servers("theRegion", [_server("server1"), _server("server2", tags=[])], 100)
+    tested.record_servers("theRegion", [_server("server1", tags=[{"key": "maintenance"}])], 200)
+    result = tested.tag_index(["theRegion"], 150, 300)
+    assert {"server1", "server2"} == result.names
+    # the tags had in the period
+    assert {"server1"} == result.servers("env:prod")
+    assert {"server1"} == result.servers("maintenance")
+
+    result = tested.tag_index(["theRegion"], 250, 300)
+    assert {"server1"} == result.names
+    assert set() == result.servers("env:prod")
+
+
+def test_alarm_history(tmp_path):
+    tested = SnapshotStore(tmp_path / "snapshots.sqlite3")
+    tested.record_alarms("theRegion", [_alarm("server1", "OK"), _alarm("server2", "ALARM")], 100)
+    tested.record_alarms("theRegion", [_alarm("server1", "ALARM"), _alarm("server2", "ALARM")], 200)
+    tested.record_alarms("theRegion", [_alarm("server1", "ALARM"), _alarm("server3", "OK")], 300)
+
+    def transition(when: float, server: str, change: str, previous: str, state: str) -> AlarmTransition:
+        time = SnapshotStore.timestamp(when)
+        return AlarmTransition(time, "theRegion", server, f"{server}_cpu", "CPUUtilization", change, previous, state)
+
+    expected = [
+        transition(150, "server2", AlarmTransition.initial(), "", "ALARM"),
+        transition(200, "server1", AlarmTransition.changed(), "OK", "ALARM"),
+        transition(300, "server2", AlarmTransition.removed(), "ALARM", ""),
+        transition(300, "server3", AlarmTransition.added(), "", "OK"),
+    ]
+    assert expected == tested.alarm_history(["theRegion"], 150, 400)
@@ -0,0 +1,282 @@
+import hashlib
+import time
+from threading import Lock
+from io import BytesIO
+from subprocess import CompletedProcess
+from unittest.mock import patch, call, Mock
+
+from aws.immutable.server import Server
+from aws.immutable.ssh_command_response import SshCommandResponse
+from aws.ssh_executor import SshExecutor
+from tests.aws.factories import make_server
+
+
+def test_ssh_arguments():
+    tested = SshExecutor(ssh_keys={"theRegion": "theKeyFile"}, parallel=3, connect_timeout=7, command_timeout=0)
+    result = tested.ssh_arguments("theKeyFile", "extIp", "the command")
+    expected = [
+        "ssh",
+        "-i",
+        "theKeyFile",
+        "-o",
+        "StrictHostKeyChecking=no",
+        "-o",
+        "ConnectTimeout=7",
+        "ubuntu@extIp",
+        "the command",
+    ]
+    assert expected == result
+
+
+def _process(output: bytes, exit_code: int) -> Mock:
+    process = Mock(stdout=BytesIO(output))
+    process.wait.return_value = exit_code
+    return process
+
+
+@patch("aws.ssh_executor.monotonic")
+@patch("aws.ssh_executor.Popen")
+def test_execute(popen, monotonic):
+    monotonic.side_effect = [10.0, 12.5]
+    popen.return_value.__enter__.return_value = _process(b"line1\nline2\r\nline3", 0)
+
+    tested = SshExecutor(ssh_keys={"theRegion": "theKeyFile"}, parallel=3, connect_timeout=7, command_timeout=0)
+    result = tested.execute(make_server("theServer", region="theRegion", external_ip="extIp"), "the command")
+    expected = SshCommandResponse(server="theServer (extIp)", response=["line1", "line2", "line3"], elapsed=2.5)
+    assert expected == result
+    calls = [call(tested.ssh_arguments("theKeyFile", "extIp", "the command"), stdin=None, stdout=-1, stderr=-2)]
+    assert calls == popen.mock_calls[:1]
+
+
+@patch("aws.ssh_executor.monotonic")
+@patch("aws.ssh_executor.Popen")
+def test_execute__streamed(popen, monotonic, tmp_path):
+    monotonic.side_effect = [10.0, 12.5]
+    popen.return_value.__enter__.return_value = _process(b"line1\nline2\nline3\nline4\n", 2)
+    on_line = Mock()
+
+    tested = SshExecutor(
+        ssh_keys={"theRegion": "theKeyFile"},
+        parallel=3,
+        connect_timeout=7,
+        command_timeout=0,
+        max_lines=2,
+        log_directory=tmp_path / "logs",
+        on_line=on_line,
+    )
+    result = tested.execute(make_server("theServer", region="theRegion", external_ip="extIp"), "the command")
+    expected = SshCommandResponse(
+        server="theServer (extIp)", response=["line3", "line4"], elapsed=2.5, exit_code=2, dropped=2
+    )
+    assert expected == result
+    assert [call("theServer", f"line{i}") for i in range(1, 5)] == on_line.mock_calls
+    assert b"line1\nline2\nline3\nline4\n" == (tmp_path / "logs" / "theServer.log").read_bytes()
+
+
+@patch("aws.ssh_executor.Timer")
+@patch("aws.ssh_executor.monotonic")
+@patch("aws.ssh_executor.Popen")
+def test_execute__timeout(popen, monotonic, timer):
+    monotonic.side_effect = [10.0, 15.0]
+    process = _process(b"partial", -9)
+    popen.return_value.__enter__.return_value = process
+    # the timer expires straight away
+    timer.side_effect = lambda interval, function: function() or Mock()
+
+    tested = SshExecutor(ssh_keys={"theRegion": "theKeyFile"}, parallel=3, connect_timeout=7, command_timeout=5)
+    result = tested.execute(make_server("theServer", region="theRegion", external_ip="extIp"), "the command")
+    expected = SshCommandResponse(
+        server="theServer (extIp)",
+        response=["partial", "*** timed out after 5s"],
+        elapsed=5.0,
+        exit_code=SshExecutor.EXIT_TIMEOUT,
+    )
+    assert expected == result
+    assert [call.kill(), call.wait()] == [c for c in process.mock_calls if c[0] in ("kill", "wait")]
+    assert 5 == timer.mock_calls[0].args[0]
+
+
+@patch("aws.ssh_executor.SshExecutor.execute")
+def test_run(execute):
+    execute.side_effect = lambda server, command: SshCommandResponse(server=server.name, response=[command])
+
+    tested = SshExecutor(ssh_keys={"theRegion": "theKeyFile"}, parallel=2, connect_timeout=7, command_timeout=0)
+    servers = [make_server(f"server{i}", region="theRegion", external_ip=f"ip{i}") for i in range(5)]
+    result = sorted(tested.run(servers, "the command"))
+    expected = [SshCommandResponse(server=f"server{i}", response=["the command"]) for i in range(5)]
+    assert expected == result
+    assert 5 == len(execute.mock_calls)
+
+
+@patch("aws.ssh_executor.SshExecutor.control_path")
+def test_ssh_arguments__persist(control_path):
+    control_path.return_value = "theDirectory/%C"
+
+    tested = SshExecutor(
+        ssh_keys={"theRegion": "theKeyFile"}, parallel=3, connect_timeout=7, command_timeout=0, control_persist=90
+    )
+    result = tested.ssh_arguments("theKeyFile", "extIp", "the command")
+    expected = [
+        "ssh",
+        "-i",
+        "theKeyFile",
+        "-o",
+        "StrictHostKeyChecking=no",
+        "-o",
+        "ConnectTimeout=7",
+        "-o",
+        "ControlMaster=auto",
+        "-o",
+        "ControlPath=theDirectory/%C",
+        "-o",
+        "ControlPersist=90s",
+        "ubuntu@extIp",
+        "the command",
+    ]
+    assert expected == result
+    #
+    result = tested.exit_arguments("extIp")
+    expected = ["ssh", "-o", "ControlPath=theDirectory/%C", "-O", "exit", "ubuntu@extIp"]
+    assert expected == result
+
+
+@patch("aws.ssh_executor.SshExecutor.execute")
+def test_connect(execute):
+    execute.side_effect = lambda server, command: SshCommandResponse(server=server.name, response=[command])
+
+    tested = SshExecutor(ssh_keys={"theRegion": "theKeyFile"}, parallel=2, connect_timeout=7, command_timeout=0)
+    result = list(tested.connect([make_server("server1", region="theRegion", external_ip="ip1")]))
+    expected = [SshCommandResponse(server="server1", response=["true"])]
+    assert expected == result
+    assert SshExecutor.CONTROL_PERSIST == tested.control_persist
+
+
+@patch("aws.ssh_executor.sleep")
+@patch("aws.ssh_executor.SshExecutor.execute")
+def test_rolling(execute, sleep):
+    running: list[str] = []
+    concurrency: list[int] = []
+    lock = Lock()
+
+    def execute_command(server: Server, command: str) -> SshCommandResponse:
+        with lock:
+            running.append(server.name)
+            concurrency.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(server.name)
+        return SshCommandResponse(server=server.name, response=[command], exit_code=int(server.name == "server3"))
+
+    execute.side_effect = execute_command
+
+    tested = SshExecutor(ssh_keys={"theRegion": "theKeyFile"}, parallel=20, connect_timeout=7, command_timeout=0)
+    servers = [make_server(f"server{i}", region="theRegion", external_ip=f"ip{i}") for i in range(10)]
+    result = list(tested.rolling(servers, "the command", batch_size=3, canary=1, pause=2.5, max_failure_rate=0.5))
+    assert [f"server{i}" for i in range(10)] == sorted(response.server for response in result)
+    assert "server0" == result[0].server
+    assert 3 == max(concurrency)
+    assert [] == tested.skipped
+    # after the canary, then after each batch of 3 servers started
+    assert [call(2.5)] * 3 == sleep.mock_calls
+
+
+@patch("aws.ssh_executor.sleep")
+@patch("aws.ssh_executor.SshExecutor.execute")
+def test_rolling__aborted(execute, sleep):
+    execute.side_effect = lambda server, command: SshCommandResponse(
+        server=server.name, response=[command], exit_code=int(server.name in ("server1", "server2"))
+    )
+
+    tested = SshExecutor(ssh_keys={"theRegion": "theKeyFile"}, parallel=20, connect_timeout=7, command_timeout=0)
+    servers = [make_server(f"server{i}", region="theRegion", external_ip=f"ip{i}") for i in range(6)]
+    # the canary fails
+    result = list(tested.rolling(servers[1:], "the command", batch_size=2, canary=1))
+    assert ["server1"] == [response.server for response in result]
+    assert [f"server{i}" for i in range(2, 6)] == [server.name for server in tested.skipped]
+    # the failure rate is exceeded after the 3rd server
+    result = list(tested.rolling(servers, "the command", batch_size=1, max_failure_rate=0.5))
+    assert ["server0", "server1", "server2"] == [response.server for response in result]
+    assert ["server3", "server4", "server5"] == [server.name for server in tested.skipped]
+    assert [] == sleep.mock_calls
+
+
+@patch("aws.ssh_executor.Popen")
+def test_script(popen, tmp_path):
+    popen.return_value.__enter__.return_value = _process(b"done\n", 0)
+    script = tmp_path / "theScript.sh"
+    script.write_bytes(b"echo done\n")
+
+    tested = SshExecutor(ssh_keys={"theRegion": "theKeyFile"}, parallel=3, connect_timeout=7, command_timeout=0)
+    result = list(
+        tested.script([make_server("theServer", region="theRegion", external_ip="extIp")], script, "--the-argument")
+    )
+    assert [["done"]] == [response.response for response in result]
+    arguments = tested.ssh_arguments("theKeyFile", "extIp", "bash -s -- --the-argument")
+    assert call(arguments, stdin=-1, stdout=-1, stderr=-2) == popen.mock_calls[0]
+    # the script is streamed over stdin
+    stdin = popen.return_value.__enter__.return_value.stdin
+    assert [call.write(b"echo done\n"), call.close()] == stdin.mock_calls
+
+
+@patch("aws.ssh_executor.run")
+@patch("aws.ssh_executor.Popen")
+def test_push(popen, run, tmp_path):
+    popen.return_value.__enter__.return_value = _process(b"", 0)
+    source = tmp_path / "theFile.conf"
+    source.write_bytes(b"the content")
+    checksum = hashlib.sha256(b"the content").hexdigest()
+    remote = {
+        "ip1": CompletedProcess([], 0, f"{checksum}  theFile.conf\n".encode(), b""),  # identical
+        "ip2": CompletedProcess([], 0, b"", b""),  # missing
+        "ip3": CompletedProcess([], 255, b"", b"Connection refused\n"),
+    }
+    run.side_effect = lambda arguments, **kwargs: remote[arguments[-2].split("@")[1]]
+
+    tested = SshExecutor(ssh_keys={"theRegion": "theKeyFile"}, parallel=4, connect_timeout=7, command_timeout=0)
+    servers = [make_server(f"server{i}", region="theRegion", external_ip=f"ip{i}") for i in range(1, 4)]
+    result = sorted(tested.push(servers, source, "~/conf/", bandwidth=100))
+    assert ["~/conf/theFile.conf unchanged"] == result[0].response
+    assert ["~/conf/theFile.conf transferred"] == result[1].response
+    assert (["Connection refused"], 255) == (result[2].response, result[2].exit_code)
+    assert ["server1"] == [server.name for server in tested.unchanged]
+    command = (
+        'target=~/conf/theFile.conf; [ -d "$target" ] && target="$target"/theFile.conf; '
+        'sha256sum -- "$target" 2>/dev/null || true'
+    )
+    assert call(
+        tested.ssh_arguments("theKeyFile", "ip2", command), capture_output=True, timeout=None, check=False
+    ) in (run.mock_calls)
+    # only the missing file is transferred, 100 KB/s shared by the 3 transfers
+    arguments = tested.scp_arguments("theKeyFile", "ip2", source, "~/conf/theFile.conf", 266)
+    assert [call(arguments, stdin=None, stdout=-1, stderr=-2)] == [c for c in popen.mock_calls if c[0] == ""]
+    assert ["scp", "-q", "-i", "theKeyFile"] == arguments[:4]
+    assert ["-l", "266", source.as_posix(), "ubuntu@ip2:~/conf/theFile.conf"] == arguments[-4:]
+    # nothing is transferred on dry run
+    popen.reset_mock()
+    assert ["~/conf/theFile.conf to transfer"] == sorted(tested.push(servers, source, "~/conf/", dry_run=True))[
+        1
+    ].response
+    assert [] == popen.mock_calls
+
+
+@patch("aws.ssh_executor.Popen")
+def test_push__directory(popen, tmp_path):
+    # a destination naming an existing directory is compared with the file of the same name in it
+    popen.return_value.__enter__.return_value = _process(b"", 0)
+    source = tmp_path / "theFile.conf"
+    source.write_bytes(b"the content")
+    (tmp_path / "remote").mkdir()
+    destination = (tmp_path / "remote").as_posix()
+
+    tested = SshExecutor(ssh_keys={"theRegion": "theKeyFile"}, parallel=1, connect_timeout=7, command_timeout=0)
+    tested.ssh_arguments = lambda ssh_key, public_ip, command: ["sh", "-c", command]  # type: ignore[method-assign]
+    servers = [make_server("server1", region="theRegion", external_ip="ip1")]
+    assert [f"{destination} to transfer"] == list(tested.push(servers, source, destination, dry_run=True))[0].response
+    (tmp_path / "remote" / "theFile.conf").write_bytes(b"the content")
+    assert [f"{destination} unchanged"] == list(tested.push(servers, source, destination))[0].response
+    assert [] == popen.mock_calls
+    # the checksum of a missing file or of a file named as the destination
+    (tmp_path / "remote" / "theFile.conf").unlink()
+    assert (0, "") == tested.remote_checksum(servers[0], destination, "theFile.conf")
+    checksum = hashlib.sha256(b"the content").hexdigest()
+    assert (0, checksum) == tested.remote_checksum(servers[0], source.as_posix(), "other.conf")
@@ -0,0 +1,34 @@
+from unittest.mock import patch
+
+from aws.state_journal import StateJournal
+
+
+def test_default_file():
+    result = StateJournal.default_file()
+    assert "state_journal.json" == result.name
+    assert "secrets" == result.parent.name
+
+
+@patch("aws.state_journal.time")
+def test_record_save(time, tmp_path):
+    time.return_value = 1000.0
+    journal_file = tmp_path / "journal.json"
+
+    tested = StateJournal(journal_file)
+    assert "" == tested.hashed("theRegion", "theServer", "firewall")
+    tested.record("theRegion", "theServer", "firewall", "theHash")
+    tested.record("theRegion", "theServer", "alarms", "otherHash")
+    assert "theHash" == tested.hashed("theRegion", "theServer", "firewall")
+    tested.save()
+    assert 0o600 == journal_file.stat().st_mode & 0o777
+
+    tested = StateJournal(journal_file)
+    assert {
+        "theRegion/theServer": {"firewall": "theHash", "alarms": "otherHash", "timestamp": 1000.0}
+    } == tested.states
+
+
+def test___init__invalid(tmp_path):
+    (tmp_path / "journal.json").write_text("{")
+    tested = StateJournal(tmp_path / "journal.json")
+    assert {} == tested.states
@@ -0,0 +1,70 @@
+from io import StringIO
+from unittest.mock import Mock
+
+from aws.immutable.print_column import PrintColumn
+from aws.table_renderer import TableRenderer
+
+COLUMNS = [
+    PrintColumn(label="name", alignment=PrintColumn.left(), size=4, formatter=lambda x: x[0]),
+    PrintColumn(label="cpu", alignment=PrintColumn.right(), size=3, formatter=lambda x: x[1]),
+    PrintColumn(label="state", alignment=PrintColumn.center(), size=3, formatter=lambda x: x[2]),
+]
+LINES = [("server1", 2, "OK"), ("s2", 16, "ALARM")]
+
+
+def _render(output: str, sample: int = 50, lines=None) -> str:
+    out = StringIO()
+    TableRenderer(COLUMNS, output, sample, out).render(LINES if lines is None else lines)
+    return out.getvalue()
+
+
+def test_render__table():
+    expected = [
+        "+-----------------------+",
+        "|   name  | cpu | state |",
+        "+-----------------------+",
+        "| server1 |   2 |   OK  |",
+        "| s2      |  16 | ALARM |",
+        "+-----------------------+",
+        "",
+    ]
+    assert "\n".join(expected) == _render(TableRenderer.TABLE)
+
+
+def test_render__formatted_once():
+    formatter = Mock(return_value="value")
+    columns = [PrintColumn(label="label", alignment=PrintColumn.left(), size=4, formatter=formatter)]
+    TableRenderer(columns, TableRenderer.TABLE, 50, StringIO()).render(LINES)
+    assert 2 == len(formatter.mock_calls)
+
+
+def test_render__stream():
+    # the columns are sized with their default size, longer values overflow
+    expected = [
+        "+--------------------+",
+        "| name | cpu | state |",
+        "+--------------------+",
+        "| server1 |   2 |   OK  |",
+        "| s2   |  16 | ALARM |",
+        "+--------------------+",
+        "",
+    ]
+    assert "\n".join(expected) == _render(TableRenderer.STREAM, sample=0, lines=iter(LINES))
+    assert _render(TableRenderer.TABLE) == _render(TableRenderer.STREAM, sample=2, lines=iter(LINES))
+
+
+def test_render__machine_readable():
+    expected = '[{"name": "server1", "cpu": 2, "state": "OK"}, {"name": "s2", "cpu": 16, "state": "ALARM"}]\n'
+    assert expected == _render(TableRenderer.JSON)
+    expected = '{"name": "server1", "cpu": 2, "state": "OK"}\n{"name": "s2", "cpu": 16, "state": "ALARM"}\n'
+    assert expected == _render(TableRenderer.JSONL)
+    expected = "name,cpu,state\nserver1,2,OK\ns2,16,ALARM\n"
+    assert expected == _render(TableRenderer.CSV)
+
+
+def test_machine_readable():
+    assert TableRenderer.machine_readable(TableRenderer.TABLE) is False
+    assert TableRenderer.machine_readable(TableRenderer.STREAM) is False
+    assert TableRenderer.machine_readable(TableRenderer.JSON) is True
+    assert TableRenderer.machine_readable(TableRenderer.JSONL) is True
+    assert TableRenderer.machine_readable(TableRenderer.CSV) is True
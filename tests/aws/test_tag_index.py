@@ -0,0 +1,18 @@
+from aws.tag_index import TagIndex
+from tests.aws.factories import make_server
+
+
+def test_servers():
+    tested = TagIndex(
+        [
+            make_server("server1", [{"key": "env", "value": "prod"}, {"key": "maintenance"}]),
+            make_server("server2", [{"key": "env", "value": "test"}]),
+            make_server("server3", []),
+        ]
+    )
+    assert {"server1", "server2", "server3"} == tested.names
+    assert {"server1"} == tested.servers("env:prod")
+    assert {"server1", "server2"} == tested.servers("env")
+    assert {"server1"} == tested.servers("maintenance")
+    assert set() == tested.servers("maintenance:")
+    assert set() == tested.servers("unknown")
@@ -0,0 +1,57 @@
+import pytest
+
+from aws.tag_index import TagIndex
+from aws.tag_selector import TagSelector
+from tests.aws.factories import make_server
+
+INDEX = TagIndex(
+    [
+        make_server("server1", [{"key": "env", "value": "prod"}, {"key": "role", "value": "web"}]),
+        make_server(
+            "server2", [{"key": "env", "value": "prod"}, {"key": "role", "value": "api"}, {"key": "maintenance"}]
+        ),
+        make_server("server3", [{"key": "env", "value": "test"}, {"key": "role", "value": "web"}]),
+        make_server("server4", [{"key": "team", "value": "data science"}]),
+    ]
+)
+
+
+def test___init__():
+    tested = TagSelector("env:prod AND NOT (role:web OR maintenance)")
+    expected = (
+        TagSelector.AND,
+        (TagSelector.TAG, "env:prod"),
+        (TagSelector.NOT, (TagSelector.OR, (TagSelector.TAG, "role:web"), (TagSelector.TAG, "maintenance"))),
+    )
+    assert expected == tested.tree
+    assert TagSelector("").tree is None
+    assert (TagSelector.TAG, "env:prod") == TagSelector(" env : prod ").tree
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["env:prod AND", "(env:prod", "env:prod)", "env:prod role:web", "OR env:prod", "NOT"],
+)
+def test___init__error(expression):
+    with pytest.raises(ValueError):
+        TagSelector(expression)
+
+
+@pytest.mark.parametrize(
+    "expression,expected",
+    [
+        ("", {"server1", "server2", "server3", "server4"}),
+        ("env:prod", {"server1", "server2"}),
+        ("env:prod AND role:web", {"server1"}),
+        ("env:prod OR role:web", {"server1", "server2", "server3"}),
+        ("NOT maintenance", {"server1", "server3", "server4"}),
+        ("env AND NOT maintenance", {"server1", "server3"}),
+        ("role:web AND env:test OR maintenance", {"server2", "server3"}),
+        ("role:web AND (env:test OR maintenance)", {"server3"}),
+        ('"team:data science"', {"server4"}),
+        ("unknown", set()),
+    ],
+)
+def test_select(expression, expected):
+    tested = TagSelector(expression)
+    assert expected == tested.select(INDEX)
@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+from botocore.exceptions import ClientError
+
+from aws.lightsail import LightSail
+from benchmarks.fake_lightsail import FakeLightSail
+
+
+def test_get_instances():
+    tested = FakeLightSail.fleet(250)
+    response = tested.get_instances()
+    assert 100 == len(response["instances"])
+    assert "100" == response["nextPageToken"]
+    response = tested.get_instances(pageToken="200")
+    assert 50 == len(response["instances"])
+    assert "nextPageToken" not in response
+    assert {"get_instances": 2} == tested.calls
+
+
+def test_get_alarms():
+    tested = FakeLightSail.fleet(3)
+    assert 6 == len(tested.get_alarms()["alarms"])
+    response = tested.get_alarms(monitoredResourceName="server-00001")
+    assert ["server-00001_cpu", "server-00001_burst"] == [alarm["name"] for alarm in response["alarms"]]
+    with pytest.raises(ClientError):
+        tested.get_alarms(monitoredResourceName="unknown")
+
+
+def test_get_instance_metric_data():
+    tested = FakeLightSail.fleet(3)
+    response = tested.get_instance_metric_data(
+        instanceName="server-00001",
+        metricName="CPUUtilization",
+        period=300,
+        startTime=datetime.fromtimestamp(1000, timezone.utc),
+        endTime=datetime.fromtimestamp(4000, timezone.utc),
+        unit="Percent",
+        statistics=["Average"],
+    )
+    assert "CPUUtilization" == response["metricName"]
+    assert [1200 + 300 * index for index in range(10)] == [x["timestamp"].timestamp() for x in response["metricData"]]
+    assert all(0 <= x["average"] <= 100 for x in response["metricData"])
+    with pytest.raises(ClientError):
+        tested.get_instance_metric_data(
+            instanceName="unknown",
+            metricName="CPUUtilization",
+            period=300,
+            startTime=datetime.fromtimestamp(1000, timezone.utc),
+            endTime=datetime.fromtimestamp(4000, timezone.utc),
+            unit="Percent",
+            statistics=["Average"],
+        )
+
+
+def test_throttle_every():
+    tested = FakeLightSail.fleet(1, throttle_every=2)
+    tested.delete_alarm(alarmName="server-00000_cpu")
+    with pytest.raises(ClientError) as exc:
+        tested.delete_alarm(alarmName="server-00000_burst")
+    assert "ThrottlingException" == exc.value.response["Error"]["Code"]
+    assert 1 == tested.throttled
+    assert ["server-00000_burst"] == list(tested.alarms.keys())
+
+
+@patch("aws.rate_limiter.sleep")
+def test_light_sail(sleep):
+    fake = FakeLightSail.fleet(250)
+    tested = LightSail("theRegion", client=fake)
+    servers = tested.list_servers("role:web AND NOT maintenance")
+    assert 75 == len(servers)
+    assert {"get_instances": 3} == fake.calls
+    alarms = tested.list_alarms([server.name for server in servers])
+    assert 150 == len(alarms)
+    assert {"get_instances": 3, "get_alarms": 5} == fake.calls
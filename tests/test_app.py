@@ -1,2 +1,95 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import call, patch
+
+import pytest
+
+from app import Menu
+
+
 def test_display_menu():
     ...
+
+
+def test_start_up():
+    # the help and the validation of the arguments do not need boto3
+    app = Path(__file__).parent.parent / "app.py"
+    for arguments in [["--help"], ["servers", "--tag", "env:prod AND"]]:
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", str(app), *arguments], capture_output=True, text=True, check=False
+        )
+        modules = [
+            line.split("|")[-1].strip() for line in completed.stderr.splitlines() if line.startswith("import time")
+        ]
+        assert "argparse" in modules
+        assert [module for module in modules if module.split(".")[0] in ("boto3", "botocore")] == []
+
+
+def test_batch_size():
+    tests = [
+        ("5", 40, 5),
+        ("25%", 40, 10),
+        ("1%", 40, 1),
+        ("100%", 40, 40),
+        ("0", 40, 0),
+        ("0%", 40, 0),
+        ("5x", 40, 0),
+        ("", 40, 0),
+    ]
+    for value, servers, expected in tests:
+        assert expected == Menu.batch_size(value, servers), value
+
+
+@patch("aws.light_sail_regions.LightSailRegions")
+@patch("aws.state_journal.StateJournal.default_file")
+def test_run__live_inventory(default_file, light_sail_regions, tmp_path, capsys):
+    # the firewall rules are compared with the live inventory, not with the cached one
+    default_file.return_value = tmp_path / "journal.json"
+    rule = {"tagKey": "", "tagValue": "", "fromPort": 22, "toPort": 22, "protocol": "tcp", "cidrs": ["1.2.3.4/32"]}
+    (tmp_path / "aws_firewall_rules.json").write_text(json.dumps([rule]))
+    (tmp_path / "aws_alarms.json").write_text("[]")
+    light_sail_regions.return_value.list_servers.return_value = []
+    for what, refresh in [("setFirewall", True), ("plan", True), ("firewall", False)]:
+        light_sail_regions.reset_mock()
+        arguments = ["app.py", what, "--no-daemon", "--dry-run", "--policy-dir", str(tmp_path)]
+        with patch.object(sys, "argv", arguments):
+            Menu.run()
+        assert refresh == light_sail_regions.mock_calls[1].args[2], what
+
+
+@patch("aws.light_sail_regions.LightSailRegions")
+@patch("aws.daemon_regions.DaemonRegions.invalidate")
+def test_run__policy(invalidate, light_sail_regions, tmp_path, capsys):
+    (tmp_path / "aws_firewall_rules.json").write_text("[]")
+    (tmp_path / "aws_alarms.json").write_text("[]")
+    light_sail_regions.return_value.list_servers.return_value = []
+    tests = [
+        # a mistyped directory
+        (["setFirewall", "--policy-dir", str(tmp_path / "unknown")], 2, "the policy directory does not exist"),
+        # an empty policy is only applied on demand
+        (["setFirewall", "--policy-dir", str(tmp_path)], 1, "no rule in aws_firewall_rules.json"),
+        (["setAlerts", "--policy-dir", str(tmp_path)], 1, "no rule in aws_alarms.json"),
+        (["setFirewall", "--policy-dir", str(tmp_path), "--dry-run"], 0, ""),
+        (["setFirewall", "--policy-dir", str(tmp_path), "--allow-empty-policy"], 0, ""),
+    ]
+    for arguments, code, message in tests:
+        with patch.object(sys, "argv", ["app.py", *arguments, "--no-daemon"]):
+            if code:
+                with pytest.raises(SystemExit) as exc:
+                    Menu.run()
+                assert code == exc.value.code, arguments
+            else:
+                Menu.run()
+        assert message in capsys.readouterr().err, arguments
+    # the daemon is told of the possible changes
+    assert [call(), call(), call()] == invalidate.mock_calls
+
+
+def test_run__since(capsys):
+    with patch.object(sys, "argv", ["app.py", "history", "--since", "0"]):
+        with pytest.raises(SystemExit) as exc:
+            Menu.run()
+    assert 2 == exc.value.code
+    assert "--since must be at least 1 hour" in capsys.readouterr().err